@@ -0,0 +1,1451 @@
+"""
+Void Bills Benchmarks
+Offline throughput benchmarks for the classification pipeline.
+
+Usage:
+    python benchmarks.py dispatch --orders 400 --latency 0.5
+    python benchmarks.py prompt --orders 2000
+    python benchmarks.py adaptive --orders 1000
+    python benchmarks.py clustering --orders 100000
+    python benchmarks.py local-model --orders 50000
+    python benchmarks.py verify-gate --orders 50000
+    python benchmarks.py retry --orders 400
+    python benchmarks.py rules --orders 50000
+    python benchmarks.py rules-parallel --orders 1000000
+    python benchmarks.py bill-ids --rows 1000000
+    python benchmarks.py grouping --orders 200000
+    python benchmarks.py streaming --orders 20000
+    python benchmarks.py columnar --orders 50000
+    python benchmarks.py incremental --orders 5000
+    python benchmarks.py fraud-flags --orders 1000000
+    python benchmarks.py roundness --orders 1000000
+    python benchmarks.py staff-stats --orders 500000
+    python benchmarks.py velocity --orders 100000
+    python benchmarks.py collusion --orders 1000000
+    python benchmarks.py excel-writer --orders 20000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import time
+
+SAMPLE_REMARKS = [
+    "customer denied the order",
+    "cux denied",
+    "test order from IT",
+    "double punch",
+    "dubble punch same order",
+    "new bill {bill}",
+    "NBN {bill}",
+    "customer not available at location",
+    "cx not available",
+    "phone not answering tried 5 times",
+    "wrong phone number",
+    "customer want to cancel",
+    "please cancel this order",
+    "out of grid",
+    "deliver from koswattha outlet to panadura",
+    "rider not assigned",
+    "order delay heavy rain",
+    "change to delivery",
+    "customer wants large instead of medium",
+    "uber cancelled the order",
+    "credit card not working",
+    "customer want LSM offer",
+    "HSBC 30% discount",
+    "cashier mistakenly punch",
+    "sale center mistacly punch the order",
+    "system error",
+    "pizza coke not available",
+    "customer complain cold pizza",
+    "veg melt",
+    "dkt {num}",
+]
+
+
+def synthetic_void_texts(n, seed=0):
+    """Generate n Singlish-style void remarks with varying bill numbers."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        template = rng.choice(SAMPLE_REMARKS)
+        bill = f"{rng.choice('LMPY')}{rng.randint(10000, 99999)}"
+        texts.append(template.format(bill=bill, num=rng.randint(10, 999)))
+    return texts
+
+
+OUTLETS = ["Panadura", "Dehiwala", "Koswatta", "Havelock", "Wennappuwa", "Kochchikade",
+           "Kandy", "Galle", "Negombo", "Maharagama", "Nugegoda", "Kiribathgoda"]
+ORDER_TYPES = ["Delivery", "Take Away", "Dine In", "Aggregator"]
+
+
+def synthetic_listing(orders, seed=0, max_children=3):
+    """
+    Build a PH_VoidBillListing-shaped frame: one parent row per order followed
+    by child rows whose 'Order No' is NaN and which repeat or add remarks.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    remarks = np.array(synthetic_void_texts(orders, seed), dtype=object)
+    children = rng.integers(0, max_children + 1, size=orders)
+    parent_pos = np.concatenate([[0], np.cumsum(children + 1)[:-1]])
+    total_rows = int((children + 1).sum())
+
+    is_parent = np.zeros(total_rows, dtype=bool)
+    is_parent[parent_pos] = True
+    order_of_row = np.repeat(np.arange(orders), children + 1)
+
+    order_no = np.full(total_rows, np.nan, dtype=object)
+    order_no[parent_pos] = [f"PH{100000 + i}" for i in range(orders)]
+
+    reasons = np.array(["Customer Request", "Cashier Error", "Other", ""], dtype=object)
+    reason = reasons[rng.integers(0, len(reasons), size=total_rows)]
+    reason[~is_parent & (rng.random(total_rows) < 0.5)] = np.nan
+    remark = remarks[order_of_row].copy()
+    remark[~is_parent & (rng.random(total_rows) < 0.4)] = np.nan
+
+    staff = np.array([f"{i:05d}" for i in range(max(10, orders // 50))], dtype=object)
+    start = np.datetime64("2025-10-01T08:00")
+    order_time = start + rng.integers(0, 31 * 24 * 60, size=orders).astype("timedelta64[m]")
+    void_time = order_time + rng.exponential(40, size=orders).astype("timedelta64[m]")
+
+    def parent_only(values):
+        column = np.full(total_rows, None, dtype=object)
+        column[parent_pos] = values
+        return column
+
+    amount = np.full(total_rows, np.nan)
+    amount[parent_pos] = np.round(rng.gamma(2.0, 1800.0, size=orders), -1)
+    amount[parent_pos[rng.random(orders) < 0.05]] = 5000.0
+
+    return pd.DataFrame({
+        "Order No": order_no,
+        "Outlet": parent_only(np.array(OUTLETS, dtype=object)[rng.integers(0, len(OUTLETS), size=orders)]),
+        "Order Type": parent_only(np.array(ORDER_TYPES, dtype=object)[rng.integers(0, len(ORDER_TYPES), size=orders)]),
+        "Order Date": parent_only(pd.to_datetime(order_time).normalize()),
+        "Order Time": parent_only(pd.to_datetime(order_time)),
+        "Void Date": parent_only(pd.to_datetime(void_time)),
+        "Amount": amount,
+        "Contact no": parent_only(np.array([f"07{n:08d}" for n in rng.integers(0, max(10, orders // 3), size=orders)], dtype=object)),
+        "Placed By": parent_only(staff[rng.integers(0, len(staff), size=orders)]),
+        "Void By ": parent_only(staff[rng.integers(0, len(staff), size=orders)]),
+        "Reason": reason,
+        "Remark": remark,
+    })
+
+
+def _report(label, count, seconds, unit="orders"):
+    rate = count / seconds if seconds > 0 else float("inf")
+    print(f"  {label:<32} {seconds:9.3f}s  {rate:12,.0f} {unit}/s")
+
+
+# ============= LLM DISPATCH =============
+def bench_dispatch(args):
+    """Serial sleep loop vs concurrent dispatcher against the fake Groq stub."""
+    os.environ.setdefault("API_KEY", "offline-benchmark")
+    import classify_enhanced
+    from fake_groq import FakeGroq
+    from llm_dispatch import TokenBucket, dispatch_batches
+
+    texts = synthetic_void_texts(args.orders)
+    batch_size = classify_enhanced.BATCH_SIZE
+    print(f"Dispatch benchmark: {len(texts)} orders, batch size {batch_size}, "
+          f"latency {args.latency}s, fake limit {args.rpm} RPM")
+
+    def fresh_client():
+        classify_enhanced.client = FakeGroq(latency=args.latency, jitter=args.latency / 4,
+                                            requests_per_minute=args.rpm,
+                                            categories=classify_enhanced.VALID_CATEGORIES)
+        classify_enhanced.rate_limiter = TokenBucket(args.rpm, burst=args.in_flight)
+
+    # Baseline: the old one-batch-at-a-time loop with a fixed 0.5s sleep
+    fresh_client()
+    start = time.perf_counter()
+    serial = []
+    for i in range(0, len(texts), batch_size):
+        serial.extend(classify_enhanced.classify_batch_ai(texts[i:i + batch_size]))
+        time.sleep(0.5)
+    _report("serial + sleep(0.5)", len(texts), time.perf_counter() - start)
+
+    for in_flight in sorted({1, 2, args.in_flight}):
+        fresh_client()
+        start = time.perf_counter()
+        results = dispatch_batches(texts, classify_enhanced.classify_batch_ai, batch_size,
+                                   max_in_flight=in_flight)
+        _report(f"dispatcher, {in_flight} in flight", len(texts), time.perf_counter() - start)
+        assert results == serial, "dispatcher changed the prediction order"
+
+
+# ============= PROMPT PREFIX =============
+def legacy_prompt(text_list):
+    """The original single user prompt: whole taxonomy plus the batch, rebuilt per request."""
+    import json
+    import classify_enhanced as ce
+
+    task = f"""Classify each of these void order reasons:
+{json.dumps(text_list, indent=2)}"""
+    return "\n\n".join([ce.PROMPT_CONTEXT, ce.PROMPT_CATEGORIES, ce.PROMPT_PRIORITY,
+                        ce.PROMPT_EXAMPLES, task, ce.PROMPT_OUTPUT_RULES])
+
+
+def bench_prompt(args):
+    """Tokens per classified order: old per-batch prompt vs cached system prefix + packed batches."""
+    import json
+    os.environ.setdefault("API_KEY", "offline-benchmark")
+    import classify_enhanced as ce
+    from fake_groq import FakeGroq
+    from llm_dispatch import TokenBucket, UsageMeter, dispatch_batches
+
+    texts = synthetic_void_texts(args.orders)
+    print(f"Prompt token benchmark: {len(texts)} orders (token counts estimated at 4 chars/token)")
+
+    def run(label, classify_fn, batch_size, token_budget=None):
+        ce.client = FakeGroq(latency=0, jitter=0, categories=ce.VALID_CATEGORIES)
+        ce.rate_limiter = TokenBucket(1_000_000, burst=1_000)
+        ce.usage_meter = UsageMeter()
+        results = dispatch_batches(texts, classify_fn, batch_size, max_in_flight=1, token_budget=token_budget)
+        meter = ce.usage_meter
+        uncached = meter.prompt_tokens - meter.cached_tokens
+        print(f"  {label:<34} {meter.requests:5d} requests  "
+              f"{meter.prompt_tokens / len(texts):7.0f} prompt tok/order  "
+              f"{uncached / len(texts):7.0f} uncached tok/order")
+        return results
+
+    def legacy_classify(text_list):
+        raw = ce.client.chat.completions.with_raw_response.create(
+            model=ce.MODEL_NAME,
+            messages=[{"role": "system", "content": ce.SYSTEM_MESSAGE},
+                      {"role": "user", "content": legacy_prompt(text_list)}])
+        completion = raw.parse()
+        ce.usage_meter.record(completion.usage)
+        return json.loads(completion.choices[0].message.content)["predictions"]
+
+    run("legacy prompt, 10 per batch", legacy_classify, 10)
+    full = ce.SYSTEM_PROMPT
+    run("system prefix, 10 per batch", ce.classify_batch_ai, 10)
+    run(f"system prefix, {ce.BATCH_TOKEN_BUDGET} tok budget", ce.classify_batch_ai, ce.MAX_BATCH_SIZE, ce.BATCH_TOKEN_BUDGET)
+    ce.SYSTEM_PROMPT = ce.build_system_prompt(compact=True)
+    run(f"compact prefix, {ce.BATCH_TOKEN_BUDGET} tok budget", ce.classify_batch_ai, ce.MAX_BATCH_SIZE, ce.BATCH_TOKEN_BUDGET)
+    print(f"  system prompt: {len(full) // 4:,} tokens full, {len(ce.SYSTEM_PROMPT) // 4:,} compact")
+    ce.SYSTEM_PROMPT = full
+
+
+# ============= ADAPTIVE BATCHING =============
+def bench_adaptive(args):
+    """Fixed batches padded with "other" vs AdaptiveBatcher against a model that drops items."""
+    os.environ.setdefault("API_KEY", "offline-benchmark")
+    import classify_enhanced as ce
+    from fake_groq import FakeGroq
+    from llm_dispatch import AdaptiveBatcher, TokenBucket, dispatch_adaptive
+
+    texts = synthetic_void_texts(args.orders)
+    print(f"Adaptive batching benchmark: {len(texts)} orders, latency {args.latency}s + "
+          f"{args.per_item * 1000:.0f}ms/text, items dropped above {args.reliable} texts")
+
+    def fresh_client():
+        ce.client = FakeGroq(latency=args.latency, jitter=0, categories=ce.VALID_CATEGORIES,
+                             per_item_latency=args.per_item, max_reliable_batch=args.reliable)
+        ce.rate_limiter = TokenBucket(1_000_000, burst=1_000)
+        return ce.client
+
+    truth = [fresh_client()._predict(t) for t in texts]
+
+    def report(label, client, results, seconds):
+        wrong = sum(r != t for r, t in zip(results, truth))
+        print(f"  {label:<32} {seconds:7.2f}s  {client.request_count:5d} requests  "
+              f"{wrong:5d} wrong ({wrong / len(texts):.1%})")
+
+    # Baseline: the old fixed-size loop that padded short responses with "other"
+    for size in (10, ce.MAX_BATCH_SIZE):
+        client = fresh_client()
+        start = time.perf_counter()
+        results = []
+        for i in range(0, len(texts), size):
+            batch = texts[i:i + size]
+            batch_results = ce.classify_batch_ai(batch)
+            results.extend((batch_results + ["other"] * len(batch))[:len(batch)])
+        report(f"fixed {size}, padded", client, results, time.perf_counter() - start)
+
+    client = fresh_client()
+    batcher = AdaptiveBatcher(ce.BATCH_SIZE, max_size=ce.MAX_BATCH_SIZE)
+    start = time.perf_counter()
+    results = dispatch_adaptive(texts, ce.classify_batch_ai, batcher, max_in_flight=1)
+    report(f"adaptive from {ce.BATCH_SIZE}", client, results, time.perf_counter() - start)
+    print(f"  {batcher.summary()}")
+
+    # One unparsable reply early in the run must not cap the size for good
+    batcher = AdaptiveBatcher(ce.BATCH_SIZE, max_size=ce.MAX_BATCH_SIZE)
+    replies = {"bad": 1}
+
+    def flaky(batch):
+        time.sleep(0.01 + 0.001 * len(batch))
+        if replies["bad"] and len(batch) > ce.BATCH_SIZE:
+            replies["bad"] -= 1
+            return []
+        return ["other"] * len(batch)
+
+    dispatch_adaptive(texts, flaky, batcher, max_in_flight=1)
+    assert batcher.next_size() == ce.MAX_BATCH_SIZE, "cap did not recover after a transient failure"
+    print(f"  one transient failure: size back to {batcher.next_size()} ({batcher.summary()})")
+
+    # Batches that come back all ERROR (requests failing after their retries) must not grow
+    # the size; once the provider answers again the size climbs back without a lowered cap
+    batcher = AdaptiveBatcher(ce.BATCH_SIZE, max_size=ce.MAX_BATCH_SIZE)
+    dispatch_adaptive(texts[:200], lambda batch: ["ERROR"] * len(batch), batcher, max_in_flight=1)
+    assert batcher.next_size() < ce.BATCH_SIZE, "size grew while every request failed"
+    during = batcher.next_size()
+    dispatch_adaptive(texts, lambda batch: ["other"] * len(batch), batcher, max_in_flight=1)
+    assert batcher.next_size() == ce.MAX_BATCH_SIZE, "size did not recover after the outage"
+    print(f"  all-ERROR outage: size {during} during, back to {batcher.next_size()} after "
+          f"({batcher.summary()})")
+
+
+# ============= NEAR-DUPLICATE CLUSTERING =============
+_SWAPS = {"customer": ["cux", "cx", "cus", "customer"], "double": ["dubble", "doubble", "double"],
+          "cancel": ["cansel", "cancell", "cancel"], "order": ["oder", "odar", "order"]}
+
+
+def noisy_void_texts(n, seed=0, typo_rate=0.3):
+    """synthetic_void_texts with abbreviation swaps, typos and spacing noise; also returns template ids."""
+    rng = random.Random(seed)
+    texts, templates = [], []
+    for _ in range(n):
+        template = rng.randrange(len(SAMPLE_REMARKS))
+        bill = f"{rng.choice('LMPY')}{rng.randint(10000, 99999)}"
+        words = SAMPLE_REMARKS[template].format(bill=bill, num=rng.randint(10, 999)).split()
+        words = [rng.choice(_SWAPS[w]) if w in _SWAPS else w for w in words]
+        if rng.random() < typo_rate:
+            i = rng.randrange(len(words))
+            word = words[i]
+            if len(word) > 3:
+                j = rng.randrange(1, len(word) - 1)
+                words[i] = rng.choice([word[:j] + word[j + 1:], word[:j] + word[j] + word[j:]])
+        text = ("  " if rng.random() < 0.2 else " ").join(words)
+        texts.append(text.upper() if rng.random() < 0.1 else text)
+        templates.append(template)
+    return texts, templates
+
+
+def bench_clustering(args):
+    """LLM texts after exact (cache-key) dedupe vs MinHash near-duplicate clustering."""
+    from classification_cache import normalize_text
+    from text_clusters import ClusterStage, cluster_texts
+
+    texts, templates = noisy_void_texts(args.orders)
+    exact = len(set(normalize_text(t) for t in texts))
+    batch = args.batch_size
+    print(f"Clustering benchmark: {len(texts):,} noisy remarks from {len(SAMPLE_REMARKS)} templates, "
+          f"{batch} texts per request")
+    print(f"  {'exact dedupe (cache key)':<32} {exact:7,d} LLM texts  {-(-exact // batch):5d} requests")
+    normalized = len(set(ClusterStage().canonical(texts)))
+    print(f"  {'normalized forms (stage default)':<32} {normalized:7,d} LLM texts  {-(-normalized // batch):5d} requests")
+    for threshold in args.thresholds:
+        start = time.perf_counter()
+        clusters = cluster_texts(texts, threshold)
+        seconds = time.perf_counter() - start
+        reps = len(clusters.representatives)
+        # Purity: texts whose representative came from the same remark template
+        rep_template = {}
+        for label, template in zip(clusters.labels, templates):
+            rep_template.setdefault(label, template)
+        pure = sum(rep_template[label] == template for label, template in zip(clusters.labels, templates))
+        print(f"  {f'minhash, threshold {threshold}':<32} {reps:7,d} LLM texts  {-(-reps // batch):5d} requests  "
+              f"{seconds:6.2f}s  purity {pure / len(texts):.2%}")
+
+
+# ============= LOCAL MODEL TIER =============
+# Categories for SAMPLE_REMARKS the keyword rules leave open
+_TEMPLATE_OVERRIDES = {"new bill {bill}": "voids without clear reason/ remark",
+                       "NBN {bill}": "voids without clear reason/ remark",
+                       "dkt {num}": "voids without clear reason/ remark",
+                       "veg melt": "out of stock"}
+
+
+def bench_local_model(args):
+    """LLM texts avoided vs accuracy lost by the TF-IDF + logistic regression tier."""
+    import pandas as pd
+    import void_pipeline as vp
+    from local_model import SKLEARN_AVAILABLE, train_local_model
+
+    if not SKLEARN_AVAILABLE:
+        raise SystemExit("scikit-learn is not installed")
+    truth_of = [_TEMPLATE_OVERRIDES.get(t) or vp.RULE_ENGINE.classify(t.format(bill="Y22196", num=18))
+                for t in SAMPLE_REMARKS]
+
+    # Historical labels are imperfect and some remark styles never appeared in them
+    rng = random.Random(0)
+    unseen = set(rng.sample(range(len(SAMPLE_REMARKS)), args.unseen))
+    categories = sorted(set(truth_of))
+    train_texts, train_labels = [], []
+    for text, template in zip(*noisy_void_texts(args.train, seed=0)):
+        if template in unseen:
+            continue
+        label = truth_of[template]
+        train_texts.append(text)
+        train_labels.append(rng.choice(categories) if rng.random() < args.label_noise else label)
+    start = time.perf_counter()
+    model, _ = train_local_model(train_texts, train_labels, holdout=0)
+    print(f"Local model benchmark: trained on {len(train_texts):,} orders ({args.label_noise:.0%} wrong labels, "
+          f"{args.unseen} remark templates unseen) in {time.perf_counter() - start:.1f}s")
+
+    texts, templates = noisy_void_texts(args.orders, seed=1, typo_rate=args.typo_rate)
+    misses = vp.RULE_ENGINE.classify_series(pd.Series(texts)).isna().values
+    texts = [t for t, m in zip(texts, misses) if m]
+    truth = [truth_of[t] for t, m in zip(templates, misses) if m]
+    start = time.perf_counter()
+    model.predict(texts)
+    per_text = (time.perf_counter() - start) / max(1, len(texts))
+    print(f"  {len(texts):,} of {args.orders:,} new orders miss the rules and would go to the LLM; "
+          f"local prediction {per_text * 1e6:.0f} us/text")
+    for threshold, coverage, accuracy in model.coverage(texts, truth):
+        answered = int(round(coverage * len(texts)))
+        print(f"  confidence >= {threshold:.2f}: {answered:7,d} LLM texts avoided ({coverage:6.1%}, "
+              f"~{answered // args.batch_size:,} requests)  local accuracy {accuracy:6.1%}  "
+              f"orders mislabelled {coverage * (1 - accuracy):6.2%}")
+
+
+# ============= AI VERIFICATION GATE =============
+# Remarks where keyword rules fire for the wrong category, with the right one
+_AMBIGUOUS_REMARKS = {
+    "customer cancel due to order delay": "Customer Cancel order",
+    "rider not assigned customer cancel": "Customer Cancel order",
+    "cashier mistakenly punch double": "Cashier mistake",
+    "customer not available change to take away": "order type change",
+    "customer want to cancel wrong phone number": "phone",
+    "delay due to system error": "system issue",
+    "pizza not available customer cancel": "out of stock",
+    "customer complain late delivery": "Order delay",
+    "customer complain order delay": "Order delay",
+    "grid issue customer cancel": "grid issue",
+}
+
+
+def labelled_remarks(n, seed=0, ambiguous=0.1):
+    """noisy_void_texts mixed with _AMBIGUOUS_REMARKS, and the true category of each."""
+    import void_pipeline as vp
+
+    rng = random.Random(seed)
+    truth_of = [_TEMPLATE_OVERRIDES.get(t) or vp.RULE_ENGINE.classify(t.format(bill="Y22196", num=18))
+                for t in SAMPLE_REMARKS]
+    tricky = list(_AMBIGUOUS_REMARKS)
+    texts, truth = [], []
+    for text, template in zip(*noisy_void_texts(n, seed, typo_rate=0.1)):
+        if rng.random() < ambiguous:
+            text = rng.choice(tricky)
+            texts.append(text.upper() if rng.random() < 0.1 else text)
+            truth.append(_AMBIGUOUS_REMARKS[text])
+        else:
+            texts.append(text)
+            truth.append(truth_of[template])
+    return texts, truth
+
+
+def bench_verify_gate(args):
+    """AI verification calls and rule mistakes caught: verify every rule hit vs the specificity gate."""
+    import numpy as np
+    import pandas as pd
+    import void_pipeline as vp
+    from rule_engine import RulePrecision, VerifyGate
+
+    # History: last month's verified output (some labels wrong, like any review)
+    rng = random.Random(0)
+    categories = sorted(set(_AMBIGUOUS_REMARKS.values()) | set(vp.PRIORITY_ORDER))
+    history, history_truth = labelled_remarks(args.history, seed=0, ambiguous=args.ambiguous)
+    history_labels = [rng.choice(categories) if rng.random() < args.label_noise else label
+                      for label in history_truth]
+    start = time.perf_counter()
+    precision = RulePrecision.from_history(vp.RULE_ENGINE, history, history_labels)
+    print(f"Verification gate benchmark: pattern precision from {len(history):,} historical orders "
+          f"({args.label_noise:.0%} wrong labels) in {time.perf_counter() - start:.2f}s")
+
+    texts, truth = labelled_remarks(args.orders, seed=1, ambiguous=args.ambiguous)
+    texts = pd.Series(texts)
+    rules = vp.RULE_ENGINE.classify_series(texts)
+    hit = rules.notna().values
+    texts, rules, truth = texts[hit], rules[hit].values, np.array(truth, dtype=object)[hit]
+    wrong = rules != truth
+    batch = args.batch_size
+    print(f"  {len(texts):,} rule hits in {args.orders:,} orders, {int(wrong.sum()):,} of them wrong; "
+          f"{batch} texts per request")
+    print(f"  {'verify every rule hit':<36} {len(texts):7,d} verified  {-(-len(texts) // batch):5d} requests  "
+          f"rule mistakes sent to the LLM 100.0%")
+    for label, history_precision in (("gate, no history", None), ("gate, pattern precision", precision)):
+        gate = VerifyGate(vp.RULE_ENGINE, vp.VERIFY_THRESHOLD, history_precision)
+        start = time.perf_counter()
+        selected = gate.select(texts)
+        seconds = time.perf_counter() - start
+        caught = (selected & wrong).sum() / max(1, wrong.sum())
+        print(f"  {label:<36} {gate.verified:7,d} verified  {-(-gate.verified // batch):5d} requests  "
+              f"rule mistakes sent to the LLM {caught:6.1%}  ({seconds:.2f}s)")
+
+
+# ============= RETRY LAYER =============
+def legacy_classify_with_flat_retry(text_list, retry_count=3):
+    """The old classify_batch_ai retry loop: any error, flat sleep(3), then ERROR."""
+    import classify_enhanced as ce
+
+    for attempt in range(retry_count):
+        try:
+            completion = ce.send_request(ce.build_batch_prompt(text_list))
+            return json.loads(completion.choices[0].message.content)["predictions"]
+        except Exception:
+            if attempt < retry_count - 1:
+                time.sleep(3)
+                continue
+            return ["ERROR"] * len(text_list)
+
+
+def bench_retry(args):
+    """Flat sleep(3) retries vs backoff + circuit breaker, under random 503s and an outage."""
+    os.environ.setdefault("API_KEY", "offline-benchmark")
+    import classify_enhanced as ce
+    from fake_groq import FakeGroq
+    from llm_dispatch import TokenBucket, dispatch_batches
+    from llm_retry import Retrier
+
+    texts = synthetic_void_texts(args.orders)
+    batches = -(-len(texts) // ce.BATCH_SIZE)
+    print(f"Retry benchmark: {len(texts)} orders in {batches} batches, "
+          f"{args.in_flight} in flight, latency {args.latency}s")
+
+    scenarios = [(f"{args.error_rate:.0%} random 503s", dict(error_rate=args.error_rate)),
+                 (f"outage after {batches // 2} requests", dict(fail_after=batches // 2))]
+    for scenario, faults in scenarios:
+        print(f"  {scenario}:")
+        for label in ("flat sleep(3) x3", "backoff + breaker"):
+            ce.client = FakeGroq(latency=args.latency, jitter=0, categories=ce.VALID_CATEGORIES, **faults)
+            ce.rate_limiter = TokenBucket(1_000_000, burst=1_000)
+            ce.retrier = Retrier(base_delay=args.base_delay, seed=0)
+            classify_fn = legacy_classify_with_flat_retry if label.startswith("flat") else ce.classify_batch_ai
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = dispatch_batches(texts, classify_fn, ce.BATCH_SIZE, max_in_flight=args.in_flight)
+            seconds = time.perf_counter() - start
+            errors = results.count("ERROR")
+            print(f"    {label:<20} {seconds:7.2f}s  {ce.client.request_count:5d} requests  "
+                  f"{errors:5d} orders ERROR")
+            if not label.startswith("flat"):
+                print(f"    {ce.retrier.metrics.summary()}")
+    _check_retry_after_cap()
+
+
+def _check_retry_after_cap(max_delay=5.0):
+    """Retry-After values of a day, negative or unparsable never make Retrier wait past max_delay."""
+    from fake_groq import FakeRateLimitError
+    from llm_retry import Retrier
+
+    waits = []
+    retrier = Retrier(base_delay=0.5, max_delay=max_delay, sleep=waits.append, seed=0)
+    for header in ("86400", "inf", "-30", "nan", "soon"):
+        error = FakeRateLimitError(0)
+        error.response.headers['retry-after'] = header
+        outcomes = iter([error])
+
+        def call():
+            for outcome in outcomes:
+                raise outcome
+            return "ok"
+
+        assert retrier.call(call) == "ok"
+    assert all(0 <= w <= max_delay for w in waits), f"Retry-After waits {waits} exceed {max_delay}s"
+    print(f"  Retry-After cap: OK (day-long, infinite, negative and malformed values waited "
+          f"at most {max(waits):.2f}s of {max_delay}s)")
+
+
+# ============= RULE ENGINE =============
+def legacy_apply_keyword_rules(text, rules, priority_order):
+    """The original per-pattern re.search loop, kept as the parity reference."""
+    if not text:
+        return None
+    text_lower = str(text).lower()
+    for category in priority_order:
+        if category in rules:
+            for pattern in rules[category]:
+                if re.search(pattern, text_lower):
+                    return category
+    return None
+
+
+def _load_rules():
+    os.environ.setdefault("API_KEY", "offline-benchmark")
+    import gemini_categorize
+    return gemini_categorize.KEYWORD_RULES, gemini_categorize.PRIORITY_ORDER
+
+
+def bench_rules(args):
+    """Legacy per-pattern loop vs compiled tier engine (row and Series entry points)."""
+    import pandas as pd
+    from rule_engine import RuleEngine
+
+    rules, priority_order = _load_rules()
+    if args.extra_rules:
+        # Grow the rule set with outlet-name style literals to show the prefilter
+        # keeps per-order cost flat as rules are added
+        rules = dict(rules)
+        rules["location"] = rules["location"] + [rf"\boutlet{i}\s*branch\b" for i in range(args.extra_rules)]
+    engine = RuleEngine(rules, priority_order)
+    texts = pd.Series(synthetic_void_texts(args.orders))
+    print(f"Rule engine benchmark: {len(texts)} orders, "
+          f"{sum(len(p) for p in rules.values())} patterns")
+
+    start = time.perf_counter()
+    legacy = texts.apply(legacy_apply_keyword_rules, args=(rules, priority_order))
+    _report("legacy Series.apply", len(texts), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rowwise = texts.apply(engine.classify)
+    _report("RuleEngine.classify (apply)", len(texts), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectorized = engine.classify_series(texts)
+    _report("RuleEngine.classify_series", len(texts), time.perf_counter() - start)
+
+    assert rowwise.tolist() == legacy.tolist(), "classify differs from legacy rules"
+    assert vectorized.tolist() == legacy.tolist(), "classify_series differs from legacy rules"
+    print("  parity: OK")
+
+
+def bench_rules_parallel(args):
+    """Rule pass on a very large listing: classify_series vs process-sharded workers."""
+    import pandas as pd
+    from rule_engine import RuleEngine
+
+    rules, priority_order = _load_rules()
+    engine = RuleEngine(rules, priority_order)
+    start = time.perf_counter()
+    texts = pd.Series(synthetic_void_texts(args.orders))
+    print(f"Parallel rule benchmark: {len(texts):,} orders ({time.perf_counter() - start:.1f}s to generate), "
+          f"{os.cpu_count()} CPUs")
+
+    serial = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        result = engine.classify_series_parallel(texts, workers)
+        seconds = time.perf_counter() - start
+        if serial is None:
+            serial, serial_seconds = result, seconds
+        print(f"  {f'{workers} worker(s)':<32} {seconds:9.3f}s  {len(texts) / seconds:12,.0f} orders/s  "
+              f"speedup {serial_seconds / seconds:5.2f}x")
+        assert result.equals(serial), f"{workers} workers changed rule categories"
+    print("  parity: OK (same categories, same order)")
+
+
+# ============= NEW BILL EXTRACTION =============
+LEGACY_BILL_PATTERNS = [
+    r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})',
+    r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})',
+    r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)',
+]
+
+
+def legacy_extract_new_bill_id(text):
+    """The original uncompiled per-row extractor, kept as the parity reference."""
+    if not text:
+        return None
+    clean_text = str(text).upper()
+    for pattern in LEGACY_BILL_PATTERNS:
+        match = re.search(pattern, clean_text)
+        if match:
+            result = match.group(1).replace(" ", "").replace("-", "")
+            if len(result) >= 2:
+                return result
+    match = re.search(r'\b([A-Z]{1,2}\d{4,7})\b', clean_text)
+    if match:
+        return match.group(1)
+    return None
+
+
+BILL_REMARKS = [
+    "new bill no Y22196", "NBN L27169", "new bill number M45055", "N.B.N P-69112",
+    "new dkt 18", "new order no 116", "order no 18, customer change", "HJ 0042 replaced",
+    "customer change the order G81216", "new bil HJ-0042", "order 7 delay", "",
+]
+
+
+def bench_bill_ids(args):
+    """Row-wise apply vs vectorized str.extract extractor on a synthetic frame."""
+    import pandas as pd
+    from void_preprocessing import extract_new_bill_ids
+
+    rng = random.Random(1)
+    base = synthetic_void_texts(args.rows // 2) + [
+        rng.choice(BILL_REMARKS) for _ in range(args.rows - args.rows // 2)
+    ]
+    random.Random(2).shuffle(base)
+    texts = pd.Series(base)
+    print(f"Bill number extraction benchmark: {len(texts):,} rows")
+
+    start = time.perf_counter()
+    legacy = texts.apply(legacy_extract_new_bill_id)
+    _report("legacy Series.apply", len(texts), time.perf_counter() - start, "rows")
+
+    start = time.perf_counter()
+    vectorized = extract_new_bill_ids(texts)
+    _report("extract_new_bill_ids", len(texts), time.perf_counter() - start, "rows")
+
+    assert vectorized.tolist() == legacy.tolist(), "vectorized extractor differs from legacy"
+    print(f"  parity: OK ({vectorized.notna().sum():,} bill numbers found)")
+
+
+# ============= ORDER GROUPING =============
+def legacy_group_order_text(df):
+    """The original groupby(...).agg(combine_text) with a per-group set."""
+    import pandas as pd
+
+    def combine_text(x):
+        return " ".join(set([str(s).strip() for s in x if pd.notna(s) and str(s).strip() != '']))
+
+    grouped = df.groupby('Temp_Order_ID')[['Reason', 'Remark']].agg(combine_text)
+    grouped['AI_Input'] = (grouped['Reason'] + " " + grouped['Remark']).str.strip()
+    return grouped
+
+
+def bench_grouping(args):
+    """combine_text groupby vs drop_duplicates + groupby-join grouping."""
+    from void_preprocessing import group_order_text
+
+    df = synthetic_listing(args.orders)
+    df['Temp_Order_ID'] = df['Order No'].ffill()
+    print(f"Order grouping benchmark: {args.orders:,} orders, {len(df):,} rows")
+
+    start = time.perf_counter()
+    legacy = legacy_group_order_text(df)
+    _report("groupby.agg(combine_text)", args.orders, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    grouped = group_order_text(df, 'Temp_Order_ID')
+    _report("group_order_text", args.orders, time.perf_counter() - start)
+
+    assert grouped.index.equals(legacy.index), "grouping changed the order index"
+    for col in ['Reason', 'Remark', 'AI_Input']:
+        same_tokens = [sorted(a.split()) == sorted(b.split()) for a, b in zip(grouped[col], legacy[col])]
+        assert all(same_tokens), f"{col} text differs from legacy grouping"
+    again = group_order_text(df, 'Temp_Order_ID')
+    assert again['AI_Input'].equals(grouped['AI_Input']), "grouping is not deterministic"
+    print("  parity: OK (same tokens per order, deterministic order)")
+
+
+# ============= STREAMING INGESTION =============
+def _write_listing(path, orders):
+    import pandas as pd
+
+    df = synthetic_listing(orders)
+    # Excel readers drop trailing blank rows, so keep both copies the same length
+    non_blank = df.notna().any(axis=1).values.nonzero()[0]
+    df = df.iloc[:non_blank[-1] + 1]
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+    return df
+
+
+def _timed_and_traced(fn):
+    """Run fn once for wall time and once under tracemalloc for peak bytes."""
+    import tracemalloc
+
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def bench_streaming(args):
+    """Whole-workbook pd.read_excel vs iter_order_chunks (time and peak memory)."""
+    import tempfile
+    import pandas as pd
+    from void_io import iter_order_chunks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "listing.xlsx")
+        source = _write_listing(path, args.orders)
+        print(f"Streaming ingestion benchmark: {args.orders:,} orders, {len(source):,} rows, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB workbook")
+
+        full, seconds, peak = _timed_and_traced(
+            lambda: pd.read_excel(path, dtype={'Void By ': str, 'Placed By': str, 'Void By': str}))
+        _report("pd.read_excel (whole file)", args.orders, seconds)
+        print(f"  {'':<32}peak {peak / 1e6:8.1f} MB")
+
+        def consume():
+            kept = []
+            largest = 0
+            for chunk in iter_order_chunks(path, args.chunk_orders):
+                assert pd.notna(chunk['Order No'].iloc[0]), "chunk starts mid-order"
+                largest = max(largest, chunk['Order No'].notna().sum())
+                kept.append(chunk[['Order No', 'Reason', 'Remark', 'Void By ']])
+            return kept, largest
+
+        (chunks, largest), seconds, peak = _timed_and_traced(consume)
+        _report(f"iter_order_chunks({args.chunk_orders})", args.orders, seconds)
+        print(f"  {'':<32}peak {peak / 1e6:8.1f} MB (incl. kept parity columns)")
+
+    streamed = pd.concat(chunks, ignore_index=True)
+    assert largest <= args.chunk_orders, "chunk exceeded its order budget"
+    for col in ['Order No', 'Reason', 'Remark', 'Void By ']:
+        assert streamed[col].fillna("").astype(str).equals(full[col].fillna("").astype(str)), \
+            f"{col} differs from pd.read_excel"
+    print(f"  parity: OK ({len(chunks)} chunks, no order split across chunks)")
+    _check_mixed_type_chunks(source)
+    _check_failed_run_keeps_output(source)
+
+
+def _check_mixed_type_chunks(source, parts=3):
+    """
+    ParquetChunkWriter over chunks whose first part has numeric IDs, amounts
+    and dates and whose later parts mix in alphanumeric order numbers, 'N/A'
+    phones and amounts and text in the date column, read back against the
+    expected values: nothing may be dropped on the way.
+    """
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from void_io import PARQUET_AVAILABLE, ParquetChunkWriter
+
+    if not PARQUET_AVAILABLE:
+        return
+    frame = source[['Order No', 'Contact no', 'Amount', 'Void Date']].copy()
+    blocks = np.array_split(np.arange(len(frame)), parts)
+    first = frame.index[blocks[0]]
+    frame['Order No'] = frame['Order No'].astype(object)
+    frame.loc[first, 'Order No'] = frame.loc[first, 'Order No'].str[2:].astype(float)
+    frame.loc[first, 'Contact no'] = frame.loc[first, 'Contact no'].astype(float)
+    later = frame.index[np.concatenate(blocks[1:])][::7]
+    frame['Amount'] = frame['Amount'].astype(object)
+    frame['Void Date'] = frame['Void Date'].astype(object)
+    frame.loc[later, 'Contact no'] = 'N/A'
+    frame.loc[later, 'Amount'] = 'N/A'
+    frame.loc[later, 'Void Date'] = 'unknown'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with ParquetChunkWriter(os.path.join(tmp, "mixed.xlsx")) as writer:
+            for block in blocks:
+                part = frame.iloc[block].copy()
+                for col in part.columns:
+                    part[col] = pd.Series(part[col].tolist(), index=part.index)  # re-infer dtypes per chunk
+                writer.write(part)
+        back = pd.read_parquet(os.path.join(tmp, "mixed.parquet"))
+
+    def as_text(values):
+        return [None if v is None or (not isinstance(v, str) and pd.isna(v))
+                else str(int(v)) if isinstance(v, float) and v.is_integer() else str(v) for v in values]
+
+    for col in frame.columns:
+        assert as_text(back[col]) == as_text(frame[col]), f"{col} differs"
+    assert sorted(writer.promoted) == ['Amount', 'Void Date'], f"unexpected promotions {writer.promoted}"
+    print(f"  mixed-type chunks: OK ({parts} Parquet chunks, numeric then text IDs; "
+          f"{len(later)} 'N/A' amounts and text dates kept, {' and '.join(writer.promoted)} stored as text)")
+
+
+def _check_failed_run_keeps_output(source, parts=3):
+    """A run that raises after some chunks leaves the previous xlsx and Parquet output as it was."""
+    import tempfile
+    import numpy as np
+    from void_io import PARQUET_AVAILABLE, ExcelChunkWriter, ParquetChunkWriter, columnar_path
+
+    blocks = np.array_split(np.arange(len(source)), parts)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "categorized.xlsx")
+        outputs = [path] + ([columnar_path(path)] if PARQUET_AVAILABLE else [])
+
+        def run(fail_after=None):
+            with (ParquetChunkWriter(path) if PARQUET_AVAILABLE else contextlib.nullcontext()) as columnar, \
+                    ExcelChunkWriter(path) as writer:
+                for n, block in enumerate(blocks):
+                    if n == fail_after:
+                        raise RuntimeError("simulated failure")
+                    writer.write(source.iloc[block])
+                    if columnar is not None:
+                        columnar.write(source.iloc[block])
+
+        run()
+        before = [open(p, "rb").read() for p in outputs]
+        try:
+            run(fail_after=1)
+        except RuntimeError:
+            pass
+        assert [open(p, "rb").read() for p in outputs] == before, "failed run overwrote the previous output"
+        assert sorted(os.listdir(tmp)) == sorted(os.path.basename(p) for p in outputs), "partial files left behind"
+    print(f"  failed run: OK (previous {' and '.join(os.path.splitext(p)[1] for p in outputs)} kept, "
+          f"no partial files)")
+
+
+# ============= COLUMNAR INTERMEDIATE =============
+def bench_columnar(args):
+    """Loading categorized output from the workbook vs its Parquet sibling."""
+    import tempfile
+    import pandas as pd
+    from void_io import PARQUET_AVAILABLE, TEXT_ID_COLUMNS, read_categorized, write_columnar
+
+    if not PARQUET_AVAILABLE:
+        raise SystemExit("pyarrow is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "categorized_orders_clean.xlsx")
+        df = _write_listing(excel_path, args.orders)
+        parquet_path = write_columnar(df, excel_path)
+        print(f"Categorized output load benchmark: {args.orders:,} orders, {len(df):,} rows "
+              f"(xlsx {os.path.getsize(excel_path) / 1e6:.1f} MB, "
+              f"parquet {os.path.getsize(parquet_path) / 1e6:.1f} MB)")
+
+        start = time.perf_counter()
+        from_excel = pd.read_excel(excel_path, dtype={col: str for col in TEXT_ID_COLUMNS})
+        _report("pd.read_excel", args.orders, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        from_parquet = read_categorized(excel_path)
+        _report("read_categorized (parquet)", args.orders, time.perf_counter() - start)
+
+    for col in df.columns:
+        if col == 'Contact no':
+            continue  # read_excel parses numeric-looking text; the parquet copy keeps it
+        assert from_parquet[col].fillna("").astype(str).equals(from_excel[col].fillna("").astype(str)), \
+            f"{col} differs from the workbook"
+    for col in ['Order Date', 'Void Date', 'Order Time']:
+        assert pd.api.types.is_datetime64_any_dtype(from_parquet[col]), f"{col} lost its datetime type"
+    assert from_parquet['Contact no'].dropna().str.startswith("07").all(), "phone numbers lost leading zeros"
+    print("  parity: OK (same values, datetimes and leading zeros preserved)")
+
+
+# ============= INCREMENTAL RUNS =============
+def overlapping_listings(orders, overlap=0.66, changed=0.02, seed=0):
+    """
+    Two monthly listings pulled with overlapping windows: the second repeats the
+    last `overlap` share of the first (a `changed` share of those with edited
+    remarks) and adds new orders.
+    """
+    import numpy as np
+    import pandas as pd
+
+    first = synthetic_listing(orders, seed)
+    order_of_row = first['Order No'].notna().cumsum() - 1
+    kept = first[order_of_row >= int(orders * (1 - overlap))].copy()
+    rng = np.random.default_rng(seed)
+    parents = kept.index[kept['Order No'].notna()]
+    edited = rng.choice(parents, size=int(len(parents) * changed), replace=False)
+    kept.loc[edited, 'Remark'] = kept.loc[edited, 'Remark'].fillna('') + ' customer called again'
+
+    fresh = synthetic_listing(orders - len(parents), seed + 1)
+    fresh['Order No'] = fresh['Order No'].str.replace('PH', 'PN', regex=False)
+    second = pd.concat([kept, fresh], ignore_index=True)
+    return first, second, len(parents) - len(edited)
+
+
+def bench_incremental(args):
+    """Full re-run of an overlapping month vs incremental mode reusing last month's output."""
+    import tempfile
+    import pandas as pd
+    import void_pipeline as vp
+    from fake_groq import FakeGroq
+    from text_clusters import normalize_remark
+
+    first, second, unchanged = overlapping_listings(args.orders)
+    print(f"Incremental benchmark: {args.orders:,} orders per month, {unchanged:,} repeated unchanged, "
+          f"AI verify on, clustering at {vp.CLUSTER_THRESHOLD}, latency {args.latency}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for name, frame in (("month1", first), ("month2", second)):
+            paths[name] = os.path.join(tmp, f"{name}.xlsx")
+            with pd.ExcelWriter(paths[name], engine="xlsxwriter") as writer:
+                frame.to_excel(writer, index=False)
+
+        def run(label, name, previous_path=None):
+            cache_file = os.path.join(tmp, vp.CACHE_FILE)
+            if os.path.exists(cache_file):
+                os.remove(cache_file)  # measure the fingerprint reuse, not the text cache
+            # Remarks that differ only in bill numbers and amounts get one label, as the
+            # clustering stage assumes; which member represents a cluster differs by run
+            client = FakeGroq(latency=args.latency, jitter=0, categories=vp.CATEGORIES,
+                              label_key=normalize_remark)
+            output = os.path.join(tmp, f"{name}_{'incremental' if previous_path else 'full'}.xlsx")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                vp.run_pipeline(paths[name], ["categorize"], output_path=output, ai_verify_rules=True,
+                                client=client, previous_path=previous_path)
+            seconds = time.perf_counter() - start
+            if label:
+                print(f"  {label:<32} {seconds:9.3f}s  {client.request_count:5d} LLM requests")
+            return output
+
+        month1 = run(None, "month1")
+        # Orders that failed last month must be classified again, not reused as "ERROR"
+        month1_df = vp.read_categorized(month1)
+        failed = month1_df.index[month1_df['Order No'].notna()][-(args.orders // 10):]
+        month1_df.loc[failed, 'Predicted_Category'] = 'ERROR'
+        with contextlib.redirect_stdout(io.StringIO()):
+            vp.save_categorized(month1_df, month1)
+        full = run("month 2, full re-run", "month2")
+        incremental = run("month 2, incremental", "month2", previous_path=month1)
+
+        full_df = vp.read_categorized(full)
+        inc_df = vp.read_categorized(incremental)
+    assert full_df['Predicted_Category'].fillna('').equals(inc_df['Predicted_Category'].fillna('')), \
+        "incremental run changed categories"
+    assert full_df['Extracted_New_Bill'].fillna('').astype(str).equals(
+        inc_df['Extracted_New_Bill'].fillna('').astype(str)), "incremental run changed bill numbers"
+    assert not (inc_df['Predicted_Category'] == 'ERROR').any(), "failed orders were reused"
+    print(f"  parity: OK (same categories and new bill numbers as the full re-run, "
+          f"{len(failed)} failed orders retried)")
+
+
+# ============= FRAUD FLAGS =============
+def synthetic_parent_df(orders, seed=0):
+    """prepare_parent_df over synthetic_listing with random predicted categories."""
+    import numpy as np
+    import void_pipeline as vp
+
+    df = synthetic_listing(orders, seed, max_children=0)
+    categories = np.array(vp.CATEGORIES + vp.NO_REASON_CATEGORIES, dtype=object)
+    df['Predicted_Category'] = categories[np.random.default_rng(seed).integers(0, len(categories), size=len(df))]
+    parent_df, order_col, _ = vp.prepare_parent_df(df)
+    return parent_df, order_col
+
+
+def legacy_fraud_scores(parent_df, amount_threshold, no_reason_categories):
+    """The original per-flag .loc increments and Fraud_Reasons string concatenation."""
+    parent_df['Fraud_Flags'] = 0
+    parent_df['Fraud_Reasons'] = ''
+    parent_df.loc[parent_df['Amount'] >= amount_threshold, 'Fraud_Flags'] += 1
+    parent_df.loc[parent_df['Amount'] >= amount_threshold, 'Fraud_Reasons'] += 'High Value; '
+    parent_df.loc[parent_df['Predicted_Category'].isin(no_reason_categories), 'Fraud_Flags'] += 2
+    parent_df.loc[parent_df['Predicted_Category'].isin(no_reason_categories), 'Fraud_Reasons'] += 'No Reason; '
+    parent_df.loc[parent_df['Predicted_Category'] == 'testing', 'Fraud_Flags'] += 1
+    parent_df.loc[parent_df['Predicted_Category'] == 'testing', 'Fraud_Reasons'] += 'Testing; '
+    parent_df.loc[parent_df['Is_Round'] == True, 'Fraud_Flags'] += 1
+    parent_df.loc[parent_df['Is_Round'] == True, 'Fraud_Reasons'] += 'Round Amount; '
+    late = (parent_df['Void_Hour'] >= 22) | (parent_df['Void_Hour'] <= 5)
+    parent_df.loc[late, 'Fraud_Flags'] += 1
+    parent_df.loc[late, 'Fraud_Reasons'] += 'Late Night; '
+    parent_df.loc[parent_df['Time_Gap_Hours'] > 24, 'Fraud_Flags'] += 2
+    parent_df.loc[parent_df['Time_Gap_Hours'] > 24, 'Fraud_Reasons'] += 'Extreme Delay; '
+    return parent_df
+
+
+def bench_fraud_flags(args):
+    """Per-flag .loc string concatenation vs the flag registry's matrix products."""
+    import numpy as np
+    import void_pipeline as vp
+
+    parent_df, _ = synthetic_parent_df(args.orders)
+    results = vp.FraudResults()
+    results.amount_threshold = parent_df['Amount'].quantile(0.95)
+    parent_df['Void_Hour'] = parent_df['Void_Date_Parsed'].dt.hour
+    parent_df['Is_Round'] = vp.is_suspiciously_round(parent_df['Amount'].to_numpy(dtype=float))
+    print(f"Fraud flag benchmark: {len(parent_df):,} orders, {len(vp.FRAUD_FLAGS)} flags")
+
+    start = time.perf_counter()
+    legacy = legacy_fraud_scores(parent_df.copy(), results.amount_threshold, vp.NO_REASON_CATEGORIES)
+    _report("per-flag .loc + string +=", len(parent_df), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    matrix = vp.flag_matrix(parent_df, results).astype(np.int64)
+    scores = matrix @ np.array([flag.weight for flag in vp.FRAUD_FLAGS], dtype=np.int64)
+    masks = matrix @ (np.int64(1) << np.arange(len(vp.FRAUD_FLAGS), dtype=np.int64))
+    seconds = time.perf_counter() - start
+    _report("flag matrix + 2 products", len(parent_df), seconds)
+
+    start = time.perf_counter()
+    shown = scores >= 2
+    vp.decode_reasons(masks[shown])
+    _report("  + decode high-risk reasons", int(shown.sum()), time.perf_counter() - start)
+    start = time.perf_counter()
+    reasons = vp.decode_reasons(masks)
+    _report("  + decode every order", len(parent_df), time.perf_counter() - start)
+
+    assert np.array_equal(scores, legacy['Fraud_Flags'].values), "Fraud_Flags differ"
+    assert list(reasons) == legacy['Fraud_Reasons'].tolist(), "Fraud_Reasons differ"
+    print("  parity: OK (same Fraud_Flags and Fraud_Reasons)")
+
+
+def legacy_is_suspiciously_round(amount, isna):
+    """The original per-row check (from Fraud_Detection_Analysis.ipynb); isna is pd.isna."""
+    if isna(amount) or amount < 1000:
+        return False
+    return amount % 1000 == 0 or amount % 500 == 0
+
+
+def bench_roundness(args):
+    """Series.apply of the per-row round check vs the vectorized round kernels."""
+    import numpy as np
+    import pandas as pd
+    import void_pipeline as vp
+
+    rng = np.random.default_rng(0)
+    amounts = np.round(rng.gamma(2.0, 1800.0, size=args.orders), -1)
+    amounts[rng.random(args.orders) < 0.05] = 5000.0
+    amounts[rng.random(args.orders) < 0.02] += 0.5
+    amounts[rng.random(args.orders) < 0.01] = np.nan
+    series = pd.Series(amounts)
+    print(f"Roundness benchmark: {args.orders:,} amounts")
+
+    start = time.perf_counter()
+    legacy = series.apply(legacy_is_suspiciously_round, isna=pd.isna).to_numpy(dtype=bool)
+    _report("Series.apply (per-row check)", args.orders, time.perf_counter() - start, "amounts")
+
+    start = time.perf_counter()
+    flagged = vp.is_suspiciously_round(amounts)
+    _report("is_suspiciously_round (array)", args.orders, time.perf_counter() - start, "amounts")
+
+    start = time.perf_counter()
+    graded = vp.roundness(amounts)
+    _report("roundness (graded)", args.orders, time.perf_counter() - start, "amounts")
+
+    assert np.array_equal(flagged, legacy), "round flags differ from the per-row check"
+    levels = pd.Series(graded[flagged]).round(3).value_counts().sort_index(ascending=False)
+    print(f"  parity: OK ({int(flagged.sum()):,} round amounts); roundness of flagged amounts: "
+          + ", ".join(f"{level:g} x{count:,}" for level, count in levels.head(5).items()))
+
+
+# ============= STAFF AND PHONE STATISTICS =============
+def legacy_voider_stats(parent_df, order_col):
+    """The original groupby().agg with a Series.mode lambda per voider."""
+    voider_stats = parent_df.groupby('Void By ').agg({
+        order_col: 'count',
+        'Amount': ['sum', 'mean', 'max'],
+        'Outlet': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Multiple'
+    }).reset_index()
+    voider_stats.columns = ['Void By', 'Void Count', 'Total Value', 'Avg Value', 'Max Value', 'Primary Outlet']
+    return voider_stats
+
+
+def legacy_phone_summary(phone_df, order_col):
+    """The original groupby().agg with a ', '.join(x.unique()[:3]) lambda per phone."""
+    phone_summary = phone_df.groupby('Contact_Clean').agg({
+        order_col: 'count',
+        'Amount': 'sum',
+        'Outlet': lambda x: ', '.join(x.unique()[:3])
+    }).reset_index()
+    phone_summary.columns = ['Contact No', 'Void Count', 'Total Value', 'Outlets']
+    return phone_summary
+
+
+def bench_staff_stats(args):
+    """Lambda aggregations vs named aggregations for voider and repeat-phone statistics."""
+    import numpy as np
+    import pandas as pd
+    import void_pipeline as vp
+
+    rng = np.random.default_rng(0)
+    orders = args.orders
+    parent_df = pd.DataFrame({
+        "Order No": [f"PH{100000 + i}" for i in range(orders)],
+        "Outlet": np.array(OUTLETS, dtype=object)[rng.integers(0, len(OUTLETS), size=orders)],
+        "Amount": np.round(rng.gamma(2.0, 1800.0, size=orders), -1),
+        "Void By ": np.array([f"{i:06d}" for i in range(args.voiders)], dtype=object)[
+            rng.integers(0, args.voiders, size=orders)],
+        "Contact_Clean": np.array([f"07{i:08d}" for i in range(args.phones)], dtype=object)[
+            rng.integers(0, args.phones, size=orders)],
+    })
+    phone_df = parent_df[parent_df['Contact_Clean'].map(parent_df['Contact_Clean'].value_counts()) > 1]
+    print(f"Staff/phone statistics benchmark: {orders:,} orders, {parent_df['Void By '].nunique():,} voiders, "
+          f"{phone_df['Contact_Clean'].nunique():,} repeat phones")
+
+    start = time.perf_counter()
+    legacy_voiders = legacy_voider_stats(parent_df, "Order No")
+    _report("voiders: agg with mode lambda", args.voiders, time.perf_counter() - start, "voiders")
+    start = time.perf_counter()
+    voiders = vp.voider_statistics(parent_df, "Order No")
+    _report("voiders: named aggregations", args.voiders, time.perf_counter() - start, "voiders")
+
+    start = time.perf_counter()
+    legacy_phones = legacy_phone_summary(phone_df, "Order No")
+    _report("phones: agg with join lambda", args.phones, time.perf_counter() - start, "phones")
+    start = time.perf_counter()
+    phones = vp.phone_statistics(phone_df, "Order No")
+    _report("phones: cumcount + pivot", args.phones, time.perf_counter() - start, "phones")
+
+    pd.testing.assert_frame_equal(voiders, legacy_voiders)
+    pd.testing.assert_frame_equal(phones, legacy_phones)
+    print("  parity: OK (same voider and phone tables)")
+
+
+# ============= VOID VELOCITY =============
+def bench_velocity(args):
+    """Rolling-window velocity detector vs the global frequent-voider threshold on injected bursts."""
+    import numpy as np
+    import pandas as pd
+    import void_pipeline as vp
+    from void_velocity import void_velocity
+
+    parent_df, order_col = synthetic_parent_df(args.orders)
+    rng = np.random.default_rng(1)
+    staff = parent_df['Void By '].unique()
+    burst_staff = rng.choice(staff, size=args.bursts, replace=False)
+    injected = []
+    for i, voider in enumerate(burst_staff):
+        rows = parent_df.sample(args.burst_size, random_state=i).copy()
+        start = parent_df['Void_Date_Parsed'].min() + pd.Timedelta(days=float(rng.uniform(1, 28)))
+        rows['Void By '] = voider
+        rows['Void_Date_Parsed'] = start + pd.to_timedelta(np.sort(rng.uniform(0, 45, args.burst_size)), unit="min")
+        rows[order_col] = [f"BURST{i}-{j}" for j in range(args.burst_size)]
+        injected.append(rows)
+    parent_df = pd.concat([parent_df, *injected], ignore_index=True)
+    per_staff = len(parent_df) / len(staff)
+    print(f"Velocity benchmark: {len(parent_df):,} orders, {len(staff):,} staff (~{per_staff:.0f} voids each), "
+          f"{args.bursts} injected bursts of {args.burst_size} voids in 45 minutes")
+
+    start = time.perf_counter()
+    velocity = void_velocity(parent_df)
+    _report("void_velocity (2 keys x 3 windows)", len(parent_df), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    fraud = vp.detect_fraud(parent_df, order_col)
+    _report("detect_fraud (all flags)", len(parent_df), time.perf_counter() - start)
+
+    bursts = fraud.velocity_voids
+    caught = bursts[bursts[order_col].str.startswith("BURST")][order_col].str.split("-").str[0].nunique()
+    frequent = set(fraud.frequent_voiders['Void By'])
+    global_caught = sum(voider in frequent for voider in burst_staff)
+    false_alarms = (~bursts[order_col].str.startswith("BURST")).sum()
+    print(f"  {'global count > 1.5 x average':<36} {global_caught:3d}/{args.bursts} bursts flagged")
+    print(f"  {f'rolling window z >= {vp.VELOCITY_Z_THRESHOLD:g}':<36} {caught:3d}/{args.bursts} bursts flagged, "
+          f"{false_alarms:,} other voids flagged ({false_alarms / len(parent_df):.3%})")
+    assert velocity.index.equals(parent_df.index)
+
+
+# ============= COLLUSION GRAPH =============
+def bench_collusion(args):
+    """Sparse collusion graph on a large listing with injected staff pairs and shared phones."""
+    import numpy as np
+    from collusion_graph import CollusionGraph
+
+    parent_df, _ = synthetic_parent_df(args.orders)
+    rng = np.random.default_rng(2)
+    staff = parent_df['Void By '].unique()
+    chosen = rng.choice(staff, size=2 * args.pairs + 3 * args.phones, replace=False)
+    pairs = chosen[:2 * args.pairs].reshape(-1, 2)
+    phone_staff = chosen[2 * args.pairs:].reshape(-1, 3)
+    rows = rng.permutation(len(parent_df))
+    placed, voided = parent_df['Placed By'].to_numpy().copy(), parent_df['Void By '].to_numpy().copy()
+    phones = parent_df['Contact no'].to_numpy().copy()
+    used = 0
+    for placer, voider in pairs:
+        take = rows[used:used + args.pair_voids]
+        placed[take], voided[take] = placer, voider
+        used += args.pair_voids
+    for i, members in enumerate(phone_staff):
+        for member in members:
+            take = rows[used:used + args.phone_voids]
+            voided[take], phones[take] = member, f"0799{i:06d}"
+            used += args.phone_voids
+    parent_df['Placed By'], parent_df['Void By '] = placed, voided
+    parent_df['Contact_Clean'] = phones
+    print(f"Collusion benchmark: {len(parent_df):,} orders, {len(staff):,} staff, "
+          f"{args.pairs} injected pairs x {args.pair_voids} voids, "
+          f"{args.phones} phones shared by 3 staff x {args.phone_voids} voids")
+
+    start = time.perf_counter()
+    graph = CollusionGraph(parent_df)
+    _report("CollusionGraph (3 sparse matrices)", len(parent_df), time.perf_counter() - start)
+    start = time.perf_counter()
+    dense = graph.dense_pairs()
+    shared = graph.shared_phones()
+    groups = graph.groups(dense, shared)
+    _report("pairs + phones + components", len(parent_df), time.perf_counter() - start)
+
+    stored = sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+                 for m in (graph.placed_voided, graph.voided_value, graph.staff_phone, graph.staff_outlet))
+    dense_bytes = 8 * len(graph.staff) * (2 * len(graph.staff) + len(graph.phones) + len(graph.outlets))
+    print(f"  {'sparse matrices':<32} {stored / 1e6:9.1f} MB  (dense float64: {dense_bytes / 1e9:,.1f} GB)")
+
+    injected = set(map(tuple, pairs))
+    found = set(zip(dense['Placed By'], dense['Void By']))
+    phone_found = set(shared['Contact No']) & {f"0799{i:06d}" for i in range(args.phones)}
+    print(f"  {'dense pairs':<32} {len(found & injected):3d}/{args.pairs} injected found, "
+          f"{len(found - injected)} other pairs reported")
+    print(f"  {'shared phones':<32} {len(phone_found):3d}/{args.phones} injected found, "
+          f"{len(shared) - len(phone_found)} other phones reported")
+    print(f"  {'connected groups':<32} {len(groups):3d} groups, "
+          f"largest {groups['Staff Count'].max() if len(groups) else 0} staff")
+
+
+# ============= EXCEL EXPORT =============
+def legacy_styled_excel(df, path):
+    """The original df.style.apply(highlight_rows, axis=1).to_excel export."""
+    def highlight_rows(row):
+        styles = [''] * len(row)
+        cat_val = row['Predicted_Category']
+        if cat_val == "no reason/remark":
+            styles[row.index.get_loc('Predicted_Category')] = 'background-color: #FFFF00'
+        elif cat_val == "voids without clear reason/ remark":
+            styles[row.index.get_loc('Predicted_Category')] = 'background-color: #FFD700'
+        elif cat_val == "ERROR":
+            styles[row.index.get_loc('Predicted_Category')] = 'background-color: #FF6B6B'
+        return styles
+
+    df.style.apply(highlight_rows, axis=1).to_excel(path, index=False)
+
+
+def bench_excel_writer(args):
+    """Styler export vs write_categorized_excel (time, peak memory, same cells)."""
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from openpyxl import load_workbook
+    from void_io import CATEGORY_HIGHLIGHTS, TEXT_ID_COLUMNS, write_categorized_excel
+
+    df = synthetic_listing(args.orders)
+    categories = np.array(["phone", "location", "ERROR", *CATEGORY_HIGHLIGHTS], dtype=object)
+    predicted = categories[np.random.default_rng(3).integers(0, len(categories), size=len(df))]
+    df['Predicted_Category'] = np.where(df['Order No'].notna(), predicted, None)
+    print(f"Excel export benchmark: {args.orders:,} orders, {len(df):,} rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        styled_path = os.path.join(tmp, "styled.xlsx")
+        fast_path = os.path.join(tmp, "fast.xlsx")
+
+        _, seconds, peak = _timed_and_traced(lambda: legacy_styled_excel(df, styled_path))
+        _report("df.style.apply + to_excel", args.orders, seconds)
+        print(f"  {'':<32}peak {peak / 1e6:8.1f} MB")
+
+        _, seconds, peak = _timed_and_traced(lambda: write_categorized_excel(df, fast_path))
+        _report("write_categorized_excel", args.orders, seconds)
+        print(f"  {'':<32}peak {peak / 1e6:8.1f} MB")
+
+        read = {col: str for col in TEXT_ID_COLUMNS}
+        styled = pd.read_excel(styled_path, dtype=read)
+        fast = pd.read_excel(fast_path, dtype=read)
+        ws = load_workbook(fast_path).active
+        rules = [rule for cf in ws.conditional_formatting for rule in cf.rules]
+
+    for col in df.columns:
+        assert fast[col].fillna("").astype(str).equals(styled[col].fillna("").astype(str)), \
+            f"{col} differs from the styled export"
+    colors = {rule.dxf.fill.bgColor.rgb[-6:] for rule in rules}
+    assert colors == set(CATEGORY_HIGHLIGHTS.values()), "highlight rules missing"
+    print(f"  parity: OK (same cells, {len(rules)} Predicted_Category highlight rules)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Void bills pipeline benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("dispatch", help="concurrent LLM dispatch vs serial loop (fake Groq)")
+    p.add_argument("--orders", type=int, default=400)
+    p.add_argument("--latency", type=float, default=0.5)
+    p.add_argument("--rpm", type=int, default=600)
+    p.add_argument("--in-flight", type=int, default=8)
+    p.set_defaults(func=bench_dispatch)
+
+    p = sub.add_parser("prompt", help="prompt tokens per order: per-batch prompt vs cached prefix + packing")
+    p.add_argument("--orders", type=int, default=2000)
+    p.set_defaults(func=bench_prompt)
+
+    p = sub.add_parser("adaptive", help="adaptive batch size vs fixed padded batches (fake Groq)")
+    p.add_argument("--orders", type=int, default=1000)
+    p.add_argument("--latency", type=float, default=0.05)
+    p.add_argument("--per-item", type=float, default=0.002)
+    p.add_argument("--reliable", type=int, default=25)
+    p.set_defaults(func=bench_adaptive)
+
+    p = sub.add_parser("clustering", help="near-duplicate remark clustering vs exact dedupe")
+    p.add_argument("--orders", type=int, default=100_000)
+    p.add_argument("--batch-size", type=int, default=40)
+    p.add_argument("--thresholds", type=float, nargs="+", default=[0.95, 0.85, 0.7])
+    p.set_defaults(func=bench_clustering)
+
+    p = sub.add_parser("local-model", help="local TF-IDF classifier tier: LLM texts avoided vs accuracy")
+    p.add_argument("--train", type=int, default=20_000)
+    p.add_argument("--orders", type=int, default=50_000)
+    p.add_argument("--typo-rate", type=float, default=0.8)
+    p.add_argument("--label-noise", type=float, default=0.05)
+    p.add_argument("--unseen", type=int, default=5)
+    p.add_argument("--batch-size", type=int, default=40)
+    p.set_defaults(func=bench_local_model)
+
+    p = sub.add_parser("verify-gate", help="AI verification of every rule hit vs only ambiguous ones")
+    p.add_argument("--history", type=int, default=20_000)
+    p.add_argument("--orders", type=int, default=50_000)
+    p.add_argument("--ambiguous", type=float, default=0.1)
+    p.add_argument("--label-noise", type=float, default=0.05)
+    p.add_argument("--batch-size", type=int, default=40)
+    p.set_defaults(func=bench_verify_gate)
+
+    p = sub.add_parser("retry", help="flat retries vs backoff + circuit breaker (fake Groq faults)")
+    p.add_argument("--orders", type=int, default=400)
+    p.add_argument("--latency", type=float, default=0.1)
+    p.add_argument("--error-rate", type=float, default=0.2)
+    p.add_argument("--base-delay", type=float, default=0.5)
+    p.add_argument("--in-flight", type=int, default=4)
+    p.set_defaults(func=bench_retry)
+
+    p = sub.add_parser("rules", help="keyword rule engine vs legacy per-pattern loop")
+    p.add_argument("--orders", type=int, default=50_000)
+    p.add_argument("--extra-rules", type=int, default=0)
+    p.set_defaults(func=bench_rules)
+
+    p = sub.add_parser("rules-parallel", help="rule pass sharded across 1/2/4/8 worker processes")
+    p.add_argument("--orders", type=int, default=1_000_000)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.set_defaults(func=bench_rules_parallel)
+
+    p = sub.add_parser("bill-ids", help="vectorized new bill number extraction vs row-wise apply")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.set_defaults(func=bench_bill_ids)
+
+    p = sub.add_parser("grouping", help="order text grouping vs combine_text lambda")
+    p.add_argument("--orders", type=int, default=200_000)
+    p.set_defaults(func=bench_grouping)
+
+    p = sub.add_parser("streaming", help="chunked workbook reader vs pd.read_excel")
+    p.add_argument("--orders", type=int, default=20_000)
+    p.add_argument("--chunk-orders", type=int, default=2000)
+    p.set_defaults(func=bench_streaming)
+
+    p = sub.add_parser("columnar", help="Parquet sibling vs pd.read_excel for categorized output")
+    p.add_argument("--orders", type=int, default=50_000)
+    p.set_defaults(func=bench_columnar)
+
+    p = sub.add_parser("incremental", help="incremental month-over-month run vs full re-run (fake Groq)")
+    p.add_argument("--orders", type=int, default=5000)
+    p.add_argument("--latency", type=float, default=0.02)
+    p.set_defaults(func=bench_incremental)
+
+    p = sub.add_parser("fraud-flags", help="fraud flag registry matrix vs per-flag .loc string concatenation")
+    p.add_argument("--orders", type=int, default=1_000_000)
+    p.set_defaults(func=bench_fraud_flags)
+
+    p = sub.add_parser("roundness", help="vectorized round-amount kernels vs per-row apply")
+    p.add_argument("--orders", type=int, default=1_000_000)
+    p.set_defaults(func=bench_roundness)
+
+    p = sub.add_parser("staff-stats", help="named aggregations vs lambda groupby for voider/phone statistics")
+    p.add_argument("--orders", type=int, default=500_000)
+    p.add_argument("--voiders", type=int, default=100_000)
+    p.add_argument("--phones", type=int, default=100_000)
+    p.set_defaults(func=bench_staff_stats)
+
+    p = sub.add_parser("velocity", help="rolling-window void bursts vs global frequent-voider threshold")
+    p.add_argument("--orders", type=int, default=100_000)
+    p.add_argument("--bursts", type=int, default=20)
+    p.add_argument("--burst-size", type=int, default=10)
+    p.set_defaults(func=bench_velocity)
+
+    p = sub.add_parser("collusion", help="sparse placed-by/void-by graph: build time, memory, injected pairs found")
+    p.add_argument("--orders", type=int, default=1_000_000)
+    p.add_argument("--pairs", type=int, default=20)
+    p.add_argument("--pair-voids", type=int, default=6)
+    p.add_argument("--phones", type=int, default=10)
+    p.add_argument("--phone-voids", type=int, default=4)
+    p.set_defaults(func=bench_collusion)
+
+    p = sub.add_parser("excel-writer", help="constant-memory Excel export vs df.style.apply")
+    p.add_argument("--orders", type=int, default=20_000)
+    p.set_defaults(func=bench_excel_writer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
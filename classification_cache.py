@@ -0,0 +1,138 @@
+"""
+Persistent Classification Cache
+SQLite store of AI predictions keyed by normalized void text, model name and
+prompt hash, so repeated remarks are only sent to the model once.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_FILE = "classification_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Results that must never be served from the cache
+UNCACHEABLE = {None, "ERROR"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivially different remarks share a key."""
+    return _WHITESPACE.sub(" ", str(text)).strip().lower()
+
+
+def prompt_hash(*parts):
+    """Short stable hash of the prompt template(s) used for a classifier."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class ClassificationCache:
+    """On-disk LRU cache of text -> category with hit/miss counters."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, model="", prompt_version="",
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY, category TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON predictions(last_used)")
+        self.conn.commit()
+
+    def _key(self, text):
+        raw = f"{self.model}\0{self.prompt_version}\0{normalize_text(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, texts):
+        """Return cached categories aligned with texts (None for a miss)."""
+        keys = [self._key(t) for t in texts]
+        found = {}
+        with self.lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, category FROM predictions WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.conn.executemany("UPDATE predictions SET last_used = ? WHERE key = ?",
+                                      [(now, k) for k in found])
+                self.conn.commit()
+
+        results = [found.get(k) for k in keys]
+        hit_count = sum(1 for r in results if r is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def store(self, texts, categories):
+        """Save fresh predictions and evict least recently used entries past max_entries."""
+        now = time.time()
+        rows = [(self._key(t), c, now) for t, c in zip(texts, categories) if c not in UNCACHEABLE]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", rows)
+            size = self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            if size > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM predictions WHERE key IN ("
+                    " SELECT key FROM predictions ORDER BY last_used ASC LIMIT ?)",
+                    (size - self.max_entries,),
+                )
+            self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"Cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self)} entries"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def classify_with_cache(texts, classify_texts, cache=None, keys=None):
+    """
+    Answer texts from the cache and send only the unique misses to classify_texts.
+    classify_texts takes a list of texts and returns predictions in the same order.
+    keys, if given, are what the cache is looked up and stored under in place
+    of the texts themselves (e.g. a normalized form); the texts are still what
+    classify_texts receives.
+    """
+    if cache is None:
+        return classify_texts(texts)
+
+    keys = texts if keys is None else keys
+    cached = cache.lookup(keys)
+    misses = {}
+    for text, key, category in zip(texts, keys, cached):
+        if category is None:
+            misses.setdefault(normalize_text(key), (text, key))
+    fresh = {}
+    if misses:
+        pending = list(misses.values())
+        fresh = dict(zip(misses, classify_texts([text for text, _ in pending])))
+        cache.store([key for _, key in pending], list(fresh.values()))
+    return [c if c is not None else fresh[normalize_text(k)] for k, c in zip(keys, cached)]
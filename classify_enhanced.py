@@ -4,13 +4,20 @@ Uses comprehensive prompt engineering for maximum accuracy with openai/gpt-oss-1
 No rule-based classification - 100% AI powered
 """
 
+import argparse
 import os
 import pandas as pd
 import json
-import time
 import re
 from tqdm import tqdm
 from groq import Groq
+from llm_dispatch import AdaptiveBatcher, TokenBucket, UsageMeter, dispatch_adaptive
+from llm_retry import SDK_MAX_RETRIES, Retrier
+from classification_cache import ClassificationCache, classify_with_cache, prompt_hash
+from run_journal import RunJournal, journal_path, run_key
+from text_clusters import ClusterStage
+from void_io import read_categorized, write_categorized_excel, write_columnar
+from void_preprocessing import extract_new_bill_ids, group_order_text, previous_results, reuse_previous
 
 try:
     from dotenv import load_dotenv
@@ -24,10 +31,23 @@ if not API_KEY:
 
 INPUT_FILE = "PH_VoidBillListing-dec.xlsx"
 OUTPUT_FILE = "categorized_orders_clean.xlsx"
-BATCH_SIZE = 10
+BATCH_SIZE = 10             # Starting texts per request; adapted during the run
+MAX_BATCH_SIZE = 40         # Upper bound on texts per request
+BATCH_TOKEN_BUDGET = 1200   # Estimated input+output tokens for the texts of one request
+COMPACT_PROMPT = False      # Drop the worked examples from the system prompt
+CLUSTER_THRESHOLD = 1.0     # Same normalized remark -> one LLM call; < 1 adds near-duplicates (None to disable)
 MODEL_NAME = "openai/gpt-oss-120b"
-
-client = Groq(api_key=API_KEY)
+MAX_IN_FLIGHT = 4           # Concurrent batches sent to Groq
+REQUESTS_PER_MINUTE = 30    # Starting pace, refined from rate-limit headers
+CACHE_FILE = "classification_cache.sqlite"
+CACHE_MAX_ENTRIES = 100_000
+
+client = Groq(api_key=API_KEY, max_retries=SDK_MAX_RETRIES)
+rate_limiter = TokenBucket(REQUESTS_PER_MINUTE)
+usage_meter = UsageMeter()
+batcher = AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+retrier = Retrier(log=lambda message: print(f"\n  {message}"))
+cluster_stage = ClusterStage(CLUSTER_THRESHOLD)
 
 # All valid category names
 VALID_CATEGORIES = [
@@ -56,13 +76,12 @@ VALID_CATEGORIES = [
 ]
 
 
-def build_comprehensive_prompt(text_list):
-    """
-    Build the most comprehensive prompt with ALL details for maximum accuracy.
-    This is a 100% AI-only classification approach.
-    """
-    
-    prompt = f'''You are an expert classifier for Pizza Hut Sri Lanka void order reasons. Your task is to analyze WHY each order was voided/cancelled based on staff notes.
+SYSTEM_MESSAGE = "You are a precise JSON classification API for Pizza Hut Sri Lanka void orders. Output ONLY valid JSON with a 'predictions' array. Each prediction must be exactly one of the valid category names."
+
+# The static part of the prompt goes in the system message so every request
+# shares the same prefix and the provider can cache it; the user message only
+# carries the batch.
+PROMPT_CONTEXT = '''You are an expert classifier for Pizza Hut Sri Lanka void order reasons. Your task is to analyze WHY each order was voided/cancelled based on staff notes.
 
 ═══════════════════════════════════════════════════════════════════════════════
                               CRITICAL CONTEXT
@@ -106,8 +125,9 @@ COMMON MISSPELLINGS:
   didnt, didn = didn't
   infomed = informed
   acording = according
+'''
 
-═══════════════════════════════════════════════════════════════════════════════
+PROMPT_CATEGORIES = '''═══════════════════════════════════════════════════════════════════════════════
                               22 CATEGORIES
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -374,8 +394,9 @@ COMMON MISSPELLINGS:
     │   ✓ "supreme pizza"
     │   ✓ "2 large pizzas"
     └── USE WHEN: Text describes WHAT was ordered, not WHY it was voided
+'''
 
-═══════════════════════════════════════════════════════════════════════════════
+PROMPT_PRIORITY = '''═══════════════════════════════════════════════════════════════════════════════
                            DECISION PRIORITY RULES
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -403,8 +424,9 @@ When multiple categories could apply, use this priority:
 20. "product issue or complain" - Quality complaints
 21. "voids without clear reason/ remark" - No clear reason
 22. "other" - LAST RESORT ONLY
+'''
 
-═══════════════════════════════════════════════════════════════════════════════
+PROMPT_EXAMPLES = '''═══════════════════════════════════════════════════════════════════════════════
                               EXAMPLES TO LEARN FROM
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -486,14 +508,11 @@ Example 19: "customer wants large instead of medium"
 
 Example 20: "out of grid location"
 → Category: "grid issue"
-→ Why: Outside delivery coverage
+→ Why: Outside delivery coverage'''
 
+PROMPT_OUTPUT_RULES = f'''═══════════════════════════════════════════════════════════════════════════════
+                              OUTPUT FORMAT
 ═══════════════════════════════════════════════════════════════════════════════
-                              YOUR TASK
-═══════════════════════════════════════════════════════════════════════════════
-
-Classify each of these void order reasons:
-{json.dumps(text_list, indent=2)}
 
 RESPOND WITH ONLY A JSON OBJECT:
 {{"predictions": ["category1", "category2", ...]}}
@@ -502,109 +521,121 @@ Each prediction MUST be one of these exact strings:
 {json.dumps(VALID_CATEGORIES, indent=2)}
 
 CRITICAL REMINDERS:
-1. One category per input text
+1. One category per input text, in the same order as the inputs
 2. Use exact category names (case-sensitive)
 3. "customer not available" → "cus.related issue" (NOT "out of stock")
 4. Just a bill number/order description with no reason → "voids without clear reason/ remark"
-5. Only use "other" when nothing else fits at all
-'''
+5. Only use "other" when nothing else fits at all'''
+
+# Category descriptions without their per-category example lists
+_EXAMPLE_LINES = re.compile(r"^ *[│ ]*([├└]── EXAMPLES:|│?\s*✓).*\n", re.MULTILINE)
+
 
-    return prompt
+def build_system_prompt(compact=False):
+    """
+    The reusable prompt prefix: taxonomy, dictionary, priorities and output rules.
+    compact drops the worked examples (roughly 40% fewer tokens) for cheaper runs.
+    """
+    if compact:
+        sections = [PROMPT_CONTEXT, _EXAMPLE_LINES.sub("", PROMPT_CATEGORIES), PROMPT_PRIORITY]
+    else:
+        sections = [PROMPT_CONTEXT, PROMPT_CATEGORIES, PROMPT_PRIORITY, PROMPT_EXAMPLES]
+    return "\n\n".join(part.strip() for part in [SYSTEM_MESSAGE, *sections, PROMPT_OUTPUT_RULES])
+
+
+def build_batch_prompt(text_list):
+    """The per-request part of the prompt: just the texts to classify."""
+    return f'''Classify each of these void order reasons:
+{json.dumps(text_list, indent=2)}
 
+Return exactly {len(text_list)} predictions, one per input text, in order.'''
 
-def classify_batch_ai(text_list, retry_count=3):
-    """AI-only classification with comprehensive prompting and retry logic."""
+
+SYSTEM_PROMPT = build_system_prompt(COMPACT_PROMPT)
+
+
+def send_request(prompt):
+    """One chat completion call, paced by the rate limiter."""
+    rate_limiter.acquire()
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=MODEL_NAME,
+            messages=[
+                {
+                    "role": "system", 
+                    "content": SYSTEM_PROMPT
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"},
+            timeout=60
+        )
+    except Exception as e:
+        # Let a 429's headers hold back the other workers too
+        rate_limiter.update_from_headers(getattr(getattr(e, "response", None), "headers", None))
+        raise
+    completion = raw.parse()
+    usage = getattr(completion, "usage", None)
+    rate_limiter.update_from_headers(raw.headers, getattr(usage, "total_tokens", None))
+    usage_meter.record(usage)
+    return completion
+
+
+def classify_batch_ai(text_list):
+    """AI-only classification with comprehensive prompting; retries go through retrier."""
     
-    prompt = build_comprehensive_prompt(text_list)
+    prompt = build_batch_prompt(text_list)
     
-    for attempt in range(retry_count):
-        try:
-            completion = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a precise JSON classification API for Pizza Hut Sri Lanka void orders. Output ONLY valid JSON with a 'predictions' array. Each prediction must be exactly one of the valid category names."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                response_format={"type": "json_object"},
-                timeout=60
-            )
-            
-            response_text = completion.choices[0].message.content
-            data = json.loads(response_text)
-            predictions = data.get("predictions", [])
-            
-            # Validate and normalize predictions
-            validated = []
-            for pred in predictions:
-                pred_clean = str(pred).strip()
-                if pred_clean in VALID_CATEGORIES:
-                    validated.append(pred_clean)
-                else:
-                    # Try case-insensitive match
-                    matched = False
+    try:
+        completion = retrier.call(send_request, prompt)
+        response_text = completion.choices[0].message.content
+        data = json.loads(response_text)
+        predictions = data.get("predictions", [])
+        
+        # Validate and normalize predictions
+        validated = []
+        for pred in predictions:
+            pred_clean = str(pred).strip()
+            if pred_clean in VALID_CATEGORIES:
+                validated.append(pred_clean)
+            else:
+                # Try case-insensitive match
+                matched = False
+                for cat in VALID_CATEGORIES:
+                    if cat.lower() == pred_clean.lower():
+                        validated.append(cat)
+                        matched = True
+                        break
+                if not matched:
+                    # Try partial match
                     for cat in VALID_CATEGORIES:
-                        if cat.lower() == pred_clean.lower():
+                        if pred_clean.lower() in cat.lower() or cat.lower() in pred_clean.lower():
                             validated.append(cat)
                             matched = True
                             break
-                    if not matched:
-                        # Try partial match
-                        for cat in VALID_CATEGORIES:
-                            if pred_clean.lower() in cat.lower() or cat.lower() in pred_clean.lower():
-                                validated.append(cat)
-                                matched = True
-                                break
-                    if not matched:
-                        validated.append("other")
-            
-            # Ensure we have right number of predictions
-            while len(validated) < len(text_list):
-                validated.append("other")
-            validated = validated[:len(text_list)]
-            
-            return validated
-            
-        except json.JSONDecodeError as e:
-            print(f"\n  JSON Parse Error (attempt {attempt+1}/{retry_count}): {e}")
-            if attempt < retry_count - 1:
-                time.sleep(2)
-                continue
-            return ["other"] * len(text_list)
-        except Exception as e:
-            print(f"\n  API Error (attempt {attempt+1}/{retry_count}): {e}")
-            if attempt < retry_count - 1:
-                time.sleep(3)
-                continue
-            return ["ERROR"] * len(text_list)
-
-
-def extract_new_bill_id(text):
-    """Extract new bill numbers from text."""
-    if not text or pd.isna(text):
-        return None
-    clean_text = str(text).upper()
-    patterns = [
-        r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})',
-        r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})',
-        r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, clean_text)
-        if match:
-            result = match.group(1).replace(" ", "").replace("-", "")
-            if len(result) >= 2:
-                return result
-    match = re.search(r'\b([A-Z]{1,2}\d{4,7})\b', clean_text)
-    if match:
-        return match.group(1)
-    return None
-
-
-def main():
+                if not matched:
+                    validated.append("other")
+        
+        # A short list is returned as-is: the batcher re-splits the batch
+        return validated
+        
+    except json.JSONDecodeError as e:
+        print(f"\n  JSON Parse Error ({len(text_list)} texts): {e}")
+        return []
+    except Exception as e:
+        print(f"\n  API Error ({len(text_list)} texts): {e}")
+        return ["ERROR"] * len(text_list)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI-only void bills classification")
+    parser.add_argument("--resume", action="store_true",
+                        help="reuse orders already classified by an interrupted run of the same input")
+    parser.add_argument("--previous", metavar="CATEGORIZED",
+                        help="earlier categorized output; unchanged orders reuse its results (incremental mode)")
+    args = parser.parse_args(argv)
+
     print("="*60)
     print("AI-ONLY VOID BILLS CLASSIFICATION")
     print("100% AI powered with comprehensive prompts")
@@ -621,15 +652,19 @@ def main():
     order_col_name = 'Order No'
     df['Temp_Order_ID'] = df[order_col_name].ffill()
 
-    def combine_text(x):
-        return " ".join(set([str(s).strip() for s in x if pd.notna(s) and str(s).strip() != '']))
-
-    grouped = df.groupby('Temp_Order_ID')[['Reason', 'Remark']].agg(combine_text)
-    grouped['AI_Input'] = (grouped['Reason'] + " " + grouped['Remark']).str.strip()
+    grouped = group_order_text(df, 'Temp_Order_ID')
+    
+    reused, reused_bills = {}, {}
+    if args.previous:
+        print(f"Loading previous results from {args.previous}...")
+        reused, reused_bills = reuse_previous(df, grouped, previous_results(read_categorized(args.previous)))
+        grouped = grouped[~grouped.index.isin(list(reused))].copy()
+        print(f"Incremental: {len(reused)} orders reused, {len(grouped)} new or changed")
     
     print("Extracting New Bill Numbers...")
-    grouped['Extracted_Bill_No'] = grouped['AI_Input'].apply(extract_new_bill_id)
+    grouped['Extracted_Bill_No'] = extract_new_bill_ids(grouped['AI_Input'])
     bill_number_map = grouped['Extracted_Bill_No'].to_dict()
+    bill_number_map.update(reused_bills)
 
     orders_with_text = grouped[grouped['AI_Input'].str.len() > 1].copy()
     orders_empty = grouped[grouped['AI_Input'].str.len() <= 1].index.tolist()
@@ -639,32 +674,64 @@ def main():
     print(f"Empty Orders: {len(orders_empty)}")
     
     category_map = {}
+    journal = None
     
     # AI-only classification for ALL orders with text
     if len(orders_with_text) > 0:
         print(f"\n[AI Classification] Processing {len(orders_with_text)} orders...")
-        print(f"  Batch size: {BATCH_SIZE}")
+        print(f"  Batch size: {BATCH_SIZE} texts to start, up to {MAX_BATCH_SIZE} / {BATCH_TOKEN_BUDGET} tokens")
+        print(f"  Batches in flight: {MAX_IN_FLIGHT}")
         print(f"  Model: {MODEL_NAME}")
         print()
         
-        ids_to_classify = orders_with_text.index.tolist()
-        texts_to_classify = orders_with_text['AI_Input'].tolist()
-        ai_predictions = []
+        prompt_version = prompt_hash(SYSTEM_PROMPT, build_batch_prompt([]))
+        journal = RunJournal(journal_path(INPUT_FILE), run_key(INPUT_FILE, MODEL_NAME, prompt_version),
+                             resume=args.resume)
+        if journal.stale:
+            print("  Journal belongs to a different input or prompt; starting over")
+        category_map.update(journal.completed)
+        remaining = orders_with_text[~orders_with_text.index.isin(list(journal.completed))]
+        if journal.completed:
+            print(f"  Resuming: {len(journal.completed)} orders already classified, {len(remaining)} left")
+        
+        ids_to_classify = remaining.index.tolist()
+        texts_to_classify = remaining['AI_Input'].tolist()
+        journal.track(ids_to_classify, cluster_stage.canonical(texts_to_classify))
         
-        total_batches = (len(texts_to_classify) + BATCH_SIZE - 1) // BATCH_SIZE
+        cache = ClassificationCache(
+            CACHE_FILE, model=MODEL_NAME,
+            prompt_version=prompt_version,
+            max_entries=CACHE_MAX_ENTRIES
+        )
         
-        for i in tqdm(range(0, len(texts_to_classify), BATCH_SIZE), 
-                      desc="Processing", total=total_batches):
-            batch = texts_to_classify[i:i+BATCH_SIZE]
-            batch_results = classify_batch_ai(batch)
+        def classify_texts(texts):
+            print(f"  Sending {len(texts)} uncached texts to the API")
             
-            # Ensure correct length
-            while len(batch_results) < len(batch):
-                batch_results.append("other")
-            batch_results = batch_results[:len(batch)]
+            def batch_done(start, results):
+                journal.record_texts(cluster_stage.canonical(texts[start:start + len(results)]), results)
+                pbar.update(len(results))
             
-            ai_predictions.extend(batch_results)
-            time.sleep(0.5)  # Rate limiting
+            with tqdm(desc="Processing", total=len(texts), unit="order") as pbar:
+                return dispatch_adaptive(
+                    texts, classify_batch_ai, batcher,
+                    max_in_flight=MAX_IN_FLIGHT, token_budget=BATCH_TOKEN_BUDGET,
+                    on_batch_done=batch_done
+                )
+        
+        def classify_representatives(texts):
+            keys = cluster_stage.canonical(texts)
+            predictions = classify_with_cache(texts, classify_texts, cache, keys)
+            journal.record_texts(keys, predictions)  # cache hits too; merged near-duplicates are not journaled
+            return predictions
+        
+        ai_predictions = cluster_stage.classify(texts_to_classify, classify_representatives)
+        print(f"  {cache.summary()}")
+        print(f"  {cluster_stage.summary(batcher.next_size())}")
+        print(f"  {journal.summary()}")
+        print(f"  {batcher.summary()}")
+        print(f"  {retrier.metrics.summary()}")
+        print(f"  {usage_meter.summary(len(ids_to_classify))}")
+        cache.close()
         
         # Add AI results to map
         for idx, order_id in enumerate(ids_to_classify):
@@ -676,6 +743,7 @@ def main():
     # Handle empty orders
     for order_id in orders_empty:
         category_map[order_id] = "no reason/remark"
+    category_map.update(reused)
 
     # Apply results
     print("\nApplying results to dataframe...")
@@ -698,25 +766,13 @@ def main():
     print("="*60)
     print(f"Total: {len(parent_rows)} orders classified")
 
-    # Apply highlighting
-    def highlight_rows(row):
-        styles = [''] * len(row)
-        cat_val = row['Predicted_Category']
-        if cat_val == "no reason/remark":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FFFF00'
-        elif cat_val == "voids without clear reason/ remark":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FFD700'
-        elif cat_val == "ERROR":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FF6B6B'
-        return styles
-
-    styled_df = df.style.apply(highlight_rows, axis=1)
-
     print(f"\nSaving to {OUTPUT_FILE}...")
-    styled_df.to_excel(OUTPUT_FILE, index=False)
+    write_categorized_excel(df, OUTPUT_FILE)
+    columnar_file = write_columnar(df, OUTPUT_FILE)
+    if columnar_file:
+        print(f"Saved typed copy to {columnar_file}")
+    if journal is not None:
+        journal.remove()
     print("Done!")
 
 
@@ -0,0 +1,194 @@
+"""
+Staff Collusion Graph
+Links 'Placed By' to 'Void By ' staff, and staff to phone numbers and
+outlets, as SciPy sparse count matrices. From them it reports dense pairs
+(one person repeatedly voiding another's orders), phone numbers shared by
+several staff, and the connected groups those links form.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+    from scipy.stats import poisson
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+MIN_PAIR_VOIDS = 3          # Placed -> voided orders before a pair is reported
+MIN_PAIR_LIFT = 2.0         # ... and how many times more often than the two staff's volumes predict
+ALPHA = 0.01                # Chance of any pair/link passing by luck (Poisson tail, split over the entries tested)
+MIN_PHONE_LINKS = 2         # Orders a staff member needs on a phone number to count as linked to it
+MIN_PHONE_STAFF = 3         # Linked staff on one phone number before it is reported
+MAX_LISTED = 10             # Names listed per phone or group
+
+
+def _ids(values, index):
+    """Positions of values in index (-1 for missing)."""
+    return index.get_indexer(values)
+
+
+def _counts(rows, cols, shape, weights=None):
+    """Sparse (rows x cols) matrix of how often (or how much weight) each pair occurs."""
+    keep = (rows >= 0) & (cols >= 0)
+    data = np.ones(keep.sum()) if weights is None else np.nan_to_num(np.asarray(weights, dtype=float)[keep])
+    return sparse.coo_matrix((data, (rows[keep], cols[keep])), shape=shape).tocsr()
+
+
+def _excess(matrix, alpha=ALPHA):
+    """
+    COO entries of a count matrix with each entry's expected count under
+    independent rows and columns, its lift and whether its Poisson tail
+    probability is below alpha split over the stored entries.
+    """
+    cells = matrix.tocoo()
+    total = max(cells.data.sum(), 1)
+    row_totals = np.asarray(matrix.sum(axis=1)).ravel()
+    col_totals = np.asarray(matrix.sum(axis=0)).ravel()
+    expected = row_totals[cells.row] * col_totals[cells.col] / total
+    p_value = poisson.sf(cells.data - 1, expected)
+    significant = p_value < alpha / max(cells.nnz, 1)
+    return cells, cells.data / np.maximum(expected, 1e-12), p_value, significant
+
+
+def _names(index, positions, limit=MAX_LISTED):
+    names = [str(index[p]) for p in positions[:limit]]
+    if len(positions) > limit:
+        names.append(f"+{len(positions) - limit} more")
+    return ", ".join(names)
+
+
+class CollusionGraph:
+    """
+    Sparse staff graph of one listing. staff, phones and outlets are the node
+    labels; placed_voided[i, j] counts orders placed by staff i and voided by
+    staff j (voided_value holds their Amount), staff_phone and staff_outlet
+    count orders linking a staff member (as placer or voider) to a phone or
+    an outlet.
+    """
+
+    def __init__(self, parent_df, placed_col='Placed By', void_col='Void By ',
+                 phone_col='Contact_Clean', outlet_col='Outlet'):
+        placed = parent_df[placed_col].astype("string").str.strip()
+        voided = parent_df[void_col].astype("string").str.strip()
+        self.staff = pd.Index(pd.unique(pd.concat([placed, voided]).dropna())).sort_values()
+        placer_ids, voider_ids = _ids(placed, self.staff), _ids(voided, self.staff)
+        n_staff = len(self.staff)
+
+        self.placed_voided = _counts(placer_ids, voider_ids, (n_staff, n_staff))
+        self.voided_value = _counts(placer_ids, voider_ids, (n_staff, n_staff), parent_df['Amount'])
+
+        both_staff = np.concatenate([placer_ids, voider_ids])
+        # An order placed and voided by the same person links them once
+        both_staff[len(placer_ids):][voider_ids == placer_ids] = -1
+
+        self.phones = pd.Index([])
+        self.staff_phone = sparse.csr_matrix((n_staff, 0))
+        if phone_col in parent_df.columns:
+            phones = parent_df[phone_col].astype("string").str.strip().replace({"": pd.NA, "nan": pd.NA})
+            self.phones = pd.Index(phones.dropna().unique()).sort_values()
+            phone_ids = np.tile(_ids(phones, self.phones), 2)
+            self.staff_phone = _counts(both_staff, phone_ids, (n_staff, len(self.phones)))
+
+        self.outlets = pd.Index([])
+        self.staff_outlet = sparse.csr_matrix((n_staff, 0))
+        if outlet_col in parent_df.columns:
+            outlets = parent_df[outlet_col].astype("string").str.strip()
+            self.outlets = pd.Index(outlets.dropna().unique()).sort_values()
+            outlet_ids = np.tile(_ids(outlets, self.outlets), 2)
+            self.staff_outlet = _counts(both_staff, outlet_ids, (n_staff, len(self.outlets)))
+
+    def dense_pairs(self, min_voids=MIN_PAIR_VOIDS, min_lift=MIN_PAIR_LIFT, alpha=ALPHA):
+        """
+        Placer -> voider pairs (different people) with at least min_voids
+        orders, a lift of at least min_lift (their count over what the placer's
+        and voider's totals would give if voiders were picked at random) and a
+        count too large to be chance (see _excess).
+        """
+        pairs, lift, p_value, significant = _excess(self.placed_voided, alpha)
+        placed_totals = np.asarray(self.placed_voided.sum(axis=1)).ravel()
+        voided_totals = np.asarray(self.placed_voided.sum(axis=0)).ravel()
+        keep = (pairs.row != pairs.col) & (pairs.data >= min_voids) & (lift >= min_lift) & significant
+        rows, cols, counts = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+        value = np.asarray(self.voided_value[rows, cols]).ravel() if len(rows) else np.zeros(0)
+        result = pd.DataFrame({
+            'Placed By': self.staff[rows],
+            'Void By': self.staff[cols],
+            'Voids': counts.astype(np.int64),
+            'Total Value': value,
+            'Share of Placer Voids': counts / placed_totals[rows],
+            'Share of Voider Voids': counts / voided_totals[cols],
+            'Lift': lift[keep],
+            'P Value': p_value[keep],
+        })
+        return result.sort_values(['Voids', 'Lift'], ascending=False, ignore_index=True)
+
+    def phone_links(self, min_links=MIN_PHONE_LINKS, alpha=ALPHA):
+        """
+        Boolean staff x phone matrix of staff with at least min_links orders on
+        a phone, more than the staff member's and the phone's volumes explain
+        (see _excess). A regular customer served by whoever is on shift does not
+        link them.
+        """
+        cells, _, _, significant = _excess(self.staff_phone, alpha)
+        keep = significant & (cells.data >= min_links)
+        return sparse.coo_matrix((np.ones(keep.sum(), dtype=bool), (cells.row[keep], cells.col[keep])),
+                                 shape=self.staff_phone.shape).tocsr()
+
+    def shared_phones(self, min_staff=MIN_PHONE_STAFF, min_links=MIN_PHONE_LINKS, alpha=ALPHA):
+        """Phone numbers that at least min_staff staff members are linked to (see phone_links)."""
+        linked = self.phone_links(min_links, alpha).tocsc()
+        staff_counts = np.diff(linked.indptr)
+        order_counts = np.asarray(self.staff_phone.multiply(linked).sum(axis=0)).ravel()
+        shared = np.flatnonzero(staff_counts >= min_staff)
+        result = pd.DataFrame({
+            'Contact No': self.phones[shared],
+            'Staff Count': staff_counts[shared],
+            'Order Links': order_counts[shared].astype(np.int64),
+            'Staff': [_names(self.staff, linked.indices[linked.indptr[p]:linked.indptr[p + 1]]) for p in shared],
+        })
+        return result.sort_values('Staff Count', ascending=False, ignore_index=True)
+
+    def groups(self, pairs=None, phones=None, min_links=MIN_PHONE_LINKS, alpha=ALPHA):
+        """
+        Connected components of staff joined by dense pairs and by their links
+        to shared phones (defaults: dense_pairs() and shared_phones()); groups
+        of two or more staff.
+        """
+        pairs = self.dense_pairs() if pairs is None else pairs
+        phones = self.shared_phones() if phones is None else phones
+        n_staff = len(self.staff)
+        phone_ids = _ids(phones['Contact No'], self.phones)
+        # Staff nodes first, then one node per shared phone
+        link = self.phone_links(min_links, alpha)[:, phone_ids].tocoo()
+        rows = np.concatenate([_ids(pairs['Placed By'], self.staff), link.row])
+        cols = np.concatenate([_ids(pairs['Void By'], self.staff), n_staff + link.col])
+        size = n_staff + len(phone_ids)
+        adjacency = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(size, size)).tocsr()
+        _, labels = connected_components(adjacency, directed=False)
+
+        staff_labels = labels[:n_staff]
+        members = pd.Series(np.arange(n_staff)).groupby(staff_labels).agg(list)
+        members = members[members.str.len() >= 2]
+        pair_labels = staff_labels[_ids(pairs['Placed By'], self.staff)] if len(pairs) else np.array([], dtype=int)
+        pair_voids = pd.Series(pairs['Voids'].to_numpy()).groupby(pair_labels).sum()
+        phone_counts = pd.Series(labels[n_staff:]).value_counts()
+        outlet_links = self.staff_outlet > 0
+
+        rows = []
+        for label, staff_ids in members.items():
+            outlets = np.flatnonzero(np.asarray(outlet_links[staff_ids].sum(axis=0)).ravel())
+            rows.append({
+                'Group': len(rows) + 1,
+                'Staff Count': len(staff_ids),
+                'Staff': _names(self.staff, staff_ids),
+                'Shared Phones': int(phone_counts.get(label, 0)),
+                'Pair Voids': int(pair_voids.get(label, 0)),
+                'Outlets': _names(self.outlets, outlets),
+            })
+        result = pd.DataFrame(rows, columns=['Group', 'Staff Count', 'Staff', 'Shared Phones', 'Pair Voids', 'Outlets'])
+        result = result.sort_values(['Staff Count', 'Pair Voids'], ascending=False, ignore_index=True)
+        result['Group'] = np.arange(1, len(result) + 1)
+        return result
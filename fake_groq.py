@@ -0,0 +1,168 @@
+"""
+Offline Groq stand-in for throughput benchmarks.
+Mimics client.chat.completions.create / .with_raw_response.create with a
+configurable latency and a server-side requests-per-minute limit, and answers
+every batch with a valid 'predictions' array. A system message seen before is
+reported as cached prompt tokens, like provider-side prefix caching. Latency
+can grow with batch size, and batches above max_reliable_batch come back with
+predictions missing, like a model that drops items from long lists.
+error_rate injects random 503s, and fail_after makes every request after the
+first fail_after ones fail, like a provider outage. label_key maps each text to
+what its label is drawn from (default: the text itself), e.g. normalize_remark
+for a model that ignores bill numbers and amounts.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+
+class FakeServerError(Exception):
+    """Raised like groq.InternalServerError for injected provider failures."""
+
+    status_code = 503
+
+    def __init__(self):
+        super().__init__("Service unavailable")
+        self.response = SimpleNamespace(status_code=503, headers={})
+
+
+class FakeRateLimitError(Exception):
+    """Raised like groq.RateLimitError when the fake server's RPM budget is spent."""
+
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit reached, retry after {retry_after:.2f}s")
+        self.response = SimpleNamespace(status_code=429, headers={'retry-after': f"{retry_after:.2f}"})
+
+
+class FakeGroq:
+    """Drop-in replacement for groq.Groq that never touches the network."""
+
+    def __init__(self, latency=0.8, jitter=0.2, requests_per_minute=None,
+                 categories=None, seed=0, per_item_latency=0.0, max_reliable_batch=None,
+                 error_rate=0.0, fail_after=None, label_key=None):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.max_reliable_batch = max_reliable_batch
+        self.error_rate = error_rate
+        self.fail_after = fail_after
+        self.label_key = label_key
+        self.jitter = jitter
+        self.requests_per_minute = requests_per_minute
+        self.categories = list(categories or ["other"])
+        self.random = random.Random(seed)
+        self.request_times = deque()
+        self.request_count = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.seen_prefixes = set()
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _admit(self):
+        """Enforce the fake RPM limit and build the rate-limit headers."""
+        with self.lock:
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] >= 60:
+                self.request_times.popleft()
+            limit = self.requests_per_minute
+            if limit is not None and len(self.request_times) >= limit:
+                raise FakeRateLimitError(60 - (now - self.request_times[0]))
+            self.request_times.append(now)
+            self.request_count += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            if self.fail_after is not None and self.request_count > self.fail_after:
+                raise FakeServerError()
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise FakeServerError()
+
+        headers = {}
+        if limit is not None:
+            reset = 60 - (now - self.request_times[0])
+            headers = {
+                'x-ratelimit-limit-requests': str(limit),
+                'x-ratelimit-remaining-requests': str(max(0, limit - len(self.request_times))),
+                'x-ratelimit-reset-requests': f"{reset:.2f}s",
+            }
+        return delay, headers
+
+    def _texts_from_messages(self, messages):
+        """Find the JSON list of input texts in the last user message."""
+        content = ""
+        for message in messages:
+            if message.get("role") == "user":
+                content = message.get("content", "")
+        known = set(self.categories)
+        decoder = json.JSONDecoder()
+        pos = content.find("[")
+        while pos != -1:
+            try:
+                value, _ = decoder.raw_decode(content, pos)
+            except ValueError:
+                value = None
+            if isinstance(value, list) and all(isinstance(v, str) for v in value):
+                # Skip the category list itself; a batch of a few texts that
+                # happen to be category names is still a batch
+                if not (set(value) <= known and len(set(value)) > len(known) // 2):
+                    return value
+            pos = content.find("[", pos + 1)
+        return []
+
+    def _predict(self, text):
+        if self.label_key is not None:
+            text = self.label_key(text)
+        digest = hashlib.md5(text.encode("utf-8")).digest()
+        return self.categories[digest[0] % len(self.categories)]
+
+    def _complete(self, messages, **kwargs):
+        delay, headers = self._admit()
+        texts = self._texts_from_messages(messages)
+        time.sleep(delay + self.per_item_latency * len(texts))
+
+        predictions = [self._predict(t) for t in texts]
+        if self.max_reliable_batch is not None and len(texts) > self.max_reliable_batch:
+            with self.lock:
+                dropped = self.random.randint(1, len(texts) - self.max_reliable_batch)
+            del predictions[-dropped:]
+        content = json.dumps({"predictions": predictions})
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        prefix = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+        with self.lock:
+            cached_tokens = len(prefix) // 4 if prefix in self.seen_prefixes else 0
+            self.seen_prefixes.add(prefix)
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens,
+                                  prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+                                  completion_tokens=len(content) // 4,
+                                  total_tokens=prompt_tokens + len(content) // 4),
+        )
+        return completion, headers
+
+
+class _Completions:
+    def __init__(self, fake):
+        self._fake = fake
+        self.with_raw_response = _RawCompletions(fake)
+
+    def create(self, messages, **kwargs):
+        completion, _ = self._fake._complete(messages, **kwargs)
+        return completion
+
+
+class _RawCompletions:
+    def __init__(self, fake):
+        self._fake = fake
+
+    def create(self, messages, **kwargs):
+        completion, headers = self._fake._complete(messages, **kwargs)
+        return SimpleNamespace(headers=headers, parse=lambda: completion)
@@ -1,10 +1,18 @@
+import contextlib
 import os
 import pandas as pd
 import json
-import time
 import re
 from tqdm import tqdm
 from groq import Groq
+from llm_dispatch import AdaptiveBatcher, dispatch_adaptive
+from llm_retry import SDK_MAX_RETRIES, Retrier
+from text_clusters import ClusterStage
+from classification_cache import ClassificationCache, classify_with_cache, prompt_hash
+from rule_engine import RuleEngine
+from void_io import (PARQUET_AVAILABLE, ExcelChunkWriter, ParquetChunkWriter,
+                     iter_order_chunks, write_categorized_excel, write_columnar)
+from void_preprocessing import extract_new_bill_ids, group_order_text
 
 try:
     from dotenv import load_dotenv
@@ -19,11 +27,21 @@ if not API_KEY:
 
 INPUT_FILE = "PH_VoidBillListing-dec.xlsx"
 OUTPUT_FILE = "categorized_orders_clean.xlsx"
-BATCH_SIZE = 20
+BATCH_SIZE = 20             # Starting texts per request; adapted during the run
+MAX_BATCH_SIZE = 40
+CLUSTER_THRESHOLD = 1.0     # Same normalized remark -> one LLM call; < 1 adds near-duplicates (None to disable)
 MODEL_NAME = "openai/gpt-oss-120b"
 AI_VERIFY_RULES = True
+CACHE_FILE = "classification_cache.sqlite"
+CACHE_MAX_ENTRIES = 100_000
+STREAM_INPUT = False        # Read and write the listing in chunks instead of all at once
+CHUNK_ORDERS = 2000         # Orders per chunk in streaming mode
+RULE_WORKERS = 1            # Processes for the rule pass on very large listings
 
-client = Groq(api_key=API_KEY)
+client = Groq(api_key=API_KEY, max_retries=SDK_MAX_RETRIES)
+batcher = AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+retrier = Retrier(log=print)
+cluster_stage = ClusterStage(CLUSTER_THRESHOLD)
 
 # Standardized categories
 CATEGORIES = [
@@ -238,54 +256,46 @@ KEYWORD_RULES = {
     ]
 }
 
+# Priority order for rules (most specific first)
+PRIORITY_ORDER = [
+    "testing",
+    "Customer denied the order",
+    "double punch",
+    "order cancelled by aggregator",
+    "Cashier mistake",
+    "Call Center mistake",
+    "payment issue",
+    "promotion",
+    "grid issue",
+    "rider issue",
+    "phone",
+    "cus.related issue",
+    "out of stock",
+    "Order delay",
+    "system issue",
+    "order type change",
+    "location",
+    "Customer Cancel order",
+    "cus. Change the order",
+    "product issue or complain"
+]
+
+# Compiled once at import: one alternation per priority tier
+RULE_ENGINE = RuleEngine(KEYWORD_RULES, PRIORITY_ORDER)
+
 def apply_keyword_rules(text):
     """
     Apply rule-based classification using keyword matching.
     Returns category if a rule matches, otherwise None.
     """
-    if not text or pd.isna(text):
-        return None
-    
-    text_lower = str(text).lower()
-    
-    # Priority order for rules (most specific first)
-    priority_order = [
-        "testing",
-        "Customer denied the order",
-        "double punch",
-        "order cancelled by aggregator",
-        "Cashier mistake",
-        "Call Center mistake",
-        "payment issue",
-        "promotion",
-        "grid issue",
-        "rider issue",
-        "phone",
-        "cus.related issue",
-        "out of stock",
-        "Order delay",
-        "system issue",
-        "order type change",
-        "location",
-        "Customer Cancel order",
-        "cus. Change the order",
-        "product issue or complain"
-    ]
-    
-    for category in priority_order:
-        if category in KEYWORD_RULES:
-            for pattern in KEYWORD_RULES[category]:
-                if re.search(pattern, text_lower):
-                    return category
-    
-    return None
+    return RULE_ENGINE.classify(text)
+
+SYSTEM_MESSAGE = "You are a precise data classification API. Output only valid JSON with a 'predictions' array."
 
-def classify_batch(text_list):
-    """
-    AI-based classification for texts that couldn't be classified by rules.
-    Uses detailed prompt with examples for better accuracy.
-    """
-    prompt = f"""You are an expert data classifier for a Pizza Hut restaurant chain analyzing void order reasons.
+
+def build_prompt(text_list):
+    """Build the classification prompt with rules and examples for a batch."""
+    return f"""You are an expert data classifier for a Pizza Hut restaurant chain analyzing void order reasons.
 
 TASK: Classify each customer log into EXACTLY ONE category from this list:
 {json.dumps(CATEGORIES)}
@@ -363,11 +373,20 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
 Each prediction must be EXACTLY one of the categories listed above.
 """
 
+
+def classify_batch(text_list):
+    """
+    AI-based classification for texts that couldn't be classified by rules.
+    Uses detailed prompt with examples for better accuracy.
+    """
+    prompt = build_prompt(text_list)
+
     try:
-        completion = client.chat.completions.create(
+        completion = retrier.call(
+            client.chat.completions.create,
             model=MODEL_NAME, 
             messages=[
-                {"role": "system", "content": "You are a precise data classification API. Output only valid JSON with a 'predictions' array."},
+                {"role": "system", "content": SYSTEM_MESSAGE},
                 {"role": "user", "content": prompt}
             ],
             temperature=0,
@@ -395,45 +414,13 @@ Each prediction must be EXACTLY one of the categories listed above.
         
         return validated
 
+    except json.JSONDecodeError as e:
+        print(f"JSON Parse Error ({len(text_list)} texts): {e}")
+        return []
     except Exception as e:
         print(f"API Error: {e}")
         return ["ERROR"] * len(text_list)
 
-def extract_new_bill_id(text):
-    """
-    Extracts new bill numbers from text using multiple regex patterns.
-    Handles formats like: Y22196, P-69112, HJ 0042, L27016, G81216, etc.
-    """
-    if not text or pd.isna(text): 
-        return None
-
-    clean_text = str(text).upper()
-    
-    # Pattern 1: Explicit "new bill" mentions
-    # Matches: NEW BILL NO Y22196, NBN L27169, new bill number M45055
-    patterns = [
-        r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})',
-        r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})',
-        r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)',  # Just order numbers like "order no 18"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, clean_text)
-        if match:
-            result = match.group(1).replace(" ", "").replace("-", "")
-            # Validate it's a reasonable bill number
-            if len(result) >= 2:
-                return result
-    
-    # Pattern 2: General bill ID pattern (fallback)
-    # Matches standalone bill IDs like Y22196, HJ0042
-    match = re.search(r'\b([A-Z]{1,2}\d{4,7})\b', clean_text)
-    if match:
-        return match.group(1)
-        
-    return None
-
-
 def post_process_category(text, ai_category):
     """
     Post-process AI predictions with additional validation.
@@ -463,27 +450,30 @@ def post_process_category(text, ai_category):
     
     return ai_category
 
-def main():
-    print(f"Reading {INPUT_FILE}...")
-    try:
-        # Read with employee number columns as text to preserve leading zeros
-        df = pd.read_excel(INPUT_FILE, dtype={'Void By ': str, 'Placed By': str, 'Void By': str})
-    except FileNotFoundError:
-        print("File not found.")
-        return
+def classify_texts(texts):
+    with tqdm(total=len(texts), unit="order") as pbar:
+        predictions = dispatch_adaptive(
+            texts, classify_batch, batcher, max_in_flight=1, delay=0.5,
+            on_batch_done=lambda start, results: pbar.update(len(results))
+        )
+    print(batcher.summary())
+    print(retrier.metrics.summary())
+    return predictions
 
+def categorize_orders(df, cache=None):
+    """
+    Categorize one listing frame (parent rows plus their child rows) and return
+    it with Predicted_Category and Extracted_New_Bill filled on parent rows.
+    Used for the whole file and for each chunk in streaming mode.
+    """
     order_col_name = 'Order No'
     
     df['Temp_Order_ID'] = df[order_col_name].ffill()
 
-    def combine_text(x):
-        return " ".join(set([str(s).strip() for s in x if pd.notna(s) and str(s).strip() != '']))
-
-    grouped = df.groupby('Temp_Order_ID')[['Reason', 'Remark']].agg(combine_text)
-    grouped['AI_Input'] = (grouped['Reason'] + " " + grouped['Remark']).str.strip()
+    grouped = group_order_text(df, 'Temp_Order_ID')
     
     print("Extracting New Bill Numbers using Regex...")
-    grouped['Extracted_Bill_No'] = grouped['AI_Input'].apply(extract_new_bill_id)
+    grouped['Extracted_Bill_No'] = extract_new_bill_ids(grouped['AI_Input'])
     
     bill_number_map = grouped['Extracted_Bill_No'].to_dict()
 
@@ -496,7 +486,7 @@ def main():
 
     # Step 1: Apply rule-based classification first
     print("\nStep 1: Applying rule-based classification...")
-    orders_with_text['Rule_Category'] = orders_with_text['AI_Input'].apply(apply_keyword_rules)
+    orders_with_text['Rule_Category'] = RULE_ENGINE.classify_series_parallel(orders_with_text['AI_Input'], RULE_WORKERS)
     
     rule_classified = orders_with_text[orders_with_text['Rule_Category'].notna()]
     needs_ai = orders_with_text[orders_with_text['Rule_Category'].isna()]
@@ -516,21 +506,14 @@ def main():
         print("\nStep 2: AI classification for remaining orders...")
         ids_to_classify = needs_ai.index.tolist()
         texts_to_classify = needs_ai['AI_Input'].tolist()
-        ai_predictions = []
         
-        for i in tqdm(range(0, len(texts_to_classify), BATCH_SIZE)):
-            batch = texts_to_classify[i : i + BATCH_SIZE]
-            batch_results = classify_batch(batch)
-            
-            if len(batch_results) != len(batch):
-                diff = len(batch) - len(batch_results)
-                if diff > 0: 
-                    batch_results += ["other"] * diff
-                else: 
-                    batch_results = batch_results[:len(batch)]
-                
-            ai_predictions.extend(batch_results)
-            time.sleep(0.5)
+        ai_predictions = cluster_stage.classify(
+            texts_to_classify,
+            lambda texts: classify_with_cache(texts, classify_texts, cache, cluster_stage.canonical(texts))
+        )
+        print(cluster_stage.summary(batcher.next_size()))
+        if cache is not None:
+            print(f"  {cache.summary()}")
         
         # Post-process AI predictions
         print("\nStep 3: Post-processing AI predictions...")
@@ -553,39 +536,76 @@ def main():
     df.loc[mask_child_rows, 'Extracted_New_Bill'] = None
 
     del df['Temp_Order_ID']
+    return df
 
-    # ============= STATISTICS =============
+def print_summary(counts):
     print("\n" + "="*50)
     print("CLASSIFICATION SUMMARY")
     print("="*50)
-    parent_rows = df[df[order_col_name].notna()]
-    print(parent_rows['Predicted_Category'].value_counts().to_string())
+    print(counts.to_string())
     print("="*50)
 
-    print("\nApplying highlighting...")
+def main_streaming(cache):
+    """Read, categorize and write the listing CHUNK_ORDERS orders at a time."""
+    if not os.path.exists(INPUT_FILE):
+        print("File not found.")
+        return
+    print(f"Streaming {INPUT_FILE} in chunks of {CHUNK_ORDERS} orders...")
+    counts = pd.Series(dtype="int64")
+    # Both files replace the previous output only if every chunk was written;
+    # the Parquet copy closes last so read_categorized sees it as up to date
+    with (ParquetChunkWriter(OUTPUT_FILE) if PARQUET_AVAILABLE else contextlib.nullcontext()) as columnar, \
+            ExcelChunkWriter(OUTPUT_FILE) as writer:
+        for chunk_no, chunk in enumerate(iter_order_chunks(INPUT_FILE, CHUNK_ORDERS), 1):
+            print(f"\n--- Chunk {chunk_no} ({len(chunk)} rows) ---")
+            chunk = categorize_orders(chunk, cache)
+            parent_rows = chunk[chunk['Order No'].notna()]
+            counts = counts.add(parent_rows['Predicted_Category'].value_counts(), fill_value=0)
+            writer.write(chunk)
+            if columnar is not None:
+                columnar.write(chunk)
+    if columnar is not None:
+        print(f"Saved typed copy to {columnar.path}")
+
+    print_summary(counts.astype("int64").sort_values(ascending=False))
+    print(f"Saved {writer.rows} rows to {OUTPUT_FILE}")
+    print("Done!")
 
-    def highlight_rows(row):
-        styles = [''] * len(row)
-        
-        cat_val = row['Predicted_Category']
-        
-        if cat_val == "no reason/remark":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FFFF00'  # Yellow
-        elif cat_val == "voids without clear reason/ remark":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FFD700'  # Gold
-        elif cat_val == "ERROR":
-            idx = row.index.get_loc('Predicted_Category')
-            styles[idx] = 'background-color: #FF6B6B'  # Red for errors
-            
-        return styles
-
-    styled_df = df.style.apply(highlight_rows, axis=1)
+def main_in_memory(cache):
+    print(f"Reading {INPUT_FILE}...")
+    try:
+        # Read with employee number columns as text to preserve leading zeros
+        df = pd.read_excel(INPUT_FILE, dtype={'Void By ': str, 'Placed By': str, 'Void By': str})
+    except FileNotFoundError:
+        print("File not found.")
+        return
+
+    df = categorize_orders(df, cache)
+
+    # ============= STATISTICS =============
+    parent_rows = df[df['Order No'].notna()]
+    print_summary(parent_rows['Predicted_Category'].value_counts())
 
     print(f"Saving to {OUTPUT_FILE}...")
-    styled_df.to_excel(OUTPUT_FILE, index=False)
+    write_categorized_excel(df, OUTPUT_FILE)
+    columnar_file = write_columnar(df, OUTPUT_FILE)
+    if columnar_file:
+        print(f"Saved typed copy to {columnar_file}")
     print("Done!")
 
+def main():
+    cache = ClassificationCache(
+        CACHE_FILE, model=MODEL_NAME,
+        prompt_version=prompt_hash(SYSTEM_MESSAGE, build_prompt([])),
+        max_entries=CACHE_MAX_ENTRIES
+    )
+    try:
+        if STREAM_INPUT:
+            main_streaming(cache)
+        else:
+            main_in_memory(cache)
+    finally:
+        cache.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,367 @@
+"""
+Concurrent LLM batch dispatcher
+Keeps several classification batches in flight against Groq and paces them
+with a token bucket that follows the provider's rate-limit headers. Batches can
+be packed to a token budget instead of a fixed number of texts, and sized
+adaptively from observed latency and short or unparsable responses.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_REQUESTS_PER_MINUTE = 30
+# Per-text cost on top of the text itself: list punctuation and its predicted label
+ITEM_OVERHEAD_TOKENS = 10
+# Label classify functions give every text of a batch whose request failed
+ERROR_LABEL = "ERROR"
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def parse_reset_duration(value):
+    """Parse Groq reset headers like '2m59.56s', '7.66s' or '120ms' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    return sum(float(num) * scale[unit] for num, unit in parts)
+
+
+def _header(headers, name):
+    """Case-insensitive header lookup for httpx headers or plain dicts."""
+    if headers is None:
+        return None
+    value = headers.get(name)
+    if value is None and isinstance(headers, dict):
+        for key, val in headers.items():
+            if key.lower() == name:
+                return val
+    return value
+
+
+class TokenBucket:
+    """Thread-safe request token bucket driven by rate-limit headers."""
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, requests_per_minute // 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_request_tokens = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller back for the given number of seconds."""
+        if not seconds or seconds <= 0:
+            return
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers, request_tokens=None):
+        """Adjust the bucket from x-ratelimit-* / retry-after response headers."""
+        if request_tokens:
+            self.last_request_tokens = request_tokens
+
+        retry_after = parse_reset_duration(_header(headers, 'retry-after'))
+        if retry_after:
+            self.pause(retry_after)
+
+        remaining_requests = _header(headers, 'x-ratelimit-remaining-requests')
+        if remaining_requests is not None:
+            try:
+                remaining_requests = int(float(remaining_requests))
+            except ValueError:
+                remaining_requests = None
+        if remaining_requests is not None:
+            if remaining_requests <= 0:
+                self.pause(parse_reset_duration(_header(headers, 'x-ratelimit-reset-requests')))
+            else:
+                with self.lock:
+                    self.tokens = min(self.tokens, float(remaining_requests))
+
+        remaining_tokens = _header(headers, 'x-ratelimit-remaining-tokens')
+        if remaining_tokens is not None:
+            try:
+                remaining_tokens = int(float(remaining_tokens))
+            except ValueError:
+                remaining_tokens = None
+        if remaining_tokens is not None and remaining_tokens < self.last_request_tokens:
+            self.pause(parse_reset_duration(_header(headers, 'x-ratelimit-reset-tokens')))
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) of text as it appears in the JSON batch."""
+    return len(json.dumps(text)) // 4 + 1
+
+
+def pack_batches(texts, token_budget, max_items=None, item_overhead=ITEM_OVERHEAD_TOKENS):
+    """
+    Split texts into consecutive (start, batch) pairs, filling each batch until
+    the next text would push it past token_budget or max_items. A single text
+    over the budget still gets a batch of its own.
+    """
+    batches = []
+    start = 0
+    used = 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text) + item_overhead
+        full = used + cost > token_budget or (max_items and i - start >= max_items)
+        if i > start and full:
+            batches.append((start, texts[start:i]))
+            start = i
+            used = 0
+        used += cost
+    if start < len(texts):
+        batches.append((start, texts[start:]))
+    return batches
+
+
+class UsageMeter:
+    """Thread-safe totals of the usage blocks returned with each completion."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.lock = threading.Lock()
+
+    def record(self, usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            self.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+
+    def summary(self, orders):
+        per_order = (self.prompt_tokens + self.completion_tokens) / orders if orders else 0.0
+        return (f"Tokens: {self.requests} requests, {self.prompt_tokens:,} prompt "
+                f"({self.cached_tokens:,} cached), {self.completion_tokens:,} completion, "
+                f"{per_order:,.0f} per classified order")
+
+
+def dispatch_batches(texts, classify_fn, batch_size, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                     fill_value="other", on_batch_done=None, token_budget=None):
+    """
+    Classify texts in batches with up to max_in_flight requests running at once.
+    With token_budget, batches are packed by estimated tokens (at most batch_size
+    texts each) instead of taking batch_size texts at a time.
+    Predictions are returned in the same order as the input texts.
+    """
+    results = [None] * len(texts)
+    if token_budget:
+        batches = pack_batches(texts, token_budget, batch_size)
+    else:
+        batches = [(start, texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        futures = {pool.submit(classify_fn, batch): (start, batch) for start, batch in batches}
+        for future in as_completed(futures):
+            start, batch = futures[future]
+            batch_results = list(future.result())
+
+            # Ensure correct length
+            while len(batch_results) < len(batch):
+                batch_results.append(fill_value)
+            batch_results = batch_results[:len(batch)]
+
+            results[start:start + len(batch)] = batch_results
+            if on_batch_done:
+                on_batch_done(start, batch_results)
+
+    return results
+
+
+# ============= ADAPTIVE BATCH SIZING =============
+class AdaptiveBatcher:
+    """
+    Picks the batch size from what the model has been doing. A batch whose
+    response has one prediction per text counts as a success: the size grows
+    while seconds-per-text keeps falling and drops back to the best size seen
+    if it rises. A short (or empty, for unparsable JSON) response halves the
+    size, caps later sizes below the one that failed, and re-sends the batch as
+    two halves, each of which is only split further if it fails too. An
+    all-ERROR reply (the request itself failed) also halves the size and ends
+    any probe, but is not re-sent and leaves the cap alone, as it says
+    nothing about which sizes the model can answer. After
+    recovery successes in a row at the cap, the cap is raised again by growth,
+    so one bad reply does not limit the rest of the run; a raise that fails at
+    once restores the previous cap and doubles the streak needed for the next.
+    """
+
+    def __init__(self, initial=10, min_size=1, max_size=50, growth=1.5, tolerance=0.1, recovery=5):
+        self.size = float(max(min_size, min(initial, max_size)))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ceiling = max_size
+        self.growth = growth
+        self.tolerance = tolerance
+        self.recovery = recovery
+        self.recovery_needed = recovery
+        self.capped_successes = 0
+        self.probing = False
+        self.safe_ceiling = max_size
+        self.best_per_item = None
+        self.best_size = int(self.size)
+        self.batches = 0
+        self.splits = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+    def next_size(self):
+        with self.lock:
+            return int(self.size)
+
+    def record_success(self, count, seconds):
+        per_item = seconds / count
+        with self.lock:
+            self.batches += 1
+            if count < int(self.size):
+                return  # tail batches say nothing about the current size
+            if self.probing and count >= self.ceiling:
+                self.probing = False
+                self.recovery_needed = self.recovery
+            if self.ceiling < self.max_size and count >= self.ceiling:
+                self.capped_successes += 1
+                if self.capped_successes >= self.recovery_needed:
+                    self.safe_ceiling = self.ceiling
+                    self.ceiling = min(self.max_size, math.ceil(self.ceiling * self.growth))
+                    self.capped_successes = 0
+                    self.probing = True
+                    self.best_per_item = None  # probe the raised cap from a fresh measurement
+                    return
+            if self.best_per_item is None or per_item < self.best_per_item * (1 - self.tolerance):
+                self.best_per_item = per_item
+                self.best_size = count
+                self.size = min(self.ceiling, math.ceil(self.size * self.growth))
+            elif per_item > self.best_per_item * (1 + self.tolerance):
+                self.size = min(self.size, self.best_size)
+
+    def record_failure(self, count, lower_cap=True):
+        with self.lock:
+            self.batches += 1
+            self.capped_successes = 0
+            if self.probing:
+                self.probing = False
+                self.recovery_needed *= 2
+                self.ceiling = self.safe_ceiling
+            if lower_cap:
+                self.splits += 1
+                self.ceiling = max(self.min_size, min(self.ceiling, count - 1))
+            else:
+                self.errors += 1
+            self.size = max(self.min_size, min(self.size, count // 2))
+            self.best_per_item = None  # smaller batches are slower per text; re-measure
+
+    def run(self, classify_fn, batch, fill_value="other"):
+        """
+        Classify batch, splitting it on short responses. Always returns
+        len(batch) predictions. A reply of nothing but ERROR (the call failed
+        after its retries) is returned as it is and counts as a failure for sizing.
+        """
+        start = time.monotonic()
+        predictions = list(classify_fn(batch) or [])
+        if len(predictions) == len(batch):
+            if all(p == ERROR_LABEL for p in predictions):
+                self.record_failure(len(batch), lower_cap=False)
+            else:
+                self.record_success(len(batch), time.monotonic() - start)
+            return predictions
+
+        self.record_failure(len(batch))
+        if len(batch) == 1:
+            with self.lock:
+                self.fallbacks += 1
+            return [fill_value]
+        mid = len(batch) // 2
+        return (self.run(classify_fn, batch[:mid], fill_value)
+                + self.run(classify_fn, batch[mid:], fill_value))
+
+    def summary(self):
+        return (f"Batching: {self.batches} requests, size now {int(self.size)}, "
+                f"{self.splits} short/failed batches split, {self.errors} all-ERROR, "
+                f"{self.fallbacks} texts defaulted")
+
+
+def dispatch_adaptive(texts, classify_fn, batcher, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                      fill_value="other", on_batch_done=None, token_budget=None, delay=0.0):
+    """
+    Like dispatch_batches, but each new batch takes batcher.next_size() texts
+    (trimmed to token_budget if given) and runs through batcher.run, so sizes
+    follow the model's behaviour during the run. delay pauses each worker after
+    a batch, for callers that pace requests with a fixed sleep.
+    """
+    results = [None] * len(texts)
+    cursor = 0
+
+    def take():
+        nonlocal cursor
+        size = batcher.next_size()
+        batch = texts[cursor:cursor + size]
+        if token_budget:
+            batch = pack_batches(batch, token_budget, size)[0][1]
+        start = cursor
+        cursor += len(batch)
+        return start, batch
+
+    def work(batch):
+        batch_results = batcher.run(classify_fn, batch, fill_value)
+        if delay:
+            time.sleep(delay)
+        return batch_results
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        pending = {}
+        while cursor < len(texts) and len(pending) < max(1, max_in_flight):
+            start, batch = take()
+            pending[pool.submit(work, batch)] = (start, batch)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, batch = pending.pop(future)
+                batch_results = future.result()
+                results[start:start + len(batch)] = batch_results
+                if on_batch_done:
+                    on_batch_done(start, batch_results)
+                if cursor < len(texts):
+                    next_start, next_batch = take()
+                    pending[pool.submit(work, next_batch)] = (next_start, next_batch)
+
+    return results
@@ -0,0 +1,207 @@
+"""
+Shared LLM retry layer
+Retries transient provider errors with exponential backoff and full jitter,
+waits out Retry-After on 429s, gives each error class its own attempt budget
+and opens a circuit breaker when the provider keeps failing, so a dead API
+costs a few fast failures instead of minutes of sleeping per batch.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from llm_dispatch import _header, parse_reset_duration
+
+# Attempts (including the first) allowed per transient error class
+DEFAULT_MAX_ATTEMPTS = {
+    "rate_limit": 6,
+    "server": 4,
+    "timeout": 3,
+    "connection": 4,
+}
+# Passed as max_retries to provider clients so Retrier is the only retry layer
+SDK_MAX_RETRIES = 0
+# Error classes that say the provider itself is unhealthy
+BREAKER_CLASSES = {"server", "timeout", "connection"}
+
+_TIMEOUT_NAMES = {"APITimeoutError", "Timeout", "TimeoutException", "ReadTimeout", "ConnectTimeout"}
+_CONNECTION_NAMES = {"APIConnectionError", "ConnectError", "RemoteProtocolError"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open."""
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc):
+    """
+    Map an exception from the Groq client to a retry class: 'rate_limit',
+    'server', 'timeout', 'connection', or None for errors that will not go away
+    on retry (bad request, auth, unparsable response, programming errors).
+    """
+    name = type(exc).__name__
+    if name in _TIMEOUT_NAMES or isinstance(exc, TimeoutError):
+        return "timeout"
+    if name in _CONNECTION_NAMES or isinstance(exc, ConnectionError):
+        return "connection"
+    status = _status_code(exc)
+    if status == 429:
+        return "rate_limit"
+    if status in (408, 409):
+        return "timeout"
+    if status is not None and status >= 500:
+        return "server"
+    return None
+
+
+def retry_after(exc):
+    """Seconds the provider asked us to wait, from the error response headers."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    return parse_reset_duration(_header(headers, "retry-after"))
+
+
+class RetryMetrics:
+    """Thread-safe retry and backoff counters for tuning throughput."""
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = Counter()
+        self.backoff_seconds = 0.0
+        self.gave_up = 0
+        self.fatal = 0
+        self.circuit_opens = 0
+        self.short_circuits = 0
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_retry(self, kind, delay):
+        with self.lock:
+            self.retries[kind] += 1
+            self.backoff_seconds += delay
+
+    def summary(self):
+        retried = ", ".join(f"{kind} {count}" for kind, count in sorted(self.retries.items())) or "none"
+        return (f"Retries: {self.calls} calls, {self.attempts} attempts, retried {retried}, "
+                f"{self.backoff_seconds:.1f}s backing off, {self.gave_up} gave up, "
+                f"{self.fatal} not retryable, breaker opened {self.circuit_opens}x "
+                f"({self.short_circuits} calls refused)")
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive provider failures. While open,
+    calls are refused until reset_timeout has passed; then a single trial call
+    is let through, which closes the breaker on success or reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """Count a provider failure; returns True when this failure opened the breaker."""
+        with self.lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+                return not was_open
+            return False
+
+
+class Retrier:
+    """
+    Runs a provider call with retries. Backoff for attempt n is drawn from
+    [0, min(max_delay, base_delay * 2**n)] ("full jitter"); a Retry-After on
+    the error overrides it, capped at max_delay (a negative or non-finite one
+    is ignored). Rate limits do not count against the breaker.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=1.0, max_delay=60.0,
+                 breaker=None, log=None, sleep=time.sleep, seed=None):
+        self.max_attempts = dict(DEFAULT_MAX_ATTEMPTS, **(max_attempts or {}))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = RetryMetrics()
+        self.log = log
+        self.sleep = sleep
+        self.random = random.Random(seed)
+
+    def backoff(self, attempt):
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), retrying transient errors; re-raises the last error."""
+        self.metrics.add(calls=1)
+        attempts = Counter()
+        while True:
+            if not self.breaker.allow():
+                self.metrics.add(short_circuits=1)
+                raise CircuitOpenError("LLM provider circuit breaker is open")
+            self.metrics.add(attempts=1)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                kind = classify_error(exc)
+                if kind not in BREAKER_CLASSES:
+                    self.breaker.record_success()  # the provider answered
+                elif self.breaker.record_failure():
+                    self.metrics.add(circuit_opens=1)
+                    if self.log:
+                        self.log(f"Circuit breaker opened after repeated {kind} errors")
+                if kind is None:
+                    self.metrics.add(fatal=1)
+                    raise
+                attempts[kind] += 1
+                if attempts[kind] >= self.max_attempts.get(kind, 1):
+                    self.metrics.add(gave_up=1)
+                    raise
+                delay = retry_after(exc) if kind == "rate_limit" else None
+                if delay is None or not 0 <= delay < math.inf:
+                    delay = self.backoff(sum(attempts.values()) - 1)
+                else:
+                    delay = min(self.max_delay, delay + self.random.uniform(0, self.base_delay))
+                self.metrics.add_retry(kind, delay)
+                if self.log:
+                    self.log(f"{kind} error ({exc}); retry {attempts[kind]} in {delay:.1f}s")
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
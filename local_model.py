@@ -0,0 +1,145 @@
+"""
+Local Classifier Tier
+TF-IDF character n-grams plus logistic regression, trained on earlier
+categorized outputs. It sits between the keyword rules and the LLM: orders it
+predicts with enough confidence are answered locally, the rest go to the LLM.
+"""
+
+import os
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from text_clusters import normalize_remark
+from void_io import read_categorized
+from void_preprocessing import group_order_text
+
+# scikit-learn and joblib are imported only when a model is trained or
+# loaded, so runs without a local model do not pay for them at startup
+_MISSING_PACKAGES = [package for module, package in (("sklearn", "scikit-learn"), ("joblib", "joblib"))
+                     if find_spec(module) is None]
+SKLEARN_AVAILABLE = not _MISSING_PACKAGES
+
+DEFAULT_MODEL_FILE = "local_model.joblib"
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+# Labels that say nothing about the remark text
+EXCLUDED_LABELS = {"no reason/remark", "ERROR"}
+
+
+def labelled_orders(categorized_df, order_col='Order No'):
+    """One row per order with text: AI_Input and its Predicted_Category."""
+    df = categorized_df.copy()
+    df['Temp_Order_ID'] = df[order_col].ffill()
+    grouped = group_order_text(df, 'Temp_Order_ID')
+    parents = df[df[order_col].notna()].drop_duplicates('Temp_Order_ID').set_index('Temp_Order_ID')
+    grouped['Predicted_Category'] = parents['Predicted_Category'].reindex(grouped.index)
+    keep = (grouped['AI_Input'].str.len() > 1) & grouped['Predicted_Category'].notna() \
+        & ~grouped['Predicted_Category'].isin(EXCLUDED_LABELS)
+    return grouped.loc[keep, ['AI_Input', 'Predicted_Category']]
+
+
+class LocalClassifier:
+    """A fitted text pipeline plus the confidence needed to skip the LLM."""
+
+    def __init__(self, pipeline, threshold=DEFAULT_THRESHOLD, trained_on=0):
+        self.pipeline = pipeline
+        self.threshold = threshold
+        self.trained_on = trained_on
+
+    def predict(self, texts):
+        """(labels, confidences) for every text."""
+        if len(texts) == 0:
+            return np.array([], dtype=object), np.array([])
+        proba = self.pipeline.predict_proba(list(texts))
+        best = proba.argmax(axis=1)
+        return self.pipeline.classes_[best], proba[np.arange(len(best)), best]
+
+    def classify(self, texts):
+        """Labels for confident predictions, None where the LLM should decide."""
+        labels, confidence = self.predict(texts)
+        return [label if conf >= self.threshold else None for label, conf in zip(labels, confidence)]
+
+    def coverage(self, texts, truth, thresholds=DEFAULT_THRESHOLDS):
+        """[(threshold, share answered locally, accuracy of those answers)] on labelled texts."""
+        labels, confidence = self.predict(texts)
+        truth = np.asarray(truth, dtype=object)
+        rows = []
+        for threshold in thresholds:
+            answered = confidence >= threshold
+            accuracy = (labels[answered] == truth[answered]).mean() if answered.any() else float("nan")
+            rows.append((threshold, answered.mean(), accuracy))
+        return rows
+
+    def save(self, path):
+        import joblib
+
+        joblib.dump({"pipeline": self.pipeline, "threshold": self.threshold,
+                     "trained_on": self.trained_on}, path)
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        import joblib
+
+        artifact = joblib.load(path)
+        return cls(artifact["pipeline"], threshold if threshold is not None else artifact["threshold"],
+                   artifact.get("trained_on", 0))
+
+
+def train_local_model(texts, labels, threshold=DEFAULT_THRESHOLD, holdout=0.2, seed=0):
+    """
+    Fit on texts/labels. With holdout, a stratified share is kept back first
+    and the returned coverage rows describe that unseen part; the model is then
+    refitted on everything.
+    """
+    if not SKLEARN_AVAILABLE:
+        raise RuntimeError("scikit-learn is not installed")
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+
+    def fit(x, y):
+        pipeline = make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), preprocessor=normalize_remark,
+                            min_df=2, sublinear_tf=True),
+            LogisticRegression(max_iter=1000, C=10.0),
+        )
+        return pipeline.fit(x, y)
+
+    texts, labels = list(texts), list(labels)
+    report = []
+    counts = pd.Series(labels).value_counts()
+    if holdout and len(texts) >= 10 and counts.min() >= 2:
+        x_train, x_test, y_train, y_test = train_test_split(
+            texts, labels, test_size=holdout, random_state=seed, stratify=labels)
+        report = LocalClassifier(fit(x_train, y_train), threshold).coverage(x_test, y_test)
+    return LocalClassifier(fit(texts, labels), threshold, trained_on=len(texts)), report
+
+
+def train_from_files(paths, model_path=DEFAULT_MODEL_FILE, threshold=DEFAULT_THRESHOLD):
+    """Train on one or more categorized outputs and write the model artifact."""
+    orders = pd.concat([labelled_orders(read_categorized(path)) for path in paths])
+    model, report = train_local_model(orders['AI_Input'], orders['Predicted_Category'], threshold)
+    model.save(model_path)
+    return model, report
+
+
+def open_local_model(input_path, model_path=None):
+    """
+    The model given, or DEFAULT_MODEL_FILE next to the input listing; None if
+    that default is absent or cannot be loaded without scikit-learn/joblib. An
+    explicit model_path that cannot be loaded raises instead.
+    """
+    if not SKLEARN_AVAILABLE:
+        if model_path:
+            raise ImportError(f"Loading local model {model_path} needs "
+                              f"{' and '.join(_MISSING_PACKAGES)} (not installed)")
+        return None
+    path = model_path or os.path.join(os.path.dirname(input_path), DEFAULT_MODEL_FILE)
+    if not os.path.exists(path):
+        if model_path:
+            raise FileNotFoundError(f"Local model not found: {model_path}")
+        return None
+    return LocalClassifier.load(path)
@@ -0,0 +1,482 @@
+"""
+Compiled Keyword Rule Engine
+Precompiles KEYWORD_RULES into one alternation per priority tier so each order
+costs one regex scan per category instead of one per pattern. An Aho-Corasick
+prefilter over each pattern's required literal skips every pattern that
+cannot possibly match. Rule hits also get a specificity score (winning
+patterns, competing categories, historical pattern precision) so AI
+verification can be limited to the ambiguous ones, and profile() reports
+per-pattern cost and hits for pruning and reordering. Very large listings
+can be sharded across worker processes.
+"""
+
+import json
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+DEFAULT_PRIOR_PRECISION = 0.8   # Assumed precision of a pattern with no history
+PRIOR_WEIGHT = 5                # History hits before a pattern's own record outweighs the prior
+DEFAULT_VERIFY_THRESHOLD = 0.9
+MIN_PARALLEL_ROWS = 50_000      # Below this, process start-up costs more than it saves
+SHARDS_PER_WORKER = 4
+
+# Unescaped "(" that opens a capturing group
+_CAPTURING_GROUP = re.compile(r"(?<!\\)\((?!\?)")
+
+
+def compile_tier(patterns):
+    """
+    Combine a category's patterns into a single alternation. Capturing groups
+    become non-capturing since only the match itself matters here.
+    """
+    return re.compile("|".join(f"(?:{_CAPTURING_GROUP.sub('(?:', p)})" for p in patterns))
+
+
+# ============= LITERAL EXTRACTION =============
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+
+def _best_literal_set(candidates):
+    """Pick the candidate set whose shortest literal is longest (most selective)."""
+    best = None
+    for literals in candidates:
+        if not literals or "" in literals:
+            continue
+        score = (min(len(lit) for lit in literals), -len(literals))
+        if best is None or score > best[0]:
+            best = (score, literals)
+    return best[1] if best else None
+
+
+def _required_literals(items):
+    """
+    Walk a parsed regex sequence and return a set of literals such that every
+    match contains at least one of them, or None if no such set is found.
+    """
+    candidates = []
+    run = []
+
+    def flush():
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+        elif op == sre_parse.AT:
+            continue  # zero-width (\b, ^, $) keeps adjacent literals adjacent
+        elif op == sre_parse.SUBPATTERN:
+            flush()
+            candidates.append(_required_literals(av[-1]))
+        elif op == sre_parse.BRANCH:
+            flush()
+            branches = [_required_literals(branch) for branch in av[1]]
+            if all(branches):
+                candidates.append(set().union(*branches))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                candidates.append(_required_literals(av[2]))
+        else:
+            flush()
+    flush()
+    return _best_literal_set(candidates)
+
+
+def required_literals(pattern):
+    """Literals (any one of which) must appear in text for pattern to match."""
+    try:
+        return _required_literals(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+
+# ============= MULTI-LITERAL MATCHER =============
+class AhoCorasick:
+    """Pure-Python Aho-Corasick automaton used when pyahocorasick is not installed."""
+
+    def __init__(self, words):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for word_id, word in enumerate(words):
+            node = 0
+            for char in word:
+                nxt = self.goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = nxt
+            self.output[node] = self.output[node] + (word_id,)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, text):
+        """Return the ids of all words that occur in text."""
+        found = set()
+        node = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class _PyAhoCorasick:
+    """Adapter giving pyahocorasick the same find() interface."""
+
+    def __init__(self, words):
+        self.automaton = ahocorasick.Automaton()
+        for word_id, word in enumerate(words):
+            self.automaton.add_word(word, word_id)
+        self.automaton.make_automaton()
+        self.empty = not words
+
+    def find(self, text):
+        if self.empty:
+            return set()
+        return {word_id for _, word_id in self.automaton.iter(text)}
+
+
+def build_literal_matcher(words):
+    if AHOCORASICK_AVAILABLE:
+        return _PyAhoCorasick(words)
+    return AhoCorasick(words)
+
+
+class RuleEngine:
+    """Priority-ordered keyword classifier built once at import time."""
+
+    def __init__(self, rules, priority_order):
+        self.rules = rules
+        self.priority_order = [c for c in priority_order if c in rules]
+        self.tiers = [(category, compile_tier(rules[category])) for category in self.priority_order]
+
+        # Prefilter: literal -> patterns it gates; patterns without a literal always run
+        self.patterns = []          # (tier index, compiled pattern)
+        self.unfiltered = [[] for _ in self.priority_order]  # tier -> patterns with no literal
+        literal_ids = {}
+        self.literal_patterns = []  # literal id -> pattern ids
+        for tier, category in enumerate(self.priority_order):
+            for pattern in rules[category]:
+                pattern_id = len(self.patterns)
+                self.patterns.append((tier, re.compile(pattern)))
+                literals = required_literals(pattern)
+                if not literals:
+                    self.unfiltered[tier].append(pattern_id)
+                    continue
+                for literal in literals:
+                    if literal not in literal_ids:
+                        literal_ids[literal] = len(self.literal_patterns)
+                        self.literal_patterns.append([])
+                    self.literal_patterns[literal_ids[literal]].append(pattern_id)
+        self.literals = list(literal_ids)
+        self.matcher = build_literal_matcher(self.literals)
+        self.always_run = {tier for tier, ids in enumerate(self.unfiltered) if ids}
+
+    def candidate_patterns(self, text_lower):
+        """Pattern ids, grouped by tier, whose required literal occurs in text_lower."""
+        by_tier = {tier: list(ids) for tier, ids in enumerate(self.unfiltered) if ids}
+        for literal_id in self.matcher.find(text_lower):
+            for pattern_id in self.literal_patterns[literal_id]:
+                by_tier.setdefault(self.patterns[pattern_id][0], []).append(pattern_id)
+        return by_tier
+
+    def matching_patterns(self, text_lower):
+        """Ids of every pattern that matches text_lower, in priority order."""
+        by_tier = self.candidate_patterns(text_lower)
+        candidates = sorted({pattern_id for ids in by_tier.values() for pattern_id in ids})
+        return [pattern_id for pattern_id in candidates if self.patterns[pattern_id][1].search(text_lower)]
+
+    def pattern_key(self, pattern_id):
+        """(category, pattern source) - stable across runs, unlike the id."""
+        tier, regex = self.patterns[pattern_id]
+        return self.priority_order[tier], regex.pattern
+
+    def candidate_tier_mask(self, text_lower):
+        """Bitmask of tiers that have at least one candidate pattern for text_lower."""
+        mask = 0
+        for tier in self.always_run:
+            mask |= 1 << tier
+        for literal_id in self.matcher.find(text_lower):
+            for pattern_id in self.literal_patterns[literal_id]:
+                mask |= 1 << self.patterns[pattern_id][0]
+        return mask
+
+    def classify(self, text):
+        """Return the highest-priority matching category, or None."""
+        if not text or pd.isna(text):
+            return None
+        text_lower = str(text).lower()
+        by_tier = self.candidate_patterns(text_lower)
+        for tier in sorted(by_tier):
+            for pattern_id in by_tier[tier]:
+                if self.patterns[pattern_id][1].search(text_lower):
+                    return self.priority_order[tier]
+        return None
+
+    def classify_series(self, texts):
+        """
+        Vectorized classify over a Series. Each tier only scans the rows that no
+        higher-priority tier has claimed yet and whose text contains one of the
+        tier's required literals.
+        """
+        result = pd.Series([None] * len(texts), index=texts.index, dtype=object)
+        valid = texts.notna() & (texts.astype(str) != "")
+        remaining = texts[valid].astype(str).str.lower()
+        tier_masks = np.array([self.candidate_tier_mask(t) for t in remaining], dtype=object)
+
+        for tier, (category, regex) in enumerate(self.tiers):
+            if remaining.empty:
+                break
+            candidates = (tier_masks & (1 << tier)) != 0
+            if not candidates.any():
+                continue
+            hit = np.zeros(len(remaining), dtype=bool)
+            hit[candidates] = remaining[candidates].str.contains(regex).values
+            result[remaining.index[hit]] = category
+            remaining = remaining[~hit]
+            tier_masks = tier_masks[~hit]
+
+        return result
+
+    def specificity(self, texts, precision=None):
+        """
+        Evidence behind each row's rule category: Rule_Hits (winning-category
+        patterns that matched), Rule_Competing (other categories that matched
+        too) and Rule_Confidence, the chance that at least one winning pattern
+        is right when each counts as independent evidence with its
+        RulePrecision (the prior if precision is None). Rows no rule matches
+        get 0 hits and a NaN confidence.
+        """
+        precision = precision or RulePrecision()
+        hits = np.zeros(len(texts), dtype=np.int64)
+        competing = np.zeros(len(texts), dtype=np.int64)
+        confidence = np.full(len(texts), np.nan)
+        for row, text in enumerate(texts):
+            if not text or pd.isna(text):
+                continue
+            matched = self.matching_patterns(str(text).lower())
+            if not matched:
+                continue
+            tiers = [self.patterns[pattern_id][0] for pattern_id in matched]
+            winner = tiers[0]
+            winning = [pattern_id for pattern_id, tier in zip(matched, tiers) if tier == winner]
+            hits[row] = len(winning)
+            competing[row] = len(set(tiers)) - 1
+            doubt = 1.0
+            for pattern_id in winning:
+                doubt *= 1.0 - precision.precision(*self.pattern_key(pattern_id))
+            confidence[row] = 1.0 - doubt
+        return pd.DataFrame({"Rule_Hits": hits, "Rule_Competing": competing, "Rule_Confidence": confidence},
+                            index=getattr(texts, "index", None))
+
+    def classify_series_parallel(self, texts, workers=1):
+        """
+        classify_series sharded across a process pool for very large listings.
+        Each worker compiles the rules once; shards come back in order, so the
+        result is identical to classify_series.
+        """
+        if workers <= 1 or len(texts) < MIN_PARALLEL_ROWS:
+            return self.classify_series(texts)
+        values = texts.tolist()
+        shard_rows = -(-len(values) // (workers * SHARDS_PER_WORKER))
+        shards = [values[i:i + shard_rows] for i in range(0, len(values), shard_rows)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(self.rules, self.priority_order)) as pool:
+            parts = list(pool.map(_classify_shard, shards))
+        return pd.Series([c for part in parts for c in part], index=texts.index, dtype=object)
+
+    def profile(self, texts, timer=None):
+        """
+        Profile every pattern over texts (a Series): search time without the
+        prefilter, how many texts the prefilter lets it run on, matches, wins
+        (it matched for the category classify assigns), unique wins (the only
+        winning pattern, so removing it changes the result) and shadowed
+        matches pre-empted by a higher-priority category. Returns one row per
+        pattern in priority order; Shadowed_By is the most common pre-empting
+        category.
+        """
+        timer = timer or time.perf_counter
+        lowered = [str(t).lower() for t in texts if t and not pd.isna(t)]
+        n_patterns = len(self.patterns)
+        hits = np.zeros((len(lowered), n_patterns), dtype=bool)
+        seconds = np.zeros(n_patterns)
+        for pattern_id, (_, regex) in enumerate(self.patterns):
+            search = regex.search
+            start = timer()
+            column = [search(text) is not None for text in lowered]
+            seconds[pattern_id] = timer() - start
+            hits[:, pattern_id] = column
+
+        candidates = np.zeros(n_patterns, dtype=np.int64)
+        for text in lowered:
+            by_tier = self.candidate_patterns(text)
+            candidates[sorted({p for ids in by_tier.values() for p in ids})] += 1
+
+        tier_of = np.array([tier for tier, _ in self.patterns], dtype=np.int64)
+        matched_tiers = np.where(hits, tier_of[None, :], len(self.priority_order))
+        winner = matched_tiers.min(axis=1) if n_patterns else np.zeros(len(lowered), dtype=np.int64)
+        wins = hits & (tier_of[None, :] == winner[:, None])
+        shadowed = hits & (tier_of[None, :] > winner[:, None])
+        unique = wins & (wins.sum(axis=1) == 1)[:, None]
+
+        rows = []
+        for pattern_id, (tier, regex) in enumerate(self.patterns):
+            pre_empting = winner[shadowed[:, pattern_id]]
+            shadowed_by = (self.priority_order[np.bincount(pre_empting).argmax()]
+                           if len(pre_empting) else None)
+            rows.append({
+                "Priority": tier + 1,
+                "Category": self.priority_order[tier],
+                "Pattern": regex.pattern,
+                "Seconds": seconds[pattern_id],
+                "Us_Per_Text": seconds[pattern_id] / max(1, len(lowered)) * 1e6,
+                "Prefilter_Runs": int(candidates[pattern_id]),
+                "Matches": int(hits[:, pattern_id].sum()),
+                "Wins": int(wins[:, pattern_id].sum()),
+                "Unique_Wins": int(unique[:, pattern_id].sum()),
+                "Shadowed": int(shadowed[:, pattern_id].sum()),
+                "Shadowed_By": shadowed_by,
+            })
+        return pd.DataFrame(rows)
+
+
+# Per-process engine for classify_series_parallel
+_worker_engine = None
+
+
+def _init_worker(rules, priority_order):
+    global _worker_engine
+    _worker_engine = RuleEngine(rules, priority_order)
+
+
+def _classify_shard(values):
+    return _worker_engine.classify_series(pd.Series(values, dtype=object)).tolist()
+
+
+# ============= RULE SPECIFICITY =============
+class RulePrecision:
+    """
+    How often each pattern's category agreed with the final (AI-verified or
+    reviewed) label of the orders it matched in earlier outputs. Patterns with
+    few hits are shrunk towards prior, weighted like weight extra hits.
+    """
+
+    def __init__(self, counts=None, prior=DEFAULT_PRIOR_PRECISION, weight=PRIOR_WEIGHT):
+        self.counts = counts or {}  # (category, pattern) -> [hits, agreed]
+        self.prior = prior
+        self.weight = weight
+
+    @classmethod
+    def from_history(cls, engine, texts, labels, **kwargs):
+        """Count, for every pattern matching a historical text, whether its category was the label."""
+        result = cls(**kwargs)
+        for text, label in zip(texts, labels):
+            if not text or pd.isna(text):
+                continue
+            for pattern_id in engine.matching_patterns(str(text).lower()):
+                key = engine.pattern_key(pattern_id)
+                counts = result.counts.setdefault(key, [0, 0])
+                counts[0] += 1
+                counts[1] += key[0] == label
+        return result
+
+    def precision(self, category, pattern):
+        hits, agreed = self.counts.get((category, pattern), (0, 0))
+        return (agreed + self.prior * self.weight) / (hits + self.weight)
+
+    def weakest(self, n=10, min_hits=PRIOR_WEIGHT):
+        """[(category, pattern, hits, precision)] of the least precise patterns with enough history."""
+        rows = [(category, pattern, hits, self.precision(category, pattern))
+                for (category, pattern), (hits, _) in self.counts.items() if hits >= min_hits]
+        return sorted(rows, key=lambda row: row[3])[:n]
+
+    def save(self, path):
+        patterns = [{"category": category, "pattern": pattern, "hits": hits, "agreed": agreed}
+                    for (category, pattern), (hits, agreed) in sorted(self.counts.items())]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"prior": self.prior, "weight": self.weight, "patterns": patterns}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        counts = {(p["category"], p["pattern"]): [p["hits"], p["agreed"]] for p in data.get("patterns", [])}
+        return cls(counts, data.get("prior", DEFAULT_PRIOR_PRECISION), data.get("weight", PRIOR_WEIGHT))
+
+
+class VerifyGate:
+    """
+    Picks the rule hits worth an AI verification call: those where another
+    category also matched or whose Rule_Confidence is below threshold.
+    threshold=None verifies every rule hit, as before. Counts what it skipped.
+    """
+
+    def __init__(self, engine, threshold=DEFAULT_VERIFY_THRESHOLD, precision=None):
+        self.engine = engine
+        self.threshold = threshold
+        self.precision = precision
+        self.rule_hits = 0
+        self.competing = 0
+        self.low_confidence = 0
+        self.verified = 0
+
+    def select(self, texts):
+        """Boolean array: True where the rule hit in texts should be verified."""
+        self.rule_hits += len(texts)
+        if self.threshold is None:
+            self.verified += len(texts)
+            return np.ones(len(texts), dtype=bool)
+        spec = self.engine.specificity(texts, self.precision)
+        competing = spec["Rule_Competing"].values > 0
+        low = ~competing & ~(spec["Rule_Confidence"].values >= self.threshold)
+        self.competing += int(competing.sum())
+        self.low_confidence += int(low.sum())
+        selected = competing | low
+        self.verified += int(selected.sum())
+        return selected
+
+    def summary(self, batch_size=None):
+        skipped = self.rule_hits - self.verified
+        line = (f"Verification gate: {self.rule_hits} rule hits, {self.verified} verified "
+                f"({self.competing} competing, {self.low_confidence} low confidence), {skipped} skipped")
+        if batch_size:
+            requests = -(-self.rule_hits // batch_size) - -(-self.verified // batch_size)
+            line += f" (~{requests} verification requests saved at {batch_size} per batch)"
+        return line
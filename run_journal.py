@@ -0,0 +1,123 @@
+"""
+Checkpoint journal for classification runs
+Appends each finished batch of order categories to a JSONL file keyed by
+Temp_Order_ID, so a run that crashes (or a laptop that sleeps) can be resumed
+and only the orders without a journal entry are sent to the model again.
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+
+from classification_cache import UNCACHEABLE, normalize_text
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def journal_path(input_path):
+    """The journal kept next to the input listing."""
+    return os.path.splitext(input_path)[0] + JOURNAL_SUFFIX
+
+
+def run_key(input_path, *parts):
+    """
+    Identify a run by its input file (path, size, mtime) and whatever else must
+    match for old results to be reused, e.g. model name and prompt hash.
+    """
+    stat = os.stat(input_path)
+    return "|".join([os.path.abspath(input_path), str(stat.st_size), str(int(stat.st_mtime))]
+                    + [str(p) for p in parts])
+
+
+def _plain(value):
+    """numpy scalars -> Python values so order ids survive JSON."""
+    return value.item() if hasattr(value, "item") else value
+
+
+class RunJournal:
+    """
+    Append-only record of order_id -> category. With resume=True, entries from
+    a journal written for the same run_key are loaded into completed; otherwise
+    (or if the key differs) the journal starts empty.
+    """
+
+    def __init__(self, path, key, resume=False):
+        self.path = path
+        self.key = key
+        self.completed = {}
+        self.stale = False
+        self.recorded = 0
+        self.pending = defaultdict(list)
+        self.lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._load()
+        mode = "a" if self.completed else "w"
+        self.file = open(path, mode, encoding="utf-8")
+        if mode == "w":
+            self._write({"run": key})
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        if header.get("run") != self.key:
+            self.stale = True
+            return
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from the crash
+            self.completed.update(zip(entry["ids"], entry["categories"]))
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, order_ids, categories):
+        """Append finished orders; ERROR/None results are left out so a resume retries them."""
+        done = [(_plain(i), c) for i, c in zip(order_ids, categories) if c not in UNCACHEABLE]
+        if not done:
+            return
+        ids, cats = zip(*done)
+        with self.lock:
+            self._write({"ids": list(ids), "categories": list(cats)})
+            self.completed.update(done)
+            self.recorded += len(done)
+
+    def track(self, order_ids, texts):
+        """Remember which orders are waiting on which text, for record_texts."""
+        with self.lock:
+            for order_id, text in zip(order_ids, texts):
+                self.pending[normalize_text(text)].append(order_id)
+
+    def record_texts(self, texts, categories):
+        """Record a classified batch of texts against every tracked order that has that text."""
+        ids, cats = [], []
+        with self.lock:
+            for text, category in zip(texts, categories):
+                if category in UNCACHEABLE:
+                    continue
+                for order_id in self.pending.pop(normalize_text(text), []):
+                    ids.append(order_id)
+                    cats.append(category)
+        self.record(ids, cats)
+
+    def summary(self):
+        return f"Journal: {len(self.completed) - self.recorded} orders resumed, {self.recorded} recorded this run"
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+    def remove(self):
+        """Close and delete the journal once the run's output is safely written."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
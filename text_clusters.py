@@ -0,0 +1,206 @@
+"""
+Near-Duplicate Remark Clustering
+Normalizes void remarks (abbreviations, bill numbers, spacing) and groups
+identical normalized forms, or near-identical ones with MinHash/LSH, so only
+one representative per cluster is sent to the LLM and its label is copied to
+the rest of the cluster.
+"""
+
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.85    # Minimum shingle Jaccard between a member and its representative
+# ClusterStage default: identical normalized forms only, so a remark's label
+# depends on its own text and not on which other remarks share the run
+EXACT_THRESHOLD = 1.0
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+SHINGLE_SIZE = 3
+
+# Token rewrites from the prompt's ABBREVIATIONS & SLANG DICTIONARY
+ABBREVIATIONS = {
+    "cux": "customer", "cx": "customer", "cus": "customer", "cu": "customer",
+    "dkt": "docket",
+    "nbn": "new bill number",
+    "odar": "order", "oder": "order", "ordewr": "order",
+    "mistakly": "mistakenly", "mistakely": "mistakenly", "mistacly": "mistakenly",
+    "dubble": "double", "doubble": "double",
+    "availble": "available", "availabel": "available",
+    "cansel": "cancel", "cancell": "cancel", "cancal": "cancel",
+    "gride": "grid",
+    "deley": "delay",
+    "cashiar": "cashier", "cashiyar": "cashier",
+    "assinged": "assigned", "assined": "assigned",
+    "respons": "respond", "responsd": "respond",
+    "senter": "center", "centar": "center", "centre": "center",
+    "wont": "want",
+    "didn": "didnt",
+    "infomed": "informed",
+    "acording": "according",
+}
+
+_TAKE_AWAY = re.compile(r"\bt\s*/\s*w\b")
+_BILL_ID = re.compile(r"\b[a-z]{1,2}[\s-]?\d{3,7}\b")
+_NUMBER = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[^a-z<>]+")
+_MERSENNE = (1 << 31) - 1
+
+
+def normalize_remark(text):
+    """Lowercase, expand abbreviations and replace bill numbers / numbers with placeholders."""
+    text = str(text).lower().replace("'", "")
+    text = _TAKE_AWAY.sub(" take away ", text)
+    text = _BILL_ID.sub(" <bill> ", text)
+    text = _NUMBER.sub(" <num> ", text)
+    tokens = _NON_WORD.sub(" ", text).split()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def shingles(normalized):
+    """Hashed character shingles of a normalized remark."""
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode("utf-8"))
+            for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signatures(shingle_sets, num_perm=DEFAULT_NUM_PERM, seed=0, chunk=2000):
+    """(len(shingle_sets), num_perm) MinHash matrix, computed chunk by chunk with reduceat."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for start in range(0, len(shingle_sets), chunk):
+        part = shingle_sets[start:start + chunk]
+        sizes = np.fromiter((len(s) for s in part), dtype=np.int64, count=len(part))
+        hashes = np.fromiter((h for s in part for h in s), dtype=np.uint64, count=int(sizes.sum()))
+        hashes %= np.uint64(_MERSENNE)
+        permuted = (hashes[:, None] * a[None, :] + b[None, :]) % np.uint64(_MERSENNE)
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        signatures[start:start + len(part)] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures
+
+
+class TextClusters:
+    """
+    Result of cluster_texts: representatives (one original text per cluster),
+    labels (cluster index for each input text) and similarity (each text's
+    shingle Jaccard to its representative).
+    """
+
+    def __init__(self, representatives, labels, similarity):
+        self.representatives = representatives
+        self.labels = labels
+        self.similarity = similarity
+
+    def expand(self, representative_results):
+        """Copy each representative's result to every member of its cluster."""
+        return [representative_results[c] for c in self.labels]
+
+
+def cluster_texts(texts, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                  bands=DEFAULT_BANDS, seed=0):
+    """
+    Group texts whose normalized forms are identical or near-identical. The
+    most frequent normalized form becomes a representative, then LSH bucket
+    neighbours within threshold Jaccard of it join its cluster. Every member
+    is compared with the representative itself, so clusters do not chain.
+    """
+    keys = [normalize_remark(t) for t in texts]
+    counts = Counter(keys)
+    unique = sorted(counts, key=lambda k: -counts[k])
+    first_text = {}
+    for text, key in zip(texts, keys):
+        first_text.setdefault(key, text)
+
+    sets = [shingles(k) for k in unique]
+    signatures = minhash_signatures(sets, num_perm, seed) if unique else np.empty((0, num_perm))
+    rows = num_perm // bands
+    buckets = defaultdict(list)
+    key_buckets = [[] for _ in unique]
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, row in enumerate(block):
+            bucket = (band, row.tobytes())
+            buckets[bucket].append(i)
+            key_buckets[i].append(bucket)
+
+    cluster_of = np.full(len(unique), -1, dtype=np.int64)
+    key_similarity = np.ones(len(unique))
+    representatives = []
+    for i in range(len(unique)):
+        if cluster_of[i] >= 0:
+            continue
+        cluster = len(representatives)
+        representatives.append(first_text[unique[i]])
+        cluster_of[i] = cluster
+        for bucket in key_buckets[i]:
+            for j in buckets[bucket]:
+                if cluster_of[j] >= 0:
+                    continue
+                similarity = jaccard(sets[i], sets[j])
+                if similarity >= threshold:
+                    cluster_of[j] = cluster
+                    key_similarity[j] = similarity
+
+    position = {k: i for i, k in enumerate(unique)}
+    index = np.fromiter((position[k] for k in keys), dtype=np.int64, count=len(keys))
+    return TextClusters(representatives, cluster_of[index], key_similarity[index])
+
+
+class ClusterStage:
+    """
+    Pre-LLM step that classifies one representative per cluster and counts
+    what it saved. The representative sent to classify_texts is an original
+    member text, as the prompt expects raw remarks; its normalized form (see
+    canonical) is what callers key the cache and journal by. At
+    EXACT_THRESHOLD only remarks with the same normalized form share a label;
+    a lower threshold also merges near-duplicates, whose labels then depend
+    on the rest of the run. threshold=None turns clustering off.
+    """
+
+    def __init__(self, threshold=EXACT_THRESHOLD):
+        self.threshold = threshold
+        self.texts = 0
+        self.representatives = 0
+
+    def canonical(self, texts):
+        """Cache/journal key of each remark: its normalized form."""
+        if self.threshold is None:
+            return list(texts)
+        return [normalize_remark(t) or t for t in texts]
+
+    def classify(self, texts, classify_texts):
+        """Same contract as classify_texts: predictions aligned with texts."""
+        if self.threshold is None or not texts:
+            self.texts += len(texts)
+            self.representatives += len(texts)
+            return classify_texts(texts)
+        if self.threshold >= EXACT_THRESHOLD:
+            first_text, labels = {}, []
+            for key, text in zip(self.canonical(texts), texts):
+                labels.append(first_text.setdefault(key, (len(first_text), text))[0])
+            clusters = TextClusters([text for _, text in first_text.values()], labels, np.ones(len(texts)))
+        else:
+            clusters = cluster_texts(texts, self.threshold)
+        self.texts += len(texts)
+        self.representatives += len(clusters.representatives)
+        return clusters.expand(classify_texts(clusters.representatives))
+
+    def summary(self, batch_size=None):
+        saved = self.texts - self.representatives
+        line = (f"Clustering: {self.texts} texts -> {self.representatives} representatives "
+                f"({saved} LLM texts saved")
+        if batch_size:
+            requests = -(-self.texts // batch_size) - -(-self.representatives // batch_size)
+            line += f", ~{requests} requests at {batch_size} per batch"
+        return line + ")"
@@ -7,16 +7,11 @@ A comprehensive GUI application combining:
 """
 
 import os
-import sys
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import pandas as pd
-import numpy as np
-import json
-import time
-import re
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Chart imports
 import matplotlib
@@ -25,266 +20,33 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 
-try:
+from llm_retry import SDK_MAX_RETRIES
+from local_model import open_local_model
+from void_io import read_categorized, read_listing
+from void_pipeline import (FRIENDLY_NAMES, GROQ_AVAILABLE, FraudResults, ProgressListener,
+                           categorize_listing, detect_fraud, export_report, open_cache, open_journal,
+                           open_rule_precision, prepare_parent_df, save_categorized)
+
+if GROQ_AVAILABLE:
     from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
 
 # ============= CONSTANTS =============
-BATCH_SIZE = 20
-MODEL_NAME = "openai/gpt-oss-120b"
 APP_VERSION = "2.0.0"
 
-CATEGORIES = [
-    "Call Center mistake",
-    "Cashier mistake",
-    "cus. Change the order",
-    "cus.related issue",
-    "Customer Cancel order",
-    "Customer denied the order",
-    "double punch",
-    "grid issue",
-    "location",
-    "order cancelled by aggregator",
-    "Order delay",
-    "order type change",
-    "other",
-    "out of stock",
-    "payment issue",
-    "phone",
-    "product issue or complain",
-    "promotion",
-    "rider issue",
-    "system issue",
-    "testing",
-    "voids without clear reason/ remark"
-]
-
-# Friendly names mapping (from Void_Bills_Report_Colab.ipynb)
-FRIENDLY_NAMES = {
-    'cus. Change the order': 'Change of customer request',
-    'promotion': 'Promotion',
-    'Cashier mistake': 'Cashier mistake',
-    'Customer denied the order': 'Customer denied the order',
-    'Customer Cancel order': 'Customer Cancel order',
-    'cus.related issue': 'Customer Related Issue',
-    'grid issue': 'Grid issue',
-    'phone': 'Contact Number Issues',
-    'order without reason/ remark': 'Orders Without Reason / Remark',
-    'voids without clear reason/ remark': 'Voids Without Clear Reason / Remark',
-    'no reason/remark': 'No Reason/Remark',
-    'Order delay': 'Order Delay',
-    'order type change': 'Order Type Change',
-    'system issue': 'System issue / breakdown',
-    'rider issue': 'Riders related issues',
-    'double punch': 'Order Double Punched',
-    'payment issue': 'Payment Issues',
-    'out of stock': 'Out of Stock',
-    'location': 'Location',
-    'testing': 'Testing',
-    'Call Center mistake': 'CSR Issue',
-    'product issue or complain': 'Product issue or complain',
-    'order cancelled by aggregator': 'Order cancelled by aggregator',
-    'other': 'Other'
-}
-
-# ============= RULE-BASED CLASSIFICATION (from void_bills_app.py) =============
-KEYWORD_RULES = {
-    "testing": [
-        r"\btest\s*(order|odar|oder)?\b", r"\btesting\b", r"\btes\s*oder\b",
-        r"\bproduct\s*testing\b", r"\bfrom\s*(it|preshan)\b",
-        r"\bit\s*team\s*check\b"
-    ],
-    "promotion": [
-        r"\blsm\b", r"\bpromo(tion)?\b", r"\boffer\b", r"\b50\s*%\s*(off|flash|discount)?\b",
-        r"\bdiscount\b", r"\bcyber\s*saving\b", r"\bmeal\s*deal\b", r"\bflash\s*offer\b",
-        r"\bdon'?t\s*cook\b", r"\bhsbc\b", r"\bges\s*\d+%\b", r"\b\d+%\s*off\b",
-        r"\b15\s*%\b", r"\b20\s*%\b", r"\b30\s*%\b", r"\b1000\s*off\b",
-        r"\bhave\s*a?\s*\d+%\s*discount\b"
-    ],
-    "payment issue": [
-        r"\bcredit\s*card\b", r"\bcard\s*(not\s*work|isn'?t\s*work|failed)\b",
-        r"\bhnb\s*card\b", r"\bbank\s*card\b", r"\bvisa\b", r"\bmachine\b",
-        r"\bpayment\s*(method|issue)?\b", r"\bpetty\s*cash\b", r"\bonline\s*payment\b",
-        r"\bpaid\s*order\b", r"\bdon'?t\s*have\s*(enough\s*)?(money|cash)\b"
-    ],
-    "Cashier mistake": [
-        r"\bcashier\s*(mistake|mistakenly|mistakly|wrong)\b", r"\bwrongly\s*punch(ed)?\b",
-        r"\bmistakenly\s*(punch|close|add|collect|mark|order|dispatch)\b", r"\bmistakly\b",
-        r"\bcashier\s*error\b", r"\bwrong\s*(punch|order|bill|close)\b",
-        r"\bcashiar\b", r"\bcashiyar\b", r"\bwrong\s*by\s*cashier\b",
-        r"\bwrong\s*order[sw]?\b", r"\bwrong\s*ordewr\b", r"\bmiss\s*communication\b",
-        r"\bdispatcher\s*mistakenly\b", r"\bdispatcher\s*collected\b",
-        r"\bmistakenly\s*orders?\s*split\b", r"\bdidn'?t\s*close\b", r"\bdidnt\s*close\b",
-        r"\bdispac?ter\s*mistakenly\b"
-    ],
-    "Call Center mistake": [
-        r"\bcsr\s*(error|mistake)?\b", r"\bsale\s*cent(er|re)\s*(error|mistake|issue|request)?\b",
-        r"\bcall\s*cent(er|re)\s*(error|mistake|asked|have\s*wrongly)?\b", r"\bsales\s*cent(er|re)\b",
-        r"\baccording\s*to\s*call\s*cent\b", r"\bacording\s*to\s*call\s*senter\b",
-        r"\binformed\s*by\s*outlet\b", r"\binfomed\s*by\s*outlet\b",
-        r"\bsale\s*center\s*mistac?ly\b", r"\bcall\s*center\s*have\s*wrongly\b"
-    ],
-    "Customer denied the order": [
-        r"\bcustomer\s*denied\b", r"\bcux\s*denied\b", r"\bdenied\s*(the\s*)?order\b",
-        r"\bcustermar\s*denied\b", r"\brefuse[d]?\s*(the\s*)?order\b",
-        r"\breject(ed)?\s*(the\s*)?order\b", r"\bdeniend\b", r"\bdenaid\b",
-        r"\bdidn'?t\s*place\s*(any\s*)?order\b", r"\bdidnt\s*place\s*(any\s*)?order\b",
-        r"\bhe\s*didnt\s*place\b"
-    ],
-    "Customer Cancel order": [
-        r"\bcustomer\s*(want\s*(to\s*)?)?cancel\b", r"\bcux\s*cancel\b",
-        r"\bcx\s*(want\s*(to\s*)?)?cancel\b", r"\bcu\s*wont\s*to\s*cancel\b",
-        r"\bcustomer\s*cansel\b", r"\bcustomer\s*cancell\b", r"\bcustomr\s*cancal\b",
-        r"\bplease\s*cancel\b", r"\bcncl\b", r"\bcustomer\s*cancelled\b"
-    ],
-    "double punch": [
-        r"\bordered\s*twice\b", r"\bsame\s*order\s*\d+\b", r"\b2\s*times?\s*(same\s*)?order\b",
-        r"\btwo\s*orders?\s*(were\s*)?(placed|same)\b", r"\bdouble\b", r"\bdubble\b",
-        r"\btwise\s*the\s*order\b", r"\bpast\s*same\s*order\b"
-    ],
-    "grid issue": [
-        r"\bgrid\s*(issue)?\b", r"\bout\s*of\s*grid\b", r"\bgride\s*issue\b"
-    ],
-    "location": [
-        r"\bwrong\s*address\b", r"\bwrong\s*location\b", r"\bdifferent\s*(location|outlet|city)\b",
-        r"\bwant\s*to\s*deliver\s*\w+\s*outlet\b", r"\bgo(ing)?\s*(to|from)\s*\w+\b",
-        r"\btransfer(red)?\s*to\b", r"\bdeliver\s*from\b",
-        r"\bslave\s*island\b", r"\bnearest\s*location\b", r"\bsent\s*\d+\b",
-        r"\bfrom\s+\w+\s*outlet\b", r"\bto\s+\w+\s*outlet\b", r"\boutlet\s*order\b",
-        r"\bdelivery\s+from\s+\w+\b", r"\bwennappuwa\b", r"\bkoswattha\b",
-        r"\bnew\s*dkt\s*\w*\s*\d+\b", r"\bneew\s*order\b", r"\bkochchikade\b",
-        r"\bpanadura\b", r"\bpandura\b", r"\bhavelock\b", r"\b\d{2,3}\s*-\s*\w+\b",
-        r"\bdifferent\s*city\s*with\s*different\s*out\s*let\b", r"\bsimilar\s*address\b"
-    ],
-    "phone": [
-        r"\bphone\s*(number\s*)?(not\s*)?(work|answer|respond)\b",
-        r"\bnot\s*(answer|respond)(ing|ed)?\s*(the\s*)?(call|phone|mobile)?\b",
-        r"\bwrong\s*(phone\s*)?(number|no|mobile)\b", r"\bincorrect\s*number\b",
-        r"\bcan'?t\s*contact\b", r"\bmobile\s*not\s*work\b", r"\bno\s*answer(ing)?\b",
-        r"\bnumber\s*wrong\b", r"\bnumber\s*not\s*work\b",
-        r"\bnot\s*respons\b", r"\bphone\s*call\s*(is\s*)?not\s*reac\b",
-        r"\bcx\s*no\s*answering\b", r"\bnumber\s*is\s*not\s*working\b",
-        r"\bdid\s*not\s*answer\s*(the\s*)?phone\b", r"\bdidn'?t\s*answer\b",
-        r"\bnot\s*in\s*responded?\s*call\b", r"\bphone\s*not\s*responded\b",
-        r"\bvoice\s*mail\b", r"\bgiven\s*number\s*(is\s*)?not\s*working\b",
-        r"\bcalled\s*(the\s*)?customer\s*\d+\s*times\b"
-    ],
-    "Order delay": [
-        r"\border\s*delay(ed)?\b", r"\bdelay\s*(issue|order)?\b", r"\blate\s*issue\b",
-        r"\border\s*deley\b", r"\bpromise\s*time\b", r"\bcan'?t\s*wait\b",
-        r"\bhea[vr]y\s*rain\b"
-    ],
-    "order type change": [
-        r"\bchange\s*(to\s*)?(delivery|take\s*away|dine|pickup|t/?w)\b",
-        r"\bwant\s*(to\s*)?(deliver|delivery)\b", r"\bwant\s*dine\b",
-        r"\bpick\s*up\s*(for|to)\s*delivery\b", r"\btake\s*away\s*can[sc]al\b",
-        r"\border\s*type\s*change\b"
-    ],
-    "cus. Change the order": [
-        r"\bchange\s*(the\s*)?time\b", r"\btime\s*(order|change)\b",
-        r"\bwant\s*(the\s*)?order\s*@\b", r"\bwanted\s*to\s*change\s*(the\s*)?order\b",
-        r"\bcustomer\s*change\b", r"\bcx\s*want(s|ed)?\s*to\s*change\b",
-        r"\bcux\s*want(s|ed)?\s*to\s*change\b", r"\bchange\s*(the\s*)?order\b",
-        r"\bcux\s*want(s|ed)?\s*(large|medium|small|personal)\b",
-        r"\bcustomer\s*want(s|ed)?\s*(large|medium|small|personal)\b",
-        r"\border\s*replaced\b", r"\breplace\s*to\b", r"\breplaced\s*delivery\b",
-        r"\bthis\s*order\s*was\s*placed\s*yesterday\b",
-        r"\bcustomer\s*mistakenly\s*placed\b", r"\bchanged\s*to\s*no\.?\b"
-    ],
-    "out of stock": [
-        r"\bout\s*of\s*stock\b", r"\boos\b", r"\bstock\s*out\b",
-        r"\b(item|product|pizza|coke|coca|pepsi|drink|topping|ingredient)s?\s*(is\s*)?(not\s*)?(available|have)\b",
-        r"\bnot\s*available\s*(at\s*)?\s*(main\s*)?supplier\b",
-        r"\bsome\s*items\s*are\s*not\s*available\b"
-    ],
-    "rider issue": [
-        r"\brider\s*(mistake|mistakenly|issue)\b", r"\brider'?s?\s*issue\b",
-        r"\briderr?s?issue\b",
-        r"\briders?\s*(not\s*)?(assigned|assinged|assined)\b",
-        r"\bno\s*rider\s*(arrived|assigned|assinged)\b",
-        r"\bnorider\s*arrived\b", r"\brider\s*not\s*(assigned|assinged|arrived)\b",
-        r"\brider\s*arrived\s*yet\b", r"\briderarrived\s*yet\b"
-    ],
-    "system issue": [
-        r"\bsystem\s*(error|issue)\b", r"\bsystem\s*show\b",
-        r"\brider\s*app\b", r"\bcan\s*not\s*delivered?\s*in\s*rider\s*app\b",
-        r"\bit\s*team\s*(is\s*)?busy\b"
-    ],
-    "order cancelled by aggregator": [
-        r"\buber\b", r"\bpick\s*me\b", r"\bpickme\b", r"\baggregator\b",
-        r"\bcancelled?\s*by\s*(uber|pick\s*me)\b", r"\border\s*cancel(led)?\s*by\b"
-    ],
-    "product issue or complain": [
-        r"\bproduct\s*issue\b", r"\bcomplain\b", r"\bdissatisfy\b", r"\bwrong\s*pizza\b"
-    ],
-    "cus.related issue": [
-        r"\bcustomer\s*(is\s*)?(not\s*)?(available|availble)\b", 
-        r"\bcustomer\s*did(n'?t)?\s*come\b",
-        r"\bcustomer\s*left\b", r"\bcustomer\s*visit\b",
-        r"\boutlet\s*closed\b", r"\bpower\s*cut\b",
-        r"\boven\s*breakdown\b", r"\bsecurity\s*department\b",
-        r"\bcux?\s*(is\s*)?(not\s*)?(available|availble)\b",
-        r"\bcustomer\s*not\s*available\b", r"\bcx\s*not\s*available\b",
-        r"\bcalled\s*(the\s*)?customer\s*several\s*times\b",
-        r"\bcustomer\s*(is\s*)?not\s*showed?\s*up\b",
-        r"\bcustomer\s*(was\s*)?(not\s*)?(at\s*)?(the\s*)?location\b",
-        r"\bcustomer\s*wasn'?t\s*available\s*at\s*(the\s*)?location\b",
-        r"\bnot\s*at\s*home\b"
-    ]
-}
-
-PRIORITY_ORDER = [
-    "testing", "Customer denied the order", "double punch",
-    "order cancelled by aggregator", "Cashier mistake", "Call Center mistake",
-    "payment issue", "promotion", "grid issue", "rider issue", "phone",
-    "cus.related issue", "out of stock", "Order delay", "system issue",
-    "order type change", "location", "Customer Cancel order",
-    "cus. Change the order", "product issue or complain"
-]
-
-
-def apply_keyword_rules(text):
-    """Apply rule-based classification (from void_bills_app.py)"""
-    if not text or pd.isna(text):
-        return None
-    text_lower = str(text).lower()
-    for category in PRIORITY_ORDER:
-        if category in KEYWORD_RULES:
-            for pattern in KEYWORD_RULES[category]:
-                if re.search(pattern, text_lower):
-                    return category
-    return None
 
+class TkProgressListener(ProgressListener):
+    """Routes pipeline log lines and progress to the app's log and progress bars."""
 
-def extract_new_bill_id(text):
-    """Extract new bill numbers from text (from void_bills_app.py)"""
-    if not text or pd.isna(text):
-        return None
-    clean_text = str(text).upper()
-    patterns = [
-        r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})',
-        r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})',
-        r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, clean_text)
-        if match:
-            result = match.group(1).replace(" ", "").replace("-", "")
-            if len(result) >= 2:
-                return result
-    match = re.search(r'\b([A-Z]{1,2}\d{4,7})\b', clean_text)
-    if match:
-        return match.group(1)
-    return None
+    def __init__(self, app):
+        self.app = app
 
+    def log(self, message):
+        self.app.log(message)
 
-def is_suspiciously_round(amount):
-    """Check if amount is suspiciously round (from Fraud_Detection_Analysis.ipynb)"""
-    if pd.isna(amount) or amount < 1000:
-        return False
-    return amount % 1000 == 0 or amount % 500 == 0
+    def progress(self, stage, value):
+        bar = {'categorize': self.app.cat_progress, 'fraud': self.app.fraud_progress}.get(stage)
+        if bar is not None:
+            bar['value'] = value
 
 
 class VoidAnalysisCombined:
@@ -304,32 +66,17 @@ class VoidAnalysisCombined:
         self.avail_cols = []
         
         # Fraud analysis results (from Fraud_Detection_Analysis.ipynb)
-        self.high_value_voids = pd.DataFrame()
-        self.no_reason_voids = pd.DataFrame()
-        self.late_night_voids = pd.DataFrame()
-        self.round_voids = pd.DataFrame()
-        self.testing_voids = pd.DataFrame()
-        self.extreme_delay_voids = pd.DataFrame()
-        self.repeat_phone_df = pd.DataFrame()
-        self.phone_summary = pd.DataFrame()
-        self.voider_stats = pd.DataFrame()
-        self.frequent_voiders = pd.DataFrame()
-        self.outlet_stats = pd.DataFrame()
-        self.anomaly_outlets = pd.DataFrame()
-        self.high_risk_orders = pd.DataFrame()
-        self.critical_orders = pd.DataFrame()
-        
-        # Thresholds
-        self.amount_threshold = 0
-        self.avg_voids = 0
+        self.fraud = FraudResults()
         
         # Processing state
         self.is_running = False
         self.client = None
+        self.listener = TkProgressListener(self)
         
         # API settings
         self.api_key = tk.StringVar()
         self.ai_verify_rules = tk.BooleanVar(value=False)
+        self.resume_run = tk.BooleanVar(value=False)
         
         # Setup UI
         self.setup_styles()
@@ -433,6 +180,8 @@ class VoidAnalysisCombined:
         
         ttk.Checkbutton(options_frame, text="AI verify rule-based classifications", 
                        variable=self.ai_verify_rules).pack(anchor=tk.W)
+        ttk.Checkbutton(options_frame, text="Resume interrupted run (skip orders already classified)",
+                       variable=self.resume_run).pack(anchor=tk.W)
         
         # Run button
         self.run_cat_btn = ttk.Button(left_frame, text="Run Categorization", command=self.run_categorization)
@@ -652,78 +401,34 @@ class VoidAnalysisCombined:
         """Categorization worker thread (logic from void_bills_app.py)."""
         try:
             self.log("Initializing API connection...")
-            self.client = Groq(api_key=self.api_key.get())
+            self.client = Groq(api_key=self.api_key.get(), max_retries=SDK_MAX_RETRIES)
             
             self.log(f"Reading {os.path.basename(self.input_file.get())}...")
-            df = pd.read_excel(self.input_file.get())
-            order_col_name = 'Order No'
-            
-            df['Temp_Order_ID'] = df[order_col_name].ffill()
-            
-            def combine_text(x):
-                return " ".join(set([str(s).strip() for s in x if pd.notna(s) and str(s).strip() != '']))
-            
-            grouped = df.groupby('Temp_Order_ID')[['Reason', 'Remark']].agg(combine_text)
-            grouped['AI_Input'] = (grouped['Reason'] + " " + grouped['Remark']).str.strip()
-            grouped['Extracted_Bill_No'] = grouped['AI_Input'].apply(extract_new_bill_id)
-            
-            bill_number_map = grouped['Extracted_Bill_No'].to_dict()
-            
-            orders_with_text = grouped[grouped['AI_Input'].str.len() > 1].copy()
-            orders_empty = grouped[grouped['AI_Input'].str.len() <= 1].index.tolist()
-            
-            total_orders = len(grouped)
-            self.log(f"Total Orders: {total_orders}")
-            self.log(f"Orders to Classify: {len(orders_with_text)}")
-            
-            # Rule-based classification
-            self.log("Applying rule-based classification...")
-            orders_with_text['Rule_Category'] = orders_with_text['AI_Input'].apply(apply_keyword_rules)
-            
-            rule_classified = orders_with_text[orders_with_text['Rule_Category'].notna()]
-            needs_ai = orders_with_text[orders_with_text['Rule_Category'].isna()]
-            
-            self.log(f"  Rule-based: {len(rule_classified)} orders")
-            self.log(f"  Needs AI: {len(needs_ai)} orders")
-            
-            category_map = {}
-            for order_id, row in rule_classified.iterrows():
-                category_map[order_id] = row['Rule_Category']
-            
-            # AI verification if enabled
-            if self.ai_verify_rules.get() and len(rule_classified) > 0:
-                self.log("AI Verification: Checking rule-based classifications...")
-                self._ai_verify_batch(rule_classified, category_map)
-            
-            # AI classification for remaining
-            if len(needs_ai) > 0:
-                self.log("AI classification for remaining orders...")
-                self._ai_classify_batch(needs_ai, category_map)
-            
-            # Handle empty orders
-            for order_id in orders_empty:
-                category_map[order_id] = "no reason/remark"
-            
-            # Apply results
-            self.cat_progress['value'] = 90
-            df['Predicted_Category'] = df['Temp_Order_ID'].map(category_map)
-            df['Extracted_New_Bill'] = df['Temp_Order_ID'].map(bill_number_map)
-            
-            mask_child_rows = df[order_col_name].isna()
-            df.loc[mask_child_rows, 'Predicted_Category'] = None
-            df.loc[mask_child_rows, 'Extracted_New_Bill'] = None
-            
-            del df['Temp_Order_ID']
+            df = read_listing(self.input_file.get())
+            
+            cache = open_cache(self.input_file.get())
+            journal = open_journal(self.input_file.get(), self.ai_verify_rules.get(), self.resume_run.get())
+            local_model = open_local_model(self.input_file.get())
+            if local_model is not None:
+                self.log(f"Local model loaded ({local_model.trained_on} training orders)")
+            rule_precision = open_rule_precision(self.input_file.get()) if self.ai_verify_rules.get() else None
+            try:
+                df = categorize_listing(df, self.client, self.ai_verify_rules.get(), cache, self.listener, journal,
+                                        local_model=local_model, rule_precision=rule_precision)
+            finally:
+                cache.close()
+                journal.close()
+            total_orders = df['Order No'].notna().sum()
             
             # Save output
             output_path = os.path.join(os.path.dirname(self.input_file.get()), self.output_file.get())
-            df.to_excel(output_path, index=False)
+            save_categorized(df, output_path, self.listener)
+            journal.remove()
             
             self.raw_df = df.copy()
             self.categorized_df = df.copy()
             
             self.cat_progress['value'] = 100
-            self.log(f"Saved to: {self.output_file.get()}")
             self.log("Categorization complete!")
             
             self.root.after(0, lambda: messagebox.showinfo("Success", f"Categorization complete!\n{total_orders} orders processed."))
@@ -736,81 +441,6 @@ class VoidAnalysisCombined:
             self.is_running = False
             self.root.after(0, lambda: self.run_cat_btn.config(state='normal'))
             
-    def _ai_verify_batch(self, rule_classified, category_map):
-        """AI verification of rule-based classifications."""
-        rule_ids = rule_classified.index.tolist()
-        rule_texts = rule_classified['AI_Input'].tolist()
-        
-        for i in range(0, len(rule_texts), BATCH_SIZE):
-            batch_ids = rule_ids[i:i+BATCH_SIZE]
-            batch_texts = rule_texts[i:i+BATCH_SIZE]
-            
-            progress = 15 + ((i / len(rule_texts)) * 20)
-            self.cat_progress['value'] = progress
-            
-            ai_results = self._classify_batch(batch_texts)
-            
-            for j, order_id in enumerate(batch_ids):
-                if j < len(ai_results) and ai_results[j] != "ERROR":
-                    if ai_results[j] != category_map[order_id]:
-                        category_map[order_id] = ai_results[j]
-            
-            time.sleep(0.3)
-            
-    def _ai_classify_batch(self, needs_ai, category_map):
-        """AI classification for unclassified orders."""
-        ids_list = needs_ai.index.tolist()
-        texts_list = needs_ai['AI_Input'].tolist()
-        
-        for i in range(0, len(texts_list), BATCH_SIZE):
-            batch_ids = ids_list[i:i+BATCH_SIZE]
-            batch_texts = texts_list[i:i+BATCH_SIZE]
-            
-            progress = 35 + ((i / len(texts_list)) * 50)
-            self.cat_progress['value'] = progress
-            
-            ai_results = self._classify_batch(batch_texts)
-            
-            for j, order_id in enumerate(batch_ids):
-                if j < len(ai_results):
-                    category_map[order_id] = ai_results[j] if ai_results[j] != "ERROR" else "other"
-            
-            self.log(f"  Batch {i//BATCH_SIZE + 1} complete")
-            time.sleep(0.5)
-            
-    def _classify_batch(self, text_list):
-        """AI classification batch (from void_bills_app.py)."""
-        prompt = f"""Classify each void order reason into ONE category from: {json.dumps(CATEGORIES)}
-
-INPUT: {json.dumps(text_list, indent=2)}
-
-OUTPUT: JSON with "predictions" array of category strings."""
-
-        try:
-            completion = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "Classification API. Output valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                response_format={"type": "json_object"}
-            )
-            data = json.loads(completion.choices[0].message.content)
-            predictions = data.get("predictions", [])
-            
-            validated = []
-            for pred in predictions:
-                if pred in CATEGORIES:
-                    validated.append(pred)
-                else:
-                    validated.append("other")
-            return validated
-            
-        except Exception as e:
-            self.log(f"API Error: {e}")
-            return ["ERROR"] * len(text_list)
-            
     # ==================== VOID BILLS REPORT (from Void_Bills_Report_Colab.ipynb) ====================
     def load_categorized_data(self):
         """Load categorized data for report."""
@@ -821,38 +451,21 @@ OUTPUT: JSON with "predictions" array of category strings."""
             
         # Try to load from file
         cat_file = filedialog.askopenfilename(
-            title="Select Categorized Excel File",
-            filetypes=[("Excel files", "*.xlsx")],
+            title="Select Categorized File",
+            filetypes=[("Categorized orders", "*.parquet *.xlsx"), ("Parquet files", "*.parquet"), ("Excel files", "*.xlsx")],
             initialfile="categorized_orders_clean.xlsx"
         )
         
         if cat_file and os.path.exists(cat_file):
-            self.categorized_df = pd.read_excel(cat_file)
+            # Uses the .parquet copy next to an Excel export when there is one
+            self.categorized_df = read_categorized(cat_file)
             self._prepare_parent_df()
             self.refresh_report()
             self.status_var.set(f"Loaded: {os.path.basename(cat_file)}")
             
     def _prepare_parent_df(self):
         """Prepare parent dataframe for analysis."""
-        df = self.categorized_df.copy()
-        self.order_col = df.columns[0]
-        self.parent_df = df[df[self.order_col].notna()].copy()
-        
-        # Parse dates (from Fraud_Detection_Analysis.ipynb)
-        if 'Order Date' in self.parent_df.columns:
-            self.parent_df['Order_Date_Parsed'] = pd.to_datetime(self.parent_df['Order Date'], errors='coerce')
-        if 'Void Date' in self.parent_df.columns:
-            self.parent_df['Void_Date_Parsed'] = pd.to_datetime(self.parent_df['Void Date'], errors='coerce')
-        if 'Order Time' in self.parent_df.columns:
-            self.parent_df['Order_Time_Parsed'] = pd.to_datetime(self.parent_df['Order Time'], errors='coerce')
-        
-        # Calculate time gap
-        if 'Order_Time_Parsed' in self.parent_df.columns and 'Void_Date_Parsed' in self.parent_df.columns:
-            self.parent_df['Time_Gap_Hours'] = (self.parent_df['Void_Date_Parsed'] - self.parent_df['Order_Time_Parsed']).dt.total_seconds() / 3600
-        
-        # Standard columns
-        display_cols = [self.order_col, 'Outlet', 'Order Type', 'Order Date', 'Reason', 'Void By ', 'Amount']
-        self.avail_cols = [c for c in display_cols if c in self.parent_df.columns]
+        self.parent_df, self.order_col, self.avail_cols = prepare_parent_df(self.categorized_df)
         
     def refresh_report(self):
         """Refresh the void bills report display."""
@@ -954,130 +567,8 @@ Number of Outlets: {parent_df['Outlet'].nunique()}"""
     def _fraud_thread(self):
         """Fraud detection worker thread (logic from Fraud_Detection_Analysis.ipynb)."""
         try:
-            parent_df = self.parent_df.copy()
-            order_col = self.order_col
-            
-            self.fraud_progress['value'] = 5
-            
-            # Flag 1: High value voids (above 95th percentile)
-            self.amount_threshold = parent_df['Amount'].quantile(0.95)
-            self.high_value_voids = parent_df[parent_df['Amount'] >= self.amount_threshold].sort_values('Amount', ascending=False).copy()
-            
-            self.fraud_progress['value'] = 15
-            
-            # Flag 2: Frequent voiders (from notebook)
-            if 'Void By ' in parent_df.columns:
-                self.voider_stats = parent_df.groupby('Void By ').agg({
-                    order_col: 'count',
-                    'Amount': ['sum', 'mean', 'max'],
-                    'Outlet': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Multiple'
-                }).reset_index()
-                self.voider_stats.columns = ['Void By', 'Void Count', 'Total Value', 'Avg Value', 'Max Value', 'Primary Outlet']
-                self.voider_stats = self.voider_stats.sort_values('Void Count', ascending=False)
-                
-                self.avg_voids = self.voider_stats['Void Count'].mean()
-                self.frequent_voiders = self.voider_stats[self.voider_stats['Void Count'] > self.avg_voids * 1.5].copy()
-            
-            self.fraud_progress['value'] = 25
-            
-            # Flag 3: Voids without reason
-            self.no_reason_voids = parent_df[parent_df['Predicted_Category'].isin([
-                'order without reason/ remark', 'voids without clear reason/ remark', 'no reason/remark'
-            ])].sort_values('Amount', ascending=False).copy()
-            
-            self.fraud_progress['value'] = 35
-            
-            # Flag 4: Late night voids (from notebook)
-            if 'Void_Date_Parsed' in parent_df.columns:
-                parent_df['Void_Hour'] = parent_df['Void_Date_Parsed'].dt.hour
-                self.late_night_voids = parent_df[(parent_df['Void_Hour'] >= 22) | (parent_df['Void_Hour'] <= 5)].sort_values('Amount', ascending=False).copy()
-            else:
-                self.late_night_voids = pd.DataFrame()
-            
-            self.fraud_progress['value'] = 45
-            
-            # Flag 5: Round number amounts (from notebook)
-            parent_df['Is_Round'] = parent_df['Amount'].apply(is_suspiciously_round)
-            self.round_voids = parent_df[parent_df['Is_Round'] == True].sort_values('Amount', ascending=False).copy()
-            
-            self.fraud_progress['value'] = 55
-            
-            # Flag 6: Repeat phone numbers (from notebook)
-            if 'Contact no' in parent_df.columns:
-                parent_df['Contact_Clean'] = parent_df['Contact no'].astype(str).str.strip()
-                phone_counts = parent_df['Contact_Clean'].value_counts()
-                repeat_phones = phone_counts[phone_counts > 1].index.tolist()
-                self.repeat_phone_df = parent_df[parent_df['Contact_Clean'].isin(repeat_phones)].copy()
-                
-                self.phone_summary = parent_df[parent_df['Contact_Clean'].isin(repeat_phones)].groupby('Contact_Clean').agg({
-                    order_col: 'count',
-                    'Amount': 'sum',
-                    'Outlet': lambda x: ', '.join(x.unique()[:3])
-                }).reset_index()
-                self.phone_summary.columns = ['Contact No', 'Void Count', 'Total Value', 'Outlets']
-                self.phone_summary = self.phone_summary.sort_values('Void Count', ascending=False)
-            
-            self.fraud_progress['value'] = 65
-            
-            # Flag 7: Outlet anomalies (from notebook)
-            self.outlet_stats = parent_df.groupby('Outlet').agg({
-                order_col: 'count',
-                'Amount': ['sum', 'mean', 'max']
-            }).reset_index()
-            self.outlet_stats.columns = ['Outlet', 'Void Count', 'Total Value', 'Avg Value', 'Max Value']
-            
-            self.outlet_stats['Count_ZScore'] = (self.outlet_stats['Void Count'] - self.outlet_stats['Void Count'].mean()) / self.outlet_stats['Void Count'].std()
-            self.outlet_stats['Value_ZScore'] = (self.outlet_stats['Total Value'] - self.outlet_stats['Total Value'].mean()) / self.outlet_stats['Total Value'].std()
-            
-            self.anomaly_outlets = self.outlet_stats[(self.outlet_stats['Count_ZScore'] > 1.5) | (self.outlet_stats['Value_ZScore'] > 1.5)].copy()
-            
-            self.fraud_progress['value'] = 75
-            
-            # Flag 8: Testing category
-            self.testing_voids = parent_df[parent_df['Predicted_Category'] == 'testing'].sort_values('Amount', ascending=False).copy()
-            
-            # Flag 9: Extreme delays (from notebook)
-            if 'Time_Gap_Hours' in parent_df.columns:
-                self.extreme_delay_voids = parent_df[parent_df['Time_Gap_Hours'] > 24].sort_values('Time_Gap_Hours', ascending=False).copy()
-            else:
-                self.extreme_delay_voids = pd.DataFrame()
-            
-            self.fraud_progress['value'] = 85
-            
-            # Combined fraud risk score (from notebook)
-            parent_df['Fraud_Flags'] = 0
-            parent_df['Fraud_Reasons'] = ''
-            
-            # Add flags with weights
-            parent_df.loc[parent_df['Amount'] >= self.amount_threshold, 'Fraud_Flags'] += 1
-            parent_df.loc[parent_df['Amount'] >= self.amount_threshold, 'Fraud_Reasons'] += 'High Value; '
-            
-            parent_df.loc[parent_df['Predicted_Category'].isin(['order without reason/ remark', 'voids without clear reason/ remark', 'no reason/remark']), 'Fraud_Flags'] += 2
-            parent_df.loc[parent_df['Predicted_Category'].isin(['order without reason/ remark', 'voids without clear reason/ remark', 'no reason/remark']), 'Fraud_Reasons'] += 'No Reason; '
-            
-            parent_df.loc[parent_df['Predicted_Category'] == 'testing', 'Fraud_Flags'] += 1
-            parent_df.loc[parent_df['Predicted_Category'] == 'testing', 'Fraud_Reasons'] += 'Testing; '
-            
-            parent_df.loc[parent_df['Is_Round'] == True, 'Fraud_Flags'] += 1
-            parent_df.loc[parent_df['Is_Round'] == True, 'Fraud_Reasons'] += 'Round Amount; '
-            
-            if 'Void_Hour' in parent_df.columns:
-                parent_df.loc[(parent_df['Void_Hour'] >= 22) | (parent_df['Void_Hour'] <= 5), 'Fraud_Flags'] += 1
-                parent_df.loc[(parent_df['Void_Hour'] >= 22) | (parent_df['Void_Hour'] <= 5), 'Fraud_Reasons'] += 'Late Night; '
-            
-            if 'Time_Gap_Hours' in parent_df.columns:
-                parent_df.loc[parent_df['Time_Gap_Hours'] > 24, 'Fraud_Flags'] += 2
-                parent_df.loc[parent_df['Time_Gap_Hours'] > 24, 'Fraud_Reasons'] += 'Extreme Delay; '
-            
-            parent_df['Risk_Level'] = pd.cut(parent_df['Fraud_Flags'], bins=[-1, 0, 1, 2, 10],
-                                             labels=['Low', 'Medium', 'High', 'Critical'])
-            
-            self.high_risk_orders = parent_df[parent_df['Fraud_Flags'] >= 2].sort_values(['Fraud_Flags', 'Amount'], ascending=[False, False]).copy()
-            self.critical_orders = parent_df[parent_df['Fraud_Flags'] >= 3].copy()
-            
-            self.parent_df = parent_df
-            
-            self.fraud_progress['value'] = 100
+            self.fraud = detect_fraud(self.parent_df, self.order_col, self.listener)
+            self.parent_df = self.fraud.parent_df
             
             # Update UI
             self.root.after(0, self._update_fraud_ui)
@@ -1090,20 +581,7 @@ Number of Outlets: {parent_df['Outlet'].nunique()}"""
     def _update_fraud_ui(self):
         """Update fraud detection UI."""
         # Update summary text
-        summary = f"""FRAUD RISK SUMMARY
-{'='*50}
-High-Value Voids (>Rs.{self.amount_threshold:,.0f}): {len(self.high_value_voids)}
-Voids Without Reason:                    {len(self.no_reason_voids)}
-Late Night Voids (10PM-5AM):             {len(self.late_night_voids)}
-Round Amount Voids:                      {len(self.round_voids)}
-Testing Category:                        {len(self.testing_voids)}
-Extreme Delays (>24hr):                  {len(self.extreme_delay_voids)}
-Frequent Voiders:                        {len(self.frequent_voiders)}
-Outlet Anomalies:                        {len(self.anomaly_outlets)}
-{'='*50}
-CRITICAL RISK Orders (3+ flags):         {len(self.critical_orders)}
-HIGH RISK Orders (2+ flags):             {len(self.high_risk_orders)}
-"""
+        summary = self.fraud.summary_text()
         
         self.fraud_summary_text.config(state=tk.NORMAL)
         self.fraud_summary_text.delete(1.0, tk.END)
@@ -1114,7 +592,7 @@ HIGH RISK Orders (2+ flags):             {len(self.high_risk_orders)}
         for item in self.fraud_tree.get_children():
             self.fraud_tree.delete(item)
             
-        for _, row in self.high_risk_orders.head(100).iterrows():
+        for _, row in self.fraud.high_risk_orders.head(100).iterrows():
             order = str(row[self.order_col])[:15]
             outlet = str(row.get('Outlet', ''))[:15]
             void_by = str(row.get('Void By ', ''))[:15]
@@ -1194,15 +672,15 @@ HIGH RISK Orders (2+ flags):             {len(self.high_risk_orders)}
                 ax.text(0.5, 0.5, 'Run fraud detection first', ha='center', va='center', transform=ax.transAxes)
                 
         elif chart_type == "top_voiders":
-            if len(self.voider_stats) > 0:
-                data = self.voider_stats.head(20)
+            if len(self.fraud.voider_stats) > 0:
+                data = self.fraud.voider_stats.head(20)
                 ax.barh(range(len(data)), data['Void Count'].values, color='purple')
                 ax.set_yticks(range(len(data)))
                 ax.set_yticklabels(data['Void By'].values, fontsize=8)
                 ax.set_xlabel('Number of Voids')
                 ax.set_title('Top 20 Staff by Void Count')
-                if self.avg_voids > 0:
-                    ax.axvline(x=self.avg_voids * 1.5, color='red', linestyle='--', label=f'Threshold: {self.avg_voids*1.5:.0f}')
+                if self.fraud.avg_voids > 0:
+                    ax.axvline(x=self.fraud.avg_voids * 1.5, color='red', linestyle='--', label=f'Threshold: {self.fraud.avg_voids*1.5:.0f}')
                     ax.legend()
                 ax.invert_yaxis()
             else:
@@ -1248,81 +726,7 @@ HIGH RISK Orders (2+ flags):             {len(self.high_risk_orders)}
             return
             
         try:
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                parent_df = self.parent_df
-                order_col = self.order_col
-                
-                if report_type in ['void_bills', 'combined']:
-                    # From Void_Bills_Report_Colab.ipynb
-                    parent_df.to_excel(writer, sheet_name='All Orders', index=False)
-                    
-                    reason_counts = parent_df['Predicted_Category'].value_counts().reset_index()
-                    reason_counts.columns = ['Category', 'Count']
-                    reason_counts.to_excel(writer, sheet_name='Reason Summary', index=False)
-                    
-                    channel_pivot = pd.crosstab(parent_df['Outlet'], parent_df['Order Type'], margins=True)
-                    channel_pivot.to_excel(writer, sheet_name='Channel-wise')
-                    
-                    value_pivot = parent_df.pivot_table(values='Amount', index='Outlet', columns='Order Type', aggfunc='sum', fill_value=0)
-                    value_pivot['Total'] = value_pivot.sum(axis=1)
-                    value_pivot.to_excel(writer, sheet_name='Outlet Values')
-                
-                if report_type in ['fraud', 'combined']:
-                    # From Fraud_Detection_Analysis.ipynb
-                    if len(self.high_risk_orders) > 0:
-                        self.high_risk_orders.to_excel(writer, sheet_name='HIGH_RISK', index=False)
-                    if len(self.critical_orders) > 0:
-                        self.critical_orders.to_excel(writer, sheet_name='CRITICAL', index=False)
-                    if len(self.high_value_voids) > 0:
-                        self.high_value_voids.to_excel(writer, sheet_name='High_Value', index=False)
-                    if len(self.no_reason_voids) > 0:
-                        self.no_reason_voids.to_excel(writer, sheet_name='No_Reason', index=False)
-                    if len(self.late_night_voids) > 0:
-                        self.late_night_voids.to_excel(writer, sheet_name='Late_Night', index=False)
-                    if len(self.round_voids) > 0:
-                        self.round_voids.to_excel(writer, sheet_name='Round_Amounts', index=False)
-                    if len(self.voider_stats) > 0:
-                        self.voider_stats.to_excel(writer, sheet_name='Voider_Stats', index=False)
-                    if len(self.frequent_voiders) > 0:
-                        self.frequent_voiders.to_excel(writer, sheet_name='Frequent_Voiders', index=False)
-                    if len(self.anomaly_outlets) > 0:
-                        self.anomaly_outlets.to_excel(writer, sheet_name='Anomaly_Outlets', index=False)
-                    if len(self.testing_voids) > 0:
-                        self.testing_voids.to_excel(writer, sheet_name='Testing', index=False)
-                    if len(self.extreme_delay_voids) > 0:
-                        self.extreme_delay_voids.to_excel(writer, sheet_name='Extreme_Delays', index=False)
-                    
-                    # Summary sheet
-                    summary_df = pd.DataFrame({
-                        'Metric': [
-                            'Total Orders Analyzed',
-                            'High-Value Voids',
-                            'Voids Without Reason',
-                            'Late Night Voids',
-                            'Round Amount Voids',
-                            'Testing Category',
-                            'Extreme Delays (>24hr)',
-                            'Frequent Voiders',
-                            'Anomaly Outlets',
-                            'CRITICAL RISK Orders (3+ flags)',
-                            'HIGH RISK Orders (2+ flags)'
-                        ],
-                        'Count': [
-                            len(parent_df),
-                            len(self.high_value_voids),
-                            len(self.no_reason_voids),
-                            len(self.late_night_voids),
-                            len(self.round_voids),
-                            len(self.testing_voids),
-                            len(self.extreme_delay_voids),
-                            len(self.frequent_voiders),
-                            len(self.anomaly_outlets),
-                            len(self.critical_orders),
-                            len(self.high_risk_orders)
-                        ]
-                    })
-                    summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                    
+            export_report(output_path, report_type, self.parent_df, self.fraud)
             self.export_status.config(text=f"Exported to: {os.path.basename(output_path)}")
             messagebox.showinfo("Success", f"Report exported to:\n{output_path}")
             
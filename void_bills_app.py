@@ -10,13 +10,20 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import pandas as pd
 import json
-import time
 import re
 from datetime import datetime
 from groq import Groq
+from llm_dispatch import AdaptiveBatcher, dispatch_adaptive
+from llm_retry import SDK_MAX_RETRIES, Retrier
+from rule_engine import RuleEngine, RulePrecision, VerifyGate
+from void_io import write_categorized_excel, write_columnar
+from void_preprocessing import extract_new_bill_id, extract_new_bill_ids, group_order_text
 
 # ============= CONSTANTS =============
-BATCH_SIZE = 20
+BATCH_SIZE = 20             # Starting texts per request; adapted during the run
+MAX_BATCH_SIZE = 40
+VERIFY_THRESHOLD = 0.9      # Rule hits below this confidence are AI-verified (None verifies all)
+RULE_PRECISION_FILE = "rule_precision.json"
 MODEL_NAME = "openai/gpt-oss-120b"
 APP_VERSION = "1.0.0"
 
@@ -200,6 +207,8 @@ PRIORITY_ORDER = [
     "cus. Change the order", "product issue or complain"
 ]
 
+RULE_ENGINE = RuleEngine(KEYWORD_RULES, PRIORITY_ORDER)
+
 
 class VoidBillsApp:
     def __init__(self, root):
@@ -215,6 +224,8 @@ class VoidBillsApp:
         self.api_key = tk.StringVar()
         self.is_running = False
         self.client = None
+        self.batcher = AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+        self.retrier = Retrier(log=lambda message: self.log(f"  {message}"))
         
         # Options
         self.ai_verify_rules = tk.BooleanVar(value=False)
@@ -462,43 +473,11 @@ class VoidBillsApp:
     
     def apply_keyword_rules(self, text):
         """Apply rule-based classification"""
-        if not text or pd.isna(text):
-            return None
-        
-        text_lower = str(text).lower()
-        
-        for category in PRIORITY_ORDER:
-            if category in KEYWORD_RULES:
-                for pattern in KEYWORD_RULES[category]:
-                    if re.search(pattern, text_lower):
-                        return category
-        return None
+        return RULE_ENGINE.classify(text)
     
     def extract_new_bill_id(self, text):
         """Extract new bill numbers from text"""
-        if not text or pd.isna(text):
-            return None
-
-        clean_text = str(text).upper()
-        
-        patterns = [
-            r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})',
-            r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})',
-            r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, clean_text)
-            if match:
-                result = match.group(1).replace(" ", "").replace("-", "")
-                if len(result) >= 2:
-                    return result
-        
-        match = re.search(r'\b([A-Z]{1,2}\d{4,7})\b', clean_text)
-        if match:
-            return match.group(1)
-            
-        return None
+        return extract_new_bill_id(text)
     
     def classify_batch(self, text_list, verify_mode=False):
         """AI-based classification for texts"""
@@ -541,7 +520,8 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
 """
 
         try:
-            completion = self.client.chat.completions.create(
+            completion = self.retrier.call(
+                self.client.chat.completions.create,
                 model=MODEL_NAME,
                 messages=[
                     {"role": "system", "content": "You are a precise data classification API. Output only valid JSON with a 'predictions' array."},
@@ -570,6 +550,9 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
             
             return validated
 
+        except json.JSONDecodeError as e:
+            self.log(f"JSON Parse Error ({len(text_list)} texts): {e}")
+            return []
         except Exception as e:
             self.log(f"API Error: {e}")
             return ["ERROR"] * len(text_list)
@@ -642,7 +625,7 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
         try:
             # Initialize Groq client
             self.log("Initializing API connection...")
-            self.client = Groq(api_key=self.api_key.get())
+            self.client = Groq(api_key=self.api_key.get(), max_retries=SDK_MAX_RETRIES)
             
             # Read input file
             self.update_status("Reading input file...", 5)
@@ -653,14 +636,10 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
             
             df['Temp_Order_ID'] = df[order_col_name].ffill()
             
-            def combine_text(x):
-                return " ".join(set([str(s).strip() for s in x if pd.notna(s) and str(s).strip() != '']))
-            
-            grouped = df.groupby('Temp_Order_ID')[['Reason', 'Remark']].agg(combine_text)
-            grouped['AI_Input'] = (grouped['Reason'] + " " + grouped['Remark']).str.strip()
+            grouped = group_order_text(df, 'Temp_Order_ID')
             
             self.log("Extracting New Bill Numbers...")
-            grouped['Extracted_Bill_No'] = grouped['AI_Input'].apply(self.extract_new_bill_id)
+            grouped['Extracted_Bill_No'] = extract_new_bill_ids(grouped['AI_Input'])
             
             bill_number_map = grouped['Extracted_Bill_No'].to_dict()
             
@@ -676,7 +655,7 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
             self.update_status("Applying rule-based classification...", 15)
             self.log("\nStep 1: Applying rule-based classification...")
             
-            orders_with_text['Rule_Category'] = orders_with_text['AI_Input'].apply(self.apply_keyword_rules)
+            orders_with_text['Rule_Category'] = RULE_ENGINE.classify_series(orders_with_text['AI_Input'])
             
             rule_classified = orders_with_text[orders_with_text['Rule_Category'].notna()]
             needs_ai = orders_with_text[orders_with_text['Rule_Category'].isna()]
@@ -692,34 +671,39 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
             
             # AI Verify Rules option - verify rule-based classifications
             if self.ai_verify_rules.get() and len(rule_classified) > 0:
-                self.log("\nAI Verification: Double-checking rule-based classifications...")
-                rule_ids = rule_classified.index.tolist()
-                rule_texts = rule_classified['AI_Input'].tolist()
+                self.log("\nAI Verification: Double-checking ambiguous rule-based classifications...")
+                precision_path = os.path.join(os.path.dirname(self.input_file.get()), RULE_PRECISION_FILE)
+                precision = RulePrecision.load(precision_path) if os.path.exists(precision_path) else None
+                gate = VerifyGate(RULE_ENGINE, VERIFY_THRESHOLD, precision)
+                ambiguous = rule_classified[gate.select(rule_classified['AI_Input'])]
+                self.log(f"  {gate.summary(self.batcher.next_size())}")
+                rule_ids = ambiguous.index.tolist()
+                rule_texts = ambiguous['AI_Input'].tolist()
                 
-                total_verify_batches = (len(rule_texts) + BATCH_SIZE - 1) // BATCH_SIZE
                 verified_count = 0
                 changed_count = 0
+                done = 0
+                
+                def verify_batch_done(start, results):
+                    nonlocal done
+                    done += len(results)
+                    progress = 15 + (done / len(rule_texts)) * 20
+                    self.update_status(f"Verified {done}/{len(rule_texts)} orders...", progress)
                 
-                for i in range(0, len(rule_texts), BATCH_SIZE):
-                    batch_num = i // BATCH_SIZE + 1
-                    progress = 15 + (batch_num / total_verify_batches) * 20
-                    self.update_status(f"Verifying batch {batch_num}/{total_verify_batches}...", progress)
-                    
-                    batch_ids = rule_ids[i : i + BATCH_SIZE]
-                    batch_texts = rule_texts[i : i + BATCH_SIZE]
-                    ai_results = self.classify_batch(batch_texts, verify_mode=True)
-                    
-                    for j, order_id in enumerate(batch_ids):
-                        if j < len(ai_results):
-                            rule_cat = category_map[order_id]
-                            ai_cat = ai_results[j]
-                            if ai_cat != "ERROR" and ai_cat != rule_cat:
-                                # AI disagrees, use AI's classification
-                                category_map[order_id] = ai_cat
-                                changed_count += 1
-                            verified_count += 1
-                    
-                    time.sleep(0.3)
+                ai_results = dispatch_adaptive(
+                    rule_texts, lambda batch: self.classify_batch(batch, verify_mode=True),
+                    self.batcher, max_in_flight=1, fill_value=None, delay=0.3,
+                    on_batch_done=verify_batch_done
+                )
+                
+                for order_id, ai_cat in zip(rule_ids, ai_results):
+                    if ai_cat is None:
+                        continue
+                    if ai_cat != "ERROR" and ai_cat != category_map[order_id]:
+                        # AI disagrees, use AI's classification
+                        category_map[order_id] = ai_cat
+                        changed_count += 1
+                    verified_count += 1
                 
                 self.log(f"  Verified {verified_count} orders, {changed_count} corrections made")
             
@@ -728,29 +712,22 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
                 self.log("\nStep 2: AI classification for remaining orders...")
                 ids_to_classify = needs_ai.index.tolist()
                 texts_to_classify = needs_ai['AI_Input'].tolist()
-                ai_predictions = []
-                
-                total_batches = (len(texts_to_classify) + BATCH_SIZE - 1) // BATCH_SIZE
                 base_progress = 35 if self.ai_verify_rules.get() else 20
+                done = 0
+                
+                def classify_batch_done(start, results):
+                    nonlocal done
+                    done += len(results)
+                    progress = base_progress + (done / len(texts_to_classify)) * 50
+                    self.update_status(f"Classified {done}/{len(texts_to_classify)} orders...", progress)
+                    self.log(f"  {done}/{len(texts_to_classify)} orders complete")
                 
-                for i in range(0, len(texts_to_classify), BATCH_SIZE):
-                    batch_num = i // BATCH_SIZE + 1
-                    progress = base_progress + (batch_num / total_batches) * 50
-                    self.update_status(f"Processing batch {batch_num}/{total_batches}...", progress)
-                    
-                    batch = texts_to_classify[i : i + BATCH_SIZE]
-                    batch_results = self.classify_batch(batch)
-                    
-                    if len(batch_results) != len(batch):
-                        diff = len(batch) - len(batch_results)
-                        if diff > 0:
-                            batch_results += ["other"] * diff
-                        else:
-                            batch_results = batch_results[:len(batch)]
-                    
-                    ai_predictions.extend(batch_results)
-                    self.log(f"  Batch {batch_num}/{total_batches} complete")
-                    time.sleep(0.5)
+                ai_predictions = dispatch_adaptive(
+                    texts_to_classify, self.classify_batch, self.batcher,
+                    max_in_flight=1, delay=0.5, on_batch_done=classify_batch_done
+                )
+                self.log(f"  {self.batcher.summary()}")
+                self.log(f"  {self.retrier.metrics.summary()}")
                 
                 # Post-process
                 self.log("\nStep 3: Post-processing AI predictions...")
@@ -807,22 +784,10 @@ OUTPUT: Return a JSON object with key "predictions" containing a list of categor
             self.update_status("Saving output file...", 95)
             self.log(f"\nSaving to {os.path.basename(self.output_file.get())}...")
             
-            def highlight_rows(row):
-                styles = [''] * len(row)
-                cat_val = row['Predicted_Category']
-                if cat_val == "no reason/remark":
-                    idx = row.index.get_loc('Predicted_Category')
-                    styles[idx] = 'background-color: #FFFF00'  # Yellow
-                elif cat_val == "voids without clear reason/ remark":
-                    idx = row.index.get_loc('Predicted_Category')
-                    styles[idx] = 'background-color: #FFD700'  # Gold
-                elif cat_val == "ERROR":
-                    idx = row.index.get_loc('Predicted_Category')
-                    styles[idx] = 'background-color: #FF6B6B'  # Red
-                return styles
-            
-            styled_df = df.style.apply(highlight_rows, axis=1)
-            styled_df.to_excel(self.output_file.get(), index=False)
+            write_categorized_excel(df, self.output_file.get())
+            columnar_file = write_columnar(df, self.output_file.get())
+            if columnar_file:
+                self.log(f"Columnar copy: {os.path.basename(columnar_file)}")
             
             self.update_status("Done!", 100)
             self.log("\nClassification complete!")
@@ -0,0 +1,403 @@
+"""
+Void Listing I/O
+Streaming access to PH_VoidBillListing workbooks: read the sheet row by row and
+hand out complete orders in chunks, and write categorized rows back out as
+they are produced, so memory is bounded by the chunk size instead of the file.
+
+Categorized output is also written as a typed Parquet file next to the Excel
+export; the report and fraud analysis read that instead of the workbook when
+it is present.
+
+Whole-frame exports go through write_categorized_excel, which streams rows with
+xlsxwriter in constant_memory mode and highlights Predicted_Category with
+conditional formats instead of per-row Styler calls.
+"""
+
+import math
+import os
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+ORDER_COLUMN = 'Order No'
+# Employee numbers are kept as text to preserve leading zeros
+TEXT_ID_COLUMNS = ['Void By ', 'Placed By', 'Void By']
+# Identifiers that can be numbers in one chunk and text in the next
+CHUNK_TEXT_COLUMNS = [ORDER_COLUMN, 'Contact no', *TEXT_ID_COLUMNS]
+DEFAULT_CHUNK_ORDERS = 2000
+
+# Predicted_Category cell highlights used in every categorized workbook
+CATEGORY_HIGHLIGHTS = {
+    "no reason/remark": "FFFF00",                      # Yellow
+    "voids without clear reason/ remark": "FFD700",    # Gold
+    "ERROR": "FF6B6B",                                  # Red for errors
+}
+
+
+def _cell_value(value):
+    """Match pd.read_excel: whole floats become ints, blank strings become missing."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value == "":
+        return None
+    return value
+
+
+def _rows_to_frame(rows, header):
+    df = pd.DataFrame.from_records(rows, columns=header)
+    for col in TEXT_ID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return df
+
+
+def iter_order_chunks(path, chunk_orders=DEFAULT_CHUNK_ORDERS, order_col=ORDER_COLUMN):
+    """
+    Yield DataFrames of whole orders from a void listing without loading the
+    workbook. A parent row has an Order No; the child rows after it (Order No
+    empty) belong to the same order, so a chunk is only closed when the next
+    parent row arrives.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        ws.reset_dimensions()  # exported listings often carry a stale <dimension>
+        rows_iter = ws.iter_rows(values_only=True)
+        header = next(rows_iter, None)
+        if header is None:
+            return
+        header = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        order_pos = header.index(order_col)
+
+        rows = []
+        blank = []  # interior blank rows are kept, trailing ones dropped (as pd.read_excel does)
+        orders = 0
+        for raw in rows_iter:
+            row = [_cell_value(v) for v in raw]
+            if all(v is None for v in row):
+                blank.append(row)
+                continue
+            rows.extend(blank)
+            blank.clear()
+            if row[order_pos] is not None:
+                if orders >= chunk_orders:
+                    yield _rows_to_frame(rows, header)
+                    rows = []
+                    orders = 0
+                orders += 1
+            rows.append(row)
+        if rows:
+            yield _rows_to_frame(rows, header)
+    finally:
+        wb.close()
+
+
+def _partial_path(path):
+    """Where a writer builds its file before moving it over path: out.xlsx -> out.partial.xlsx"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.partial{ext}"
+
+
+def _excel_value(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+class ExcelChunkWriter:
+    """
+    Append DataFrame chunks to a write-only workbook, highlighting the
+    Predicted_Category cell the same way the full-frame export does. The
+    workbook only replaces path once close() saves it; leaving a with block
+    on an exception discards it, so an earlier file at path survives.
+    """
+
+    def __init__(self, path, sheet_name="Sheet1"):
+        self.path = path
+        self.partial_path = _partial_path(path)
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(sheet_name)
+        self.columns = None
+        self.rows = 0
+        self.fills = {cat: PatternFill(start_color=color, end_color=color, fill_type="solid")
+                      for cat, color in CATEGORY_HIGHLIGHTS.items()}
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.ws.append(self.columns)
+        category_pos = self.columns.index('Predicted_Category') if 'Predicted_Category' in self.columns else None
+
+        for values in df[self.columns].itertuples(index=False, name=None):
+            row = [_excel_value(v) for v in values]
+            if category_pos is not None:
+                fill = self.fills.get(row[category_pos])
+                if fill is not None:
+                    cell = WriteOnlyCell(self.ws, value=row[category_pos])
+                    cell.fill = fill
+                    row[category_pos] = cell
+            self.ws.append(row)
+        self.rows += len(df)
+
+    def close(self):
+        """Save next to path, then move the finished workbook into place."""
+        self.wb.save(self.partial_path)
+        self.wb.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Drop the rows written so far and leave path as it was."""
+        self.ws.close()  # end openpyxl's temporary sheet stream; it is deleted at exit
+        self.wb.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+# ============= FAST EXCEL EXPORT =============
+# Matches the header pandas' to_excel writes
+_HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def _highlight_rules(workbook, first_row, last_row, col):
+    """One conditional format per highlighted category over the Predicted_Category column."""
+    rules = []
+    for category, color in CATEGORY_HIGHLIGHTS.items():
+        fmt = workbook.add_format({'bg_color': f"#{color}", 'pattern': 1})
+        value = '"' + category.replace('"', '""') + '"'
+        rules.append((first_row, col, last_row, col,
+                      {'type': 'cell', 'criteria': '==', 'value': value, 'format': fmt}))
+    return rules
+
+
+def write_categorized_excel(df, path, sheet_name="Sheet1"):
+    """
+    Write a categorized frame to path with the yellow/gold/red Predicted_Category
+    highlights. Rows are streamed in constant_memory mode and the highlights are
+    column-level conditional formats, so the cost is one pass over the values.
+    Falls back to ExcelChunkWriter (openpyxl write-only) without xlsxwriter.
+    """
+    if not XLSXWRITER_AVAILABLE:
+        with ExcelChunkWriter(path, sheet_name) as writer:
+            writer.write(df)
+        return path
+
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True,
+    })
+    try:
+        ws = workbook.add_worksheet(sheet_name)
+        columns = list(df.columns)
+        ws.write_row(0, 0, [str(c) for c in columns], workbook.add_format(_HEADER_FORMAT))
+
+        # NaN/NaT become None, which xlsxwriter leaves as an empty cell
+        values = df.astype(object).where(df.notna(), None)
+        for row_no, row in enumerate(values.itertuples(index=False, name=None), 1):
+            ws.write_row(row_no, 0, row)
+
+        if 'Predicted_Category' in columns and len(df):
+            col = columns.index('Predicted_Category')
+            for rule in _highlight_rules(workbook, 1, len(df), col):
+                ws.conditional_format(*rule)
+    finally:
+        workbook.close()
+    return path
+
+
+# ============= COLUMNAR INTERMEDIATE =============
+def columnar_path(excel_path):
+    """categorized_orders_clean.xlsx -> categorized_orders_clean.parquet"""
+    return os.path.splitext(excel_path)[0] + ".parquet"
+
+
+def _text_value(value):
+    """An ID cell as text: whole floats lose their '.0', missing stays missing."""
+    value = _cell_value(value)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def _arrow_ready(df, promote_integers=False, text_columns=()):
+    """
+    Give every column a single Arrow type. Object columns holding a mix of
+    types (order numbers read as int and str, phone numbers) become text so
+    nothing is lost, as does every column in text_columns; promote_integers
+    makes integer columns float64 so chunks with and without missing values
+    share a schema.
+    """
+    out = df.copy()
+    for col in out.columns:
+        series = out[col]
+        if col in text_columns:
+            out[col] = series.map(_text_value).astype(object)
+        elif series.dtype == object:
+            kind = pd.api.types.infer_dtype(series, skipna=True)
+            if kind in ("datetime", "datetime64", "date"):
+                out[col] = pd.to_datetime(series, errors="coerce")
+            else:
+                out[col] = series.map(lambda v: v if isinstance(v, str) else _text_value(v))
+        elif promote_integers and (pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series)):
+            out[col] = series.astype("float64")
+    return out
+
+
+def write_columnar(df, excel_path):
+    """Write the Parquet sibling of excel_path. Returns its path, or None without pyarrow."""
+    if not PARQUET_AVAILABLE:
+        return None
+    path = columnar_path(excel_path)
+    _arrow_ready(df).to_parquet(path, index=False)
+    return path
+
+
+def read_listing(path):
+    """Read a whole void listing workbook with employee numbers kept as text."""
+    return pd.read_excel(path, dtype={col: str for col in TEXT_ID_COLUMNS})
+
+
+def read_categorized(path):
+    """
+    Load categorized orders, preferring the Parquet file (given directly or as
+    the up-to-date sibling of an Excel export) and falling back to the workbook.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    sibling = columnar_path(path)
+    if (PARQUET_AVAILABLE and os.path.exists(sibling)
+            and os.path.getmtime(sibling) >= os.path.getmtime(path)):
+        return pd.read_parquet(sibling)
+    return read_listing(path)
+
+
+def _conform(df, schema):
+    """
+    Coerce df to the file schema column by column: numbers and timestamps
+    are parsed (anything unparsable comes out missing, see _unparsed), text
+    columns take str().
+    """
+    out = df.copy()
+    for field in schema:
+        if field.name not in out.columns:
+            continue
+        if pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+            out[field.name] = pd.to_numeric(out[field.name], errors="coerce")
+        elif pa.types.is_timestamp(field.type):
+            out[field.name] = pd.to_datetime(out[field.name], errors="coerce", format="mixed")
+        elif pa.types.is_string(field.type):
+            out[field.name] = out[field.name].map(_text_value).astype(object)
+    return out
+
+
+def _unparsed(df, conformed):
+    """Columns where _conform turned a present value (e.g. 'N/A' in a number column) into a missing one."""
+    return [col for col in conformed.columns
+            if (conformed[col].isna() & df[col].notna()).any()]
+
+
+class ParquetChunkWriter:
+    """
+    Append DataFrame chunks to one Parquet file (the streaming twin of
+    write_columnar). The first chunk fixes the schema: CHUNK_TEXT_COLUMNS are
+    always text, a later chunk whose values convert cleanly is cast to it,
+    and a column that gets values its type cannot hold is turned into text
+    for the whole file, so nothing is dropped.
+    Like ExcelChunkWriter, the file only replaces path on a clean close().
+    """
+
+    def __init__(self, excel_path):
+        self.path = columnar_path(excel_path)
+        self.partial_path = _partial_path(self.path)
+        self.writer = None
+        self.schema = None
+        self.promoted = []
+
+    def write(self, df):
+        frame = _arrow_ready(df, promote_integers=True, text_columns=CHUNK_TEXT_COLUMNS)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            # A column that is empty in the first chunk is assumed to be text
+            fields = [f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+            self.schema = pa.schema(fields, metadata=table.schema.metadata)
+            self.writer = pq.ParquetWriter(self.partial_path, self.schema)
+        try:
+            table = table.cast(self.schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            conformed = _conform(frame, self.schema)
+            lost = _unparsed(frame, conformed)
+            if lost:
+                self._promote(lost)
+                conformed = _conform(frame, self.schema)
+            table = pa.Table.from_pandas(conformed, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def _promote(self, columns):
+        """Make columns text and rewrite the row groups written so far to match, one at a time."""
+        self.writer.close()
+        self.schema = pa.schema([f.with_type(pa.string()) if f.name in columns else f for f in self.schema],
+                                metadata=self.schema.metadata)
+        self.promoted.extend(columns)
+        old_path = self.partial_path + ".old"
+        os.replace(self.partial_path, old_path)
+        self.writer = pq.ParquetWriter(self.partial_path, self.schema)
+        written = pq.ParquetFile(old_path)
+        try:
+            for group in range(written.num_row_groups):
+                frame = _conform(written.read_row_group(group).to_pandas(), self.schema)
+                self.writer.write_table(pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+        finally:
+            written.close()
+            os.remove(old_path)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Drop the chunks written so far and leave path as it was."""
+        if self.writer is not None:
+            self.writer.close()
+            os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
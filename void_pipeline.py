@@ -0,0 +1,1226 @@
+"""
+Void Analysis Pipeline
+The categorization, fraud detection and report export engine behind the
+combined tool, with no tkinter or matplotlib imports so it can run headless
+from cron or batch jobs. Progress goes to a ProgressListener instead of widgets.
+
+Usage:
+    python void_pipeline.py run --input PH_VoidBillListing.xlsx --stages categorize,fraud,export
+    python void_pipeline.py run --input categorized_orders_clean.xlsx --stages fraud,export --report fraud
+    python void_pipeline.py profile-rules --input PH_VoidBillListing.xlsx --output rule_profile.xlsx
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    from groq import Groq
+    GROQ_AVAILABLE = True
+except ImportError:
+    GROQ_AVAILABLE = False
+
+from llm_dispatch import AdaptiveBatcher, dispatch_adaptive
+from llm_retry import SDK_MAX_RETRIES, Retrier
+from run_journal import RunJournal, journal_path, run_key
+from text_clusters import ClusterStage
+from local_model import (DEFAULT_MODEL_FILE, DEFAULT_THRESHOLD as LOCAL_MODEL_THRESHOLD,
+                         SKLEARN_AVAILABLE, labelled_orders, open_local_model, train_from_files)
+from classification_cache import ClassificationCache, classify_with_cache, prompt_hash
+from rule_engine import RuleEngine, RulePrecision, VerifyGate
+from void_io import read_categorized, read_listing, write_categorized_excel, write_columnar
+from void_velocity import void_velocity
+from void_preprocessing import extract_new_bill_ids, group_order_text, previous_results, reuse_previous
+
+logger = logging.getLogger("void_analysis")
+
+# ============= CONSTANTS =============
+BATCH_SIZE = 20             # Starting texts per request; adapted during the run
+MAX_BATCH_SIZE = 40
+CLUSTER_THRESHOLD = 1.0     # Same normalized remark -> one LLM call; < 1 adds near-duplicates (None to disable)
+VERIFY_THRESHOLD = 0.9      # Rule hits below this confidence are AI-verified (None verifies all)
+RULE_PRECISION_FILE = "rule_precision.json"
+RULE_WORKERS = 1            # Processes for the rule pass on very large listings
+MODEL_NAME = "openai/gpt-oss-120b"
+CACHE_FILE = "classification_cache.sqlite"
+CACHE_MAX_ENTRIES = 100_000
+ROUND_UNITS = (500, 1000)   # Amounts that are multiples of these are flagged as round
+ROUND_MIN_AMOUNT = 1000     # Smaller amounts are never round
+ROUND_MAX_ZEROS = 4         # Trailing zeros that make an amount fully round (10,000)
+VELOCITY_Z_THRESHOLD = 3.0  # Staff void-rate z-score (vs their own baseline) that flags a burst
+
+CATEGORIES = [
+    "Call Center mistake",
+    "Cashier mistake",
+    "cus. Change the order",
+    "cus.related issue",
+    "Customer Cancel order",
+    "Customer denied the order",
+    "double punch",
+    "grid issue",
+    "location",
+    "order cancelled by aggregator",
+    "Order delay",
+    "order type change",
+    "other",
+    "out of stock",
+    "payment issue",
+    "phone",
+    "product issue or complain",
+    "promotion",
+    "rider issue",
+    "system issue",
+    "testing",
+    "voids without clear reason/ remark"
+]
+
+# Friendly names mapping (from Void_Bills_Report_Colab.ipynb)
+FRIENDLY_NAMES = {
+    'cus. Change the order': 'Change of customer request',
+    'promotion': 'Promotion',
+    'Cashier mistake': 'Cashier mistake',
+    'Customer denied the order': 'Customer denied the order',
+    'Customer Cancel order': 'Customer Cancel order',
+    'cus.related issue': 'Customer Related Issue',
+    'grid issue': 'Grid issue',
+    'phone': 'Contact Number Issues',
+    'order without reason/ remark': 'Orders Without Reason / Remark',
+    'voids without clear reason/ remark': 'Voids Without Clear Reason / Remark',
+    'no reason/remark': 'No Reason/Remark',
+    'Order delay': 'Order Delay',
+    'order type change': 'Order Type Change',
+    'system issue': 'System issue / breakdown',
+    'rider issue': 'Riders related issues',
+    'double punch': 'Order Double Punched',
+    'payment issue': 'Payment Issues',
+    'out of stock': 'Out of Stock',
+    'location': 'Location',
+    'testing': 'Testing',
+    'Call Center mistake': 'CSR Issue',
+    'product issue or complain': 'Product issue or complain',
+    'order cancelled by aggregator': 'Order cancelled by aggregator',
+    'other': 'Other'
+}
+
+# ============= RULE-BASED CLASSIFICATION (from void_bills_app.py) =============
+KEYWORD_RULES = {
+    "testing": [
+        r"\btest\s*(order|odar|oder)?\b", r"\btesting\b", r"\btes\s*oder\b",
+        r"\bproduct\s*testing\b", r"\bfrom\s*(it|preshan)\b",
+        r"\bit\s*team\s*check\b"
+    ],
+    "promotion": [
+        r"\blsm\b", r"\bpromo(tion)?\b", r"\boffer\b", r"\b50\s*%\s*(off|flash|discount)?\b",
+        r"\bdiscount\b", r"\bcyber\s*saving\b", r"\bmeal\s*deal\b", r"\bflash\s*offer\b",
+        r"\bdon'?t\s*cook\b", r"\bhsbc\b", r"\bges\s*\d+%\b", r"\b\d+%\s*off\b",
+        r"\b15\s*%\b", r"\b20\s*%\b", r"\b30\s*%\b", r"\b1000\s*off\b",
+        r"\bhave\s*a?\s*\d+%\s*discount\b"
+    ],
+    "payment issue": [
+        r"\bcredit\s*card\b", r"\bcard\s*(not\s*work|isn'?t\s*work|failed)\b",
+        r"\bhnb\s*card\b", r"\bbank\s*card\b", r"\bvisa\b", r"\bmachine\b",
+        r"\bpayment\s*(method|issue)?\b", r"\bpetty\s*cash\b", r"\bonline\s*payment\b",
+        r"\bpaid\s*order\b", r"\bdon'?t\s*have\s*(enough\s*)?(money|cash)\b"
+    ],
+    "Cashier mistake": [
+        r"\bcashier\s*(mistake|mistakenly|mistakly|wrong)\b", r"\bwrongly\s*punch(ed)?\b",
+        r"\bmistakenly\s*(punch|close|add|collect|mark|order|dispatch)\b", r"\bmistakly\b",
+        r"\bcashier\s*error\b", r"\bwrong\s*(punch|order|bill|close)\b",
+        r"\bcashiar\b", r"\bcashiyar\b", r"\bwrong\s*by\s*cashier\b",
+        r"\bwrong\s*order[sw]?\b", r"\bwrong\s*ordewr\b", r"\bmiss\s*communication\b",
+        r"\bdispatcher\s*mistakenly\b", r"\bdispatcher\s*collected\b",
+        r"\bmistakenly\s*orders?\s*split\b", r"\bdidn'?t\s*close\b", r"\bdidnt\s*close\b",
+        r"\bdispac?ter\s*mistakenly\b"
+    ],
+    "Call Center mistake": [
+        r"\bcsr\s*(error|mistake)?\b", r"\bsale\s*cent(er|re)\s*(error|mistake|issue|request)?\b",
+        r"\bcall\s*cent(er|re)\s*(error|mistake|asked|have\s*wrongly)?\b", r"\bsales\s*cent(er|re)\b",
+        r"\baccording\s*to\s*call\s*cent\b", r"\bacording\s*to\s*call\s*senter\b",
+        r"\binformed\s*by\s*outlet\b", r"\binfomed\s*by\s*outlet\b",
+        r"\bsale\s*center\s*mistac?ly\b", r"\bcall\s*center\s*have\s*wrongly\b"
+    ],
+    "Customer denied the order": [
+        r"\bcustomer\s*denied\b", r"\bcux\s*denied\b", r"\bdenied\s*(the\s*)?order\b",
+        r"\bcustermar\s*denied\b", r"\brefuse[d]?\s*(the\s*)?order\b",
+        r"\breject(ed)?\s*(the\s*)?order\b", r"\bdeniend\b", r"\bdenaid\b",
+        r"\bdidn'?t\s*place\s*(any\s*)?order\b", r"\bdidnt\s*place\s*(any\s*)?order\b",
+        r"\bhe\s*didnt\s*place\b"
+    ],
+    "Customer Cancel order": [
+        r"\bcustomer\s*(want\s*(to\s*)?)?cancel\b", r"\bcux\s*cancel\b",
+        r"\bcx\s*(want\s*(to\s*)?)?cancel\b", r"\bcu\s*wont\s*to\s*cancel\b",
+        r"\bcustomer\s*cansel\b", r"\bcustomer\s*cancell\b", r"\bcustomr\s*cancal\b",
+        r"\bplease\s*cancel\b", r"\bcncl\b", r"\bcustomer\s*cancelled\b"
+    ],
+    "double punch": [
+        r"\bordered\s*twice\b", r"\bsame\s*order\s*\d+\b", r"\b2\s*times?\s*(same\s*)?order\b",
+        r"\btwo\s*orders?\s*(were\s*)?(placed|same)\b", r"\bdouble\b", r"\bdubble\b",
+        r"\btwise\s*the\s*order\b", r"\bpast\s*same\s*order\b"
+    ],
+    "grid issue": [
+        r"\bgrid\s*(issue)?\b", r"\bout\s*of\s*grid\b", r"\bgride\s*issue\b"
+    ],
+    "location": [
+        r"\bwrong\s*address\b", r"\bwrong\s*location\b", r"\bdifferent\s*(location|outlet|city)\b",
+        r"\bwant\s*to\s*deliver\s*\w+\s*outlet\b", r"\bgo(ing)?\s*(to|from)\s*\w+\b",
+        r"\btransfer(red)?\s*to\b", r"\bdeliver\s*from\b",
+        r"\bslave\s*island\b", r"\bnearest\s*location\b", r"\bsent\s*\d+\b",
+        r"\bfrom\s+\w+\s*outlet\b", r"\bto\s+\w+\s*outlet\b", r"\boutlet\s*order\b",
+        r"\bdelivery\s+from\s+\w+\b", r"\bwennappuwa\b", r"\bkoswattha\b",
+        r"\bnew\s*dkt\s*\w*\s*\d+\b", r"\bneew\s*order\b", r"\bkochchikade\b",
+        r"\bpanadura\b", r"\bpandura\b", r"\bhavelock\b", r"\b\d{2,3}\s*-\s*\w+\b",
+        r"\bdifferent\s*city\s*with\s*different\s*out\s*let\b", r"\bsimilar\s*address\b"
+    ],
+    "phone": [
+        r"\bphone\s*(number\s*)?(not\s*)?(work|answer|respond)\b",
+        r"\bnot\s*(answer|respond)(ing|ed)?\s*(the\s*)?(call|phone|mobile)?\b",
+        r"\bwrong\s*(phone\s*)?(number|no|mobile)\b", r"\bincorrect\s*number\b",
+        r"\bcan'?t\s*contact\b", r"\bmobile\s*not\s*work\b", r"\bno\s*answer(ing)?\b",
+        r"\bnumber\s*wrong\b", r"\bnumber\s*not\s*work\b",
+        r"\bnot\s*respons\b", r"\bphone\s*call\s*(is\s*)?not\s*reac\b",
+        r"\bcx\s*no\s*answering\b", r"\bnumber\s*is\s*not\s*working\b",
+        r"\bdid\s*not\s*answer\s*(the\s*)?phone\b", r"\bdidn'?t\s*answer\b",
+        r"\bnot\s*in\s*responded?\s*call\b", r"\bphone\s*not\s*responded\b",
+        r"\bvoice\s*mail\b", r"\bgiven\s*number\s*(is\s*)?not\s*working\b",
+        r"\bcalled\s*(the\s*)?customer\s*\d+\s*times\b"
+    ],
+    "Order delay": [
+        r"\border\s*delay(ed)?\b", r"\bdelay\s*(issue|order)?\b", r"\blate\s*issue\b",
+        r"\border\s*deley\b", r"\bpromise\s*time\b", r"\bcan'?t\s*wait\b",
+        r"\bhea[vr]y\s*rain\b"
+    ],
+    "order type change": [
+        r"\bchange\s*(to\s*)?(delivery|take\s*away|dine|pickup|t/?w)\b",
+        r"\bwant\s*(to\s*)?(deliver|delivery)\b", r"\bwant\s*dine\b",
+        r"\bpick\s*up\s*(for|to)\s*delivery\b", r"\btake\s*away\s*can[sc]al\b",
+        r"\border\s*type\s*change\b"
+    ],
+    "cus. Change the order": [
+        r"\bchange\s*(the\s*)?time\b", r"\btime\s*(order|change)\b",
+        r"\bwant\s*(the\s*)?order\s*@\b", r"\bwanted\s*to\s*change\s*(the\s*)?order\b",
+        r"\bcustomer\s*change\b", r"\bcx\s*want(s|ed)?\s*to\s*change\b",
+        r"\bcux\s*want(s|ed)?\s*to\s*change\b", r"\bchange\s*(the\s*)?order\b",
+        r"\bcux\s*want(s|ed)?\s*(large|medium|small|personal)\b",
+        r"\bcustomer\s*want(s|ed)?\s*(large|medium|small|personal)\b",
+        r"\border\s*replaced\b", r"\breplace\s*to\b", r"\breplaced\s*delivery\b",
+        r"\bthis\s*order\s*was\s*placed\s*yesterday\b",
+        r"\bcustomer\s*mistakenly\s*placed\b", r"\bchanged\s*to\s*no\.?\b"
+    ],
+    "out of stock": [
+        r"\bout\s*of\s*stock\b", r"\boos\b", r"\bstock\s*out\b",
+        r"\b(item|product|pizza|coke|coca|pepsi|drink|topping|ingredient)s?\s*(is\s*)?(not\s*)?(available|have)\b",
+        r"\bnot\s*available\s*(at\s*)?\s*(main\s*)?supplier\b",
+        r"\bsome\s*items\s*are\s*not\s*available\b"
+    ],
+    "rider issue": [
+        r"\brider\s*(mistake|mistakenly|issue)\b", r"\brider'?s?\s*issue\b",
+        r"\briderr?s?issue\b",
+        r"\briders?\s*(not\s*)?(assigned|assinged|assined)\b",
+        r"\bno\s*rider\s*(arrived|assigned|assinged)\b",
+        r"\bnorider\s*arrived\b", r"\brider\s*not\s*(assigned|assinged|arrived)\b",
+        r"\brider\s*arrived\s*yet\b", r"\briderarrived\s*yet\b"
+    ],
+    "system issue": [
+        r"\bsystem\s*(error|issue)\b", r"\bsystem\s*show\b",
+        r"\brider\s*app\b", r"\bcan\s*not\s*delivered?\s*in\s*rider\s*app\b",
+        r"\bit\s*team\s*(is\s*)?busy\b"
+    ],
+    "order cancelled by aggregator": [
+        r"\buber\b", r"\bpick\s*me\b", r"\bpickme\b", r"\baggregator\b",
+        r"\bcancelled?\s*by\s*(uber|pick\s*me)\b", r"\border\s*cancel(led)?\s*by\b"
+    ],
+    "product issue or complain": [
+        r"\bproduct\s*issue\b", r"\bcomplain\b", r"\bdissatisfy\b", r"\bwrong\s*pizza\b"
+    ],
+    "cus.related issue": [
+        r"\bcustomer\s*(is\s*)?(not\s*)?(available|availble)\b", 
+        r"\bcustomer\s*did(n'?t)?\s*come\b",
+        r"\bcustomer\s*left\b", r"\bcustomer\s*visit\b",
+        r"\boutlet\s*closed\b", r"\bpower\s*cut\b",
+        r"\boven\s*breakdown\b", r"\bsecurity\s*department\b",
+        r"\bcux?\s*(is\s*)?(not\s*)?(available|availble)\b",
+        r"\bcustomer\s*not\s*available\b", r"\bcx\s*not\s*available\b",
+        r"\bcalled\s*(the\s*)?customer\s*several\s*times\b",
+        r"\bcustomer\s*(is\s*)?not\s*showed?\s*up\b",
+        r"\bcustomer\s*(was\s*)?(not\s*)?(at\s*)?(the\s*)?location\b",
+        r"\bcustomer\s*wasn'?t\s*available\s*at\s*(the\s*)?location\b",
+        r"\bnot\s*at\s*home\b"
+    ]
+}
+
+PRIORITY_ORDER = [
+    "testing", "Customer denied the order", "double punch",
+    "order cancelled by aggregator", "Cashier mistake", "Call Center mistake",
+    "payment issue", "promotion", "grid issue", "rider issue", "phone",
+    "cus.related issue", "out of stock", "Order delay", "system issue",
+    "order type change", "location", "Customer Cancel order",
+    "cus. Change the order", "product issue or complain"
+]
+
+
+RULE_ENGINE = RuleEngine(KEYWORD_RULES, PRIORITY_ORDER)
+
+
+def apply_keyword_rules(text):
+    """Apply rule-based classification (from void_bills_app.py)"""
+    return RULE_ENGINE.classify(text)
+
+
+CLASSIFY_SYSTEM_MESSAGE = "Classification API. Output valid JSON only."
+
+
+def build_classify_prompt(text_list):
+    """Build the AI classification prompt for a batch (from void_bills_app.py)."""
+    return f"""Classify each void order reason into ONE category from: {json.dumps(CATEGORIES)}
+
+INPUT: {json.dumps(text_list, indent=2)}
+
+OUTPUT: JSON with "predictions" array of category strings."""
+
+
+def round_multiples(amounts, units=ROUND_UNITS, min_amount=ROUND_MIN_AMOUNT):
+    """(len(amounts), len(units)) boolean matrix: amount >= min_amount and a whole multiple of each unit."""
+    amounts = np.asarray(amounts, dtype=float)
+    eligible = np.isfinite(amounts) & (amounts >= min_amount)
+    with np.errstate(invalid="ignore"):
+        return eligible[:, None] & (np.mod(amounts[:, None], np.asarray(units, dtype=float)[None, :]) == 0)
+
+
+def is_suspiciously_round(amounts, units=ROUND_UNITS, min_amount=ROUND_MIN_AMOUNT):
+    """
+    Amounts of at least min_amount that are a multiple of any round unit
+    (from Fraud_Detection_Analysis.ipynb), over a whole array at once.
+    """
+    return round_multiples(np.atleast_1d(amounts), units, min_amount).any(axis=1)
+
+
+def roundness(amounts, units=ROUND_UNITS, min_amount=ROUND_MIN_AMOUNT, max_zeros=ROUND_MAX_ZEROS):
+    """
+    Graded roundness in [0, 1]: half from the share of units the amount is a
+    multiple of, half from its trailing zeros (max_zeros or more count fully).
+    Amounts with cents, missing amounts and amounts below min_amount score 0,
+    so 1,500 -> 0.5, 5,000 -> 0.875 and 10,000 -> 1.0 with the default units.
+    """
+    amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+    whole = np.isfinite(amounts) & (amounts >= min_amount) & (np.mod(amounts, 1) == 0)
+    rupees = np.where(whole, amounts, 0).astype(np.int64)
+    zeros = np.zeros(len(amounts))
+    for power in range(1, max_zeros + 1):
+        zeros += (rupees % 10 ** power == 0) & (rupees > 0)
+    unit_share = round_multiples(amounts, units, min_amount).mean(axis=1) if len(units) else 0.0
+    return np.where(whole, 0.5 * unit_share + 0.5 * zeros / max_zeros, 0.0)
+
+
+NO_REASON_CATEGORIES = ['order without reason/ remark', 'voids without clear reason/ remark', 'no reason/remark']
+STAGES = ["categorize", "fraud", "export"]
+REPORT_TYPES = ["void_bills", "fraud", "combined"]
+
+
+class ProgressListener:
+    """Receives log lines and per-stage progress (0-100). Logs both by default."""
+
+    def log(self, message):
+        logger.info(message)
+
+    def progress(self, stage, value):
+        logger.debug("%s: %d%%", stage, value)
+
+
+# ==================== CATEGORIZATION (from void_bills_app.py) ====================
+def classify_batch(client, text_list, listener=None, retrier=None):
+    """AI classification batch (from void_bills_app.py)."""
+    listener = listener or ProgressListener()
+    retrier = retrier or Retrier(log=listener.log)
+    prompt = build_classify_prompt(text_list)
+
+    try:
+        completion = retrier.call(
+            client.chat.completions.create,
+            model=MODEL_NAME,
+            messages=[
+                {"role": "system", "content": CLASSIFY_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        data = json.loads(completion.choices[0].message.content)
+        predictions = data.get("predictions", [])
+
+        validated = []
+        for pred in predictions:
+            if pred in CATEGORIES:
+                validated.append(pred)
+            else:
+                validated.append("other")
+        return validated
+
+    except json.JSONDecodeError as e:
+        listener.log(f"JSON Parse Error ({len(text_list)} texts): {e}")
+        return []
+    except Exception as e:
+        listener.log(f"API Error: {e}")
+        return ["ERROR"] * len(text_list)
+
+
+def _classify_representatives(texts, classify_texts, cache, journal, clusters):
+    """
+    Cluster representatives through the cache, keyed by their normalized
+    forms. Only these texts' answers are cached and journaled (cache hits
+    included); a remark merged into another text's cluster is neither, so it
+    is classified again on a later run.
+    """
+    keys = clusters.canonical(texts)
+    results = classify_with_cache(texts, classify_texts, cache, keys)
+    if journal is not None:
+        journal.record_texts(keys, results)
+    return results
+
+
+def ai_verify_batch(client, rule_classified, category_map, cache=None, listener=None, batcher=None, retrier=None,
+                    journal=None):
+    """AI verification of rule-based classifications."""
+    listener = listener or ProgressListener()
+    batcher = batcher or AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+    retrier = retrier or Retrier(log=listener.log)
+    rule_ids = rule_classified.index.tolist()
+    rule_texts = rule_classified['AI_Input'].tolist()
+    clusters = ClusterStage(CLUSTER_THRESHOLD)
+    if journal is not None:
+        journal.track(rule_ids, clusters.canonical(rule_texts))
+
+    def classify_texts(texts):
+        done = 0
+
+        def batch_done(start, results):
+            nonlocal done
+            done += len(results)
+            if journal is not None:
+                journal.record_texts(clusters.canonical(texts[start:start + len(results)]), results)
+            listener.progress("categorize", 15 + ((done / len(texts)) * 20))
+
+        results = dispatch_adaptive(
+            texts, lambda batch: classify_batch(client, batch, listener, retrier), batcher,
+            max_in_flight=1, fill_value=None, delay=0.3, on_batch_done=batch_done
+        )
+        listener.log(f"  {batcher.summary()}")
+        listener.log(f"  {retrier.metrics.summary()}")
+        return results
+
+    ai_results = clusters.classify(rule_texts, lambda texts: _classify_representatives(texts, classify_texts,
+                                                                                        cache, journal, clusters))
+    listener.log(f"  {clusters.summary(batcher.next_size())}")
+    for order_id, ai_cat in zip(rule_ids, ai_results):
+        if ai_cat is not None and ai_cat != "ERROR":
+            if ai_cat != category_map[order_id]:
+                category_map[order_id] = ai_cat
+
+
+def ai_classify_batch(client, needs_ai, category_map, cache=None, listener=None, batcher=None, retrier=None,
+                      journal=None):
+    """AI classification for unclassified orders."""
+    listener = listener or ProgressListener()
+    batcher = batcher or AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+    retrier = retrier or Retrier(log=listener.log)
+    ids_list = needs_ai.index.tolist()
+    texts_list = needs_ai['AI_Input'].tolist()
+    clusters = ClusterStage(CLUSTER_THRESHOLD)
+    if journal is not None:
+        journal.track(ids_list, clusters.canonical(texts_list))
+
+    def classify_texts(texts):
+        done = 0
+
+        def batch_done(start, results):
+            nonlocal done
+            done += len(results)
+            if journal is not None:
+                journal.record_texts(clusters.canonical(texts[start:start + len(results)]), results)
+            listener.progress("categorize", 35 + ((done / len(texts)) * 50))
+            listener.log(f"  {done}/{len(texts)} orders complete")
+
+        results = dispatch_adaptive(
+            texts, lambda batch: classify_batch(client, batch, listener, retrier), batcher,
+            max_in_flight=1, fill_value=None, delay=0.5, on_batch_done=batch_done
+        )
+        listener.log(f"  {batcher.summary()}")
+        listener.log(f"  {retrier.metrics.summary()}")
+        return results
+
+    ai_results = clusters.classify(texts_list, lambda texts: _classify_representatives(texts, classify_texts,
+                                                                                        cache, journal, clusters))
+    listener.log(f"  {clusters.summary(batcher.next_size())}")
+    for order_id, ai_cat in zip(ids_list, ai_results):
+        if ai_cat is not None:
+            category_map[order_id] = ai_cat if ai_cat != "ERROR" else "other"
+
+
+def open_cache(input_path):
+    """The classification cache kept next to the input listing."""
+    return ClassificationCache(
+        os.path.join(os.path.dirname(input_path), CACHE_FILE),
+        model=MODEL_NAME,
+        prompt_version=prompt_hash(CLASSIFY_SYSTEM_MESSAGE, build_classify_prompt([])),
+        max_entries=CACHE_MAX_ENTRIES
+    )
+
+
+def open_journal(input_path, ai_verify_rules=False, resume=False):
+    """The checkpoint journal kept next to the input listing, for resuming a crashed run."""
+    key = run_key(input_path, MODEL_NAME, prompt_hash(CLASSIFY_SYSTEM_MESSAGE, build_classify_prompt([])),
+                  ai_verify_rules)
+    return RunJournal(journal_path(input_path), key, resume=resume)
+
+
+def load_previous(path, listener=None):
+    """Fingerprinted results of an earlier categorized output, for incremental runs."""
+    listener = listener or ProgressListener()
+    listener.log(f"Loading previous results from {os.path.basename(path)}...")
+    prior = previous_results(read_categorized(path))
+    listener.log(f"  {len(prior)} categorized orders available for reuse")
+    return prior
+
+
+def open_rule_precision(input_path, path=None):
+    """Pattern precision from path, or RULE_PRECISION_FILE next to the input listing; None if absent."""
+    precision_path = path or os.path.join(os.path.dirname(input_path), RULE_PRECISION_FILE)
+    if not os.path.exists(precision_path):
+        if path:
+            raise FileNotFoundError(f"Rule precision file not found: {path}")
+        return None
+    return RulePrecision.load(precision_path)
+
+
+def categorize_listing(df, client, ai_verify_rules=False, cache=None, listener=None, journal=None,
+                       previous=None, local_model=None, rule_precision=None, verify_threshold=VERIFY_THRESHOLD,
+                       rule_workers=RULE_WORKERS):
+    """
+    Categorize a void listing (parent rows plus child rows): rules first, the
+    LLM for the rest. Returns df with Predicted_Category and Extracted_New_Bill
+    filled on parent rows. Orders already in journal.completed are not sent to
+    the LLM again, and each finished batch is appended to the journal. With
+    previous (see load_previous), unchanged orders keep last run's results.
+    A local_model (LocalClassifier) answers the confident rule misses before
+    the LLM sees them. With ai_verify_rules, only rule hits that VerifyGate
+    finds ambiguous (competing categories, or confidence from rule_precision
+    below verify_threshold) are sent for verification. rule_workers > 1
+    shards the rule pass across processes.
+    """
+    listener = listener or ProgressListener()
+    order_col_name = 'Order No'
+
+    df['Temp_Order_ID'] = df[order_col_name].ffill()
+
+    grouped = group_order_text(df, 'Temp_Order_ID')
+
+    reused, reused_bills = {}, {}
+    if previous is not None:
+        reused, reused_bills = reuse_previous(df, grouped, previous)
+        grouped = grouped[~grouped.index.isin(list(reused))].copy()
+        listener.log(f"Incremental: {len(reused)} orders reused from the previous output, "
+                     f"{len(grouped)} new or changed")
+
+    grouped['Extracted_Bill_No'] = extract_new_bill_ids(grouped['AI_Input'])
+
+    bill_number_map = grouped['Extracted_Bill_No'].to_dict()
+    bill_number_map.update(reused_bills)
+
+    orders_with_text = grouped[grouped['AI_Input'].str.len() > 1].copy()
+    orders_empty = grouped[grouped['AI_Input'].str.len() <= 1].index.tolist()
+
+    listener.log(f"Total Orders: {len(grouped)}")
+    listener.log(f"Orders to Classify: {len(orders_with_text)}")
+
+    # Rule-based classification
+    listener.log("Applying rule-based classification...")
+    orders_with_text['Rule_Category'] = RULE_ENGINE.classify_series_parallel(
+        orders_with_text['AI_Input'], rule_workers)
+
+    rule_classified = orders_with_text[orders_with_text['Rule_Category'].notna()]
+    needs_ai = orders_with_text[orders_with_text['Rule_Category'].isna()]
+
+    listener.log(f"  Rule-based: {len(rule_classified)} orders")
+    listener.log(f"  Needs AI: {len(needs_ai)} orders")
+
+    category_map = rule_classified['Rule_Category'].to_dict()
+    if local_model is not None and len(needs_ai) > 0:
+        local = pd.Series(local_model.classify(needs_ai['AI_Input'].tolist()), index=needs_ai.index)
+        answered = local.dropna()
+        category_map.update(answered.to_dict())
+        needs_ai = needs_ai[local.isna().values]
+        listener.log(f"  Local model: {len(answered)} orders answered "
+                     f"(confidence >= {local_model.threshold}), {len(needs_ai)} left for the LLM")
+
+    if journal is not None:
+        if journal.stale:
+            listener.log("Journal belongs to a different input or settings; starting over")
+        if journal.completed:
+            category_map.update(journal.completed)
+            done_ids = list(journal.completed)
+            rule_classified = rule_classified[~rule_classified.index.isin(done_ids)]
+            needs_ai = needs_ai[~needs_ai.index.isin(done_ids)]
+            listener.log(f"  Resuming: {len(journal.completed)} orders from the journal, "
+                         f"{len(rule_classified) + len(needs_ai)} left for the LLM")
+    batcher = AdaptiveBatcher(BATCH_SIZE, max_size=MAX_BATCH_SIZE)
+    retrier = Retrier(log=listener.log)
+
+    # AI verification if enabled
+    if ai_verify_rules and len(rule_classified) > 0:
+        listener.log("AI Verification: Checking rule-based classifications...")
+        gate = VerifyGate(RULE_ENGINE, verify_threshold, rule_precision)
+        ambiguous = rule_classified[gate.select(rule_classified['AI_Input'])]
+        listener.log(f"  {gate.summary(batcher.next_size())}")
+        if len(ambiguous) > 0:
+            ai_verify_batch(client, ambiguous, category_map, cache, listener, batcher, retrier, journal)
+
+    # AI classification for remaining
+    if len(needs_ai) > 0:
+        listener.log("AI classification for remaining orders...")
+        ai_classify_batch(client, needs_ai, category_map, cache, listener, batcher, retrier, journal)
+
+    if cache is not None:
+        listener.log(cache.summary())
+    if journal is not None:
+        listener.log(journal.summary())
+
+    # Handle empty orders
+    for order_id in orders_empty:
+        category_map[order_id] = "no reason/remark"
+    category_map.update(reused)
+
+    # Apply results
+    listener.progress("categorize", 90)
+    df['Predicted_Category'] = df['Temp_Order_ID'].map(category_map)
+    df['Extracted_New_Bill'] = df['Temp_Order_ID'].map(bill_number_map)
+
+    mask_child_rows = df[order_col_name].isna()
+    df.loc[mask_child_rows, 'Predicted_Category'] = None
+    df.loc[mask_child_rows, 'Extracted_New_Bill'] = None
+
+    del df['Temp_Order_ID']
+    return df
+
+
+def save_categorized(df, output_path, listener=None):
+    """Write the categorized workbook and its Parquet copy."""
+    listener = listener or ProgressListener()
+    write_categorized_excel(df, output_path)
+    columnar_file = write_columnar(df, output_path)
+    listener.log(f"Saved to: {os.path.basename(output_path)}")
+    if columnar_file:
+        listener.log(f"Columnar copy for analysis: {os.path.basename(columnar_file)}")
+    return columnar_file
+
+
+# ==================== VOID BILLS REPORT (from Void_Bills_Report_Colab.ipynb) ====================
+def prepare_parent_df(categorized_df):
+    """
+    Parent rows of a categorized listing with parsed dates and Time_Gap_Hours.
+    Returns (parent_df, order_col, avail_cols).
+    """
+    df = categorized_df.copy()
+    order_col = df.columns[0]
+    parent_df = df[df[order_col].notna()].copy()
+
+    # Parse dates (from Fraud_Detection_Analysis.ipynb)
+    if 'Order Date' in parent_df.columns:
+        parent_df['Order_Date_Parsed'] = pd.to_datetime(parent_df['Order Date'], errors='coerce')
+    if 'Void Date' in parent_df.columns:
+        parent_df['Void_Date_Parsed'] = pd.to_datetime(parent_df['Void Date'], errors='coerce')
+    if 'Order Time' in parent_df.columns:
+        parent_df['Order_Time_Parsed'] = pd.to_datetime(parent_df['Order Time'], errors='coerce')
+
+    # Calculate time gap
+    if 'Order_Time_Parsed' in parent_df.columns and 'Void_Date_Parsed' in parent_df.columns:
+        parent_df['Time_Gap_Hours'] = (parent_df['Void_Date_Parsed'] - parent_df['Order_Time_Parsed']).dt.total_seconds() / 3600
+
+    # Standard columns
+    display_cols = [order_col, 'Outlet', 'Order Type', 'Order Date', 'Reason', 'Void By ', 'Amount']
+    avail_cols = [c for c in display_cols if c in parent_df.columns]
+    return parent_df, order_col, avail_cols
+
+
+# ==================== FRAUD DETECTION (from Fraud_Detection_Analysis.ipynb) ====================
+class FraudFlag:
+    """
+    One entry of the fraud flag registry. predicate(parent_df, results)
+    returns a boolean mask, or None when the columns it needs are missing;
+    weight is added to Fraud_Flags for every flagged order and name is its
+    text in Fraud_Reasons.
+    """
+
+    def __init__(self, name, weight, predicate):
+        self.name = name
+        self.weight = weight
+        self.predicate = predicate
+
+
+def _column_flag(column, test):
+    """Predicate applying test to parent_df[column], or None without that column."""
+    return lambda df, results: test(df[column]) if column in df.columns else None
+
+
+# Evaluated once into a boolean matrix; the order here is the order of Fraud_Reasons
+FRAUD_FLAGS = [
+    FraudFlag("High Value", 1, lambda df, results: df['Amount'] >= results.amount_threshold),
+    FraudFlag("No Reason", 2, _column_flag('Predicted_Category', lambda c: c.isin(NO_REASON_CATEGORIES))),
+    FraudFlag("Testing", 1, _column_flag('Predicted_Category', lambda c: c == 'testing')),
+    FraudFlag("Round Amount", 1, _column_flag('Is_Round', lambda c: c == True)),
+    FraudFlag("Late Night", 1, _column_flag('Void_Hour', lambda c: (c >= 22) | (c <= 5))),
+    FraudFlag("Extreme Delay", 2, _column_flag('Time_Gap_Hours', lambda c: c > 24)),
+    FraudFlag("Void Burst", 1, _column_flag('Voider_Velocity_Z', lambda c: c >= VELOCITY_Z_THRESHOLD)),
+]
+FLAG_INDEX = {flag.name: i for i, flag in enumerate(FRAUD_FLAGS)}
+
+
+def flag_matrix(parent_df, results, flags=FRAUD_FLAGS):
+    """(len(parent_df), len(flags)) boolean matrix with one column per registry flag."""
+    matrix = np.zeros((len(parent_df), len(flags)), dtype=bool)
+    for i, flag in enumerate(flags):
+        mask = flag.predicate(parent_df, results)
+        if mask is not None:
+            matrix[:, i] = np.asarray(mask, dtype=bool)
+    return matrix
+
+
+def decode_reasons(reason_masks, flags=FRAUD_FLAGS):
+    """Fraud_Reasons text ('High Value; Late Night; ') for reason bitmasks; each distinct mask is decoded once."""
+    reason_masks = pd.Series(reason_masks)
+    text = {mask: "".join(f"{flag.name}; " for i, flag in enumerate(flags) if int(mask) >> i & 1)
+            for mask in reason_masks.unique()}
+    return reason_masks.map(text).values
+
+
+def with_fraud_reasons(df):
+    """df with its Fraud_Reason_Mask column decoded into Fraud_Reasons, for display and export."""
+    if 'Fraud_Reason_Mask' not in df.columns:
+        return df
+    df = df.copy()
+    position = df.columns.get_loc('Fraud_Reason_Mask')
+    reasons = decode_reasons(df.pop('Fraud_Reason_Mask').values)
+    df.insert(position, 'Fraud_Reasons', reasons)
+    return df
+
+
+class FraudResults:
+    """Flagged order subsets, staff/outlet statistics and thresholds from one fraud run."""
+
+    def __init__(self):
+        self.parent_df = None
+        self.high_value_voids = pd.DataFrame()
+        self.no_reason_voids = pd.DataFrame()
+        self.late_night_voids = pd.DataFrame()
+        self.round_voids = pd.DataFrame()
+        self.testing_voids = pd.DataFrame()
+        self.extreme_delay_voids = pd.DataFrame()
+        self.velocity_voids = pd.DataFrame()
+        self.collusion_pairs = pd.DataFrame()
+        self.shared_phones = pd.DataFrame()
+        self.collusion_groups = pd.DataFrame()
+        self.repeat_phone_df = pd.DataFrame()
+        self.phone_summary = pd.DataFrame()
+        self.voider_stats = pd.DataFrame()
+        self.frequent_voiders = pd.DataFrame()
+        self.outlet_stats = pd.DataFrame()
+        self.anomaly_outlets = pd.DataFrame()
+        self.high_risk_orders = pd.DataFrame()
+        self.critical_orders = pd.DataFrame()
+
+        # Thresholds
+        self.amount_threshold = 0
+        self.avg_voids = 0
+
+    def summary_text(self):
+        return f"""FRAUD RISK SUMMARY
+{'='*50}
+High-Value Voids (>Rs.{self.amount_threshold:,.0f}): {len(self.high_value_voids)}
+Voids Without Reason:                    {len(self.no_reason_voids)}
+Late Night Voids (10PM-5AM):             {len(self.late_night_voids)}
+Round Amount Voids:                      {len(self.round_voids)}
+Testing Category:                        {len(self.testing_voids)}
+Extreme Delays (>24hr):                  {len(self.extreme_delay_voids)}
+Void Bursts (rolling-window z-score):    {len(self.velocity_voids)}
+Frequent Voiders:                        {len(self.frequent_voiders)}
+Placed/Voided Staff Pairs:               {len(self.collusion_pairs)}
+Phones Shared by Staff:                  {len(self.shared_phones)}
+Linked Staff Groups:                     {len(self.collusion_groups)}
+Outlet Anomalies:                        {len(self.anomaly_outlets)}
+{'='*50}
+CRITICAL RISK Orders (3+ flags):         {len(self.critical_orders)}
+HIGH RISK Orders (2+ flags):             {len(self.high_risk_orders)}
+"""
+
+
+def voider_statistics(parent_df, order_col):
+    """
+    Void count and value per 'Void By ' staff member, with the outlet they void
+    at most (ties go to the first outlet name, like Series.mode; 'Multiple'
+    when no outlet is known). Named aggregations only, no per-group Python.
+    """
+    by_voider = parent_df.groupby('Void By ')
+    stats = by_voider.agg(**{
+        'Void Count': (order_col, 'count'),
+        'Total Value': ('Amount', 'sum'),
+        'Avg Value': ('Amount', 'mean'),
+        'Max Value': ('Amount', 'max'),
+    })
+    # (voider, outlet) counts come sorted by outlet, so a stable sort on the count
+    # leaves each voider's most frequent, first-named outlet on top
+    pair_counts = parent_df.groupby(['Void By ', 'Outlet']).size().reset_index(name='Count')
+    primary = (pair_counts.sort_values('Count', ascending=False, kind='stable')
+               .drop_duplicates('Void By ').set_index('Void By ')['Outlet'])
+    stats['Primary Outlet'] = primary.reindex(stats.index).fillna('Multiple')
+    stats = stats.reset_index()
+    stats.columns = ['Void By', 'Void Count', 'Total Value', 'Avg Value', 'Max Value', 'Primary Outlet']
+    return stats
+
+
+def phone_statistics(phone_df, order_col, max_outlets=3):
+    """
+    Void count, value and the first max_outlets distinct outlets (in order of
+    appearance) per Contact_Clean, from a sorted, deduplicated cumcount filter.
+    """
+    stats = phone_df.groupby('Contact_Clean').agg(**{
+        'Void Count': (order_col, 'count'),
+        'Total Value': ('Amount', 'sum'),
+    })
+    firsts = phone_df[['Contact_Clean', 'Outlet']].dropna().drop_duplicates()
+    firsts = firsts.assign(Outlet=firsts['Outlet'].astype(str), Slot=firsts.groupby('Contact_Clean').cumcount())
+    slots = firsts[firsts['Slot'] < max_outlets].pivot(index='Contact_Clean', columns='Slot', values='Outlet')
+    outlets = pd.Series('', index=stats.index, dtype=object)
+    for slot in slots.columns:
+        separator = '' if slot == 0 else ', '
+        outlets = outlets + (separator + slots[slot].reindex(stats.index)).fillna('')
+    stats['Outlets'] = outlets
+    stats = stats.reset_index()
+    stats.columns = ['Contact No', 'Void Count', 'Total Value', 'Outlets']
+    return stats
+
+
+def detect_fraud(parent_df, order_col, listener=None):
+    """Run the notebook's fraud flags over parent_df and return FraudResults."""
+    listener = listener or ProgressListener()
+    results = FraudResults()
+    parent_df = parent_df.copy()
+
+    listener.progress("fraud", 5)
+
+    # Columns the flag registry reads
+    results.amount_threshold = parent_df['Amount'].quantile(0.95)
+    velocity = pd.DataFrame(index=parent_df.index)
+    if 'Void_Date_Parsed' in parent_df.columns:
+        parent_df['Void_Hour'] = parent_df['Void_Date_Parsed'].dt.hour
+        velocity = void_velocity(parent_df)
+        for column in ('Voider_Velocity_Z', 'Outlet_Velocity_Z'):
+            if column in velocity.columns:
+                parent_df[column] = velocity[column]
+    amounts = pd.to_numeric(parent_df['Amount'], errors='coerce').to_numpy(dtype=float)
+    parent_df['Is_Round'] = is_suspiciously_round(amounts)
+    parent_df['Roundness'] = roundness(amounts)
+
+    # Every registry flag, evaluated once
+    matrix = flag_matrix(parent_df, results)
+
+    def flagged(name, by='Amount'):
+        return parent_df[matrix[:, FLAG_INDEX[name]]].sort_values(by, ascending=False).copy()
+
+    # Flag 1: High value voids (above 95th percentile)
+    results.high_value_voids = flagged("High Value")
+
+    listener.progress("fraud", 15)
+
+    # Flag 2: Frequent voiders (from notebook)
+    if 'Void By ' in parent_df.columns:
+        results.voider_stats = voider_statistics(parent_df, order_col).sort_values('Void Count', ascending=False)
+
+        results.avg_voids = results.voider_stats['Void Count'].mean()
+        results.frequent_voiders = results.voider_stats[results.voider_stats['Void Count'] > results.avg_voids * 1.5].copy()
+
+    listener.progress("fraud", 25)
+
+    # Flag 3: Voids without reason
+    results.no_reason_voids = flagged("No Reason")
+
+    listener.progress("fraud", 35)
+
+    # Flag 4: Late night voids (from notebook)
+    if 'Void_Hour' in parent_df.columns:
+        results.late_night_voids = flagged("Late Night")
+
+    listener.progress("fraud", 45)
+
+    # Flag 5: Round number amounts (from notebook)
+    results.round_voids = flagged("Round Amount")
+
+    listener.progress("fraud", 55)
+
+    # Flag 6: Repeat phone numbers (from notebook)
+    if 'Contact no' in parent_df.columns:
+        parent_df['Contact_Clean'] = parent_df['Contact no'].astype(str).str.strip()
+        phone_counts = parent_df['Contact_Clean'].value_counts()
+        results.repeat_phone_df = parent_df[parent_df['Contact_Clean'].map(phone_counts) > 1].copy()
+
+        phone_summary = phone_statistics(results.repeat_phone_df, order_col)
+        results.phone_summary = phone_summary.sort_values('Void Count', ascending=False)
+
+    listener.progress("fraud", 65)
+
+    # Flag 7: Outlet anomalies (from notebook)
+    outlet_stats = parent_df.groupby('Outlet').agg({
+        order_col: 'count',
+        'Amount': ['sum', 'mean', 'max']
+    }).reset_index()
+    outlet_stats.columns = ['Outlet', 'Void Count', 'Total Value', 'Avg Value', 'Max Value']
+
+    outlet_stats['Count_ZScore'] = (outlet_stats['Void Count'] - outlet_stats['Void Count'].mean()) / outlet_stats['Void Count'].std()
+    outlet_stats['Value_ZScore'] = (outlet_stats['Total Value'] - outlet_stats['Total Value'].mean()) / outlet_stats['Total Value'].std()
+    results.outlet_stats = outlet_stats
+
+    results.anomaly_outlets = outlet_stats[(outlet_stats['Count_ZScore'] > 1.5) | (outlet_stats['Value_ZScore'] > 1.5)].copy()
+
+    listener.progress("fraud", 75)
+
+    # Flag 8: Testing category
+    results.testing_voids = flagged("Testing")
+
+    # Flag 9: Extreme delays (from notebook)
+    if 'Time_Gap_Hours' in parent_df.columns:
+        results.extreme_delay_voids = flagged("Extreme Delay", by='Time_Gap_Hours')
+
+    # Flag 10: Void bursts - rolling 1h/1d/7d void counts per staff member against their own baseline
+    if 'Voider_Velocity_Z' in parent_df.columns:
+        bursts = flagged("Void Burst", by='Voider_Velocity_Z')
+        window_columns = [c for c in velocity.columns if not c.endswith('_Velocity_Z')]
+        results.velocity_voids = bursts.join(velocity[window_columns])
+
+    # Flag 11: Collusion - staff who repeatedly void each other's orders, phones shared across staff
+    if {'Placed By', 'Void By '} <= set(parent_df.columns):
+        from collusion_graph import SCIPY_AVAILABLE, CollusionGraph  # scipy.stats is slow to import
+        if SCIPY_AVAILABLE:
+            graph = CollusionGraph(parent_df)
+            results.collusion_pairs = graph.dense_pairs()
+            results.shared_phones = graph.shared_phones()
+            results.collusion_groups = graph.groups(results.collusion_pairs, results.shared_phones)
+
+    listener.progress("fraud", 85)
+
+    # Combined fraud risk score (from notebook): weights and reason bits in one product each
+    counts = matrix.astype(np.int64)
+    parent_df['Fraud_Flags'] = counts @ np.array([flag.weight for flag in FRAUD_FLAGS], dtype=np.int64)
+    parent_df['Fraud_Reason_Mask'] = counts @ (np.int64(1) << np.arange(len(FRAUD_FLAGS), dtype=np.int64))
+
+    parent_df['Risk_Level'] = pd.cut(parent_df['Fraud_Flags'], bins=[-1, 0, 1, 2, 10],
+                                     labels=['Low', 'Medium', 'High', 'Critical'])
+
+    # Reasons are decoded only for the orders that are shown and exported
+    results.high_risk_orders = with_fraud_reasons(parent_df[parent_df['Fraud_Flags'] >= 2].sort_values(['Fraud_Flags', 'Amount'], ascending=[False, False]))
+    results.critical_orders = with_fraud_reasons(parent_df[parent_df['Fraud_Flags'] >= 3])
+    results.parent_df = parent_df
+
+    listener.progress("fraud", 100)
+    return results
+
+
+# ==================== EXPORT (combined from both notebooks) ====================
+def export_report(output_path, report_type, parent_df, fraud=None):
+    """Write the void_bills, fraud or combined report workbook."""
+    fraud = fraud or FraudResults()
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        if report_type in ['void_bills', 'combined']:
+            # From Void_Bills_Report_Colab.ipynb
+            with_fraud_reasons(parent_df).to_excel(writer, sheet_name='All Orders', index=False)
+
+            reason_counts = parent_df['Predicted_Category'].value_counts().reset_index()
+            reason_counts.columns = ['Category', 'Count']
+            reason_counts.to_excel(writer, sheet_name='Reason Summary', index=False)
+
+            channel_pivot = pd.crosstab(parent_df['Outlet'], parent_df['Order Type'], margins=True)
+            channel_pivot.to_excel(writer, sheet_name='Channel-wise')
+
+            value_pivot = parent_df.pivot_table(values='Amount', index='Outlet', columns='Order Type', aggfunc='sum', fill_value=0)
+            value_pivot['Total'] = value_pivot.sum(axis=1)
+            value_pivot.to_excel(writer, sheet_name='Outlet Values')
+
+        if report_type in ['fraud', 'combined']:
+            # From Fraud_Detection_Analysis.ipynb
+            sheets = [
+                ('HIGH_RISK', fraud.high_risk_orders),
+                ('CRITICAL', fraud.critical_orders),
+                ('High_Value', fraud.high_value_voids),
+                ('No_Reason', fraud.no_reason_voids),
+                ('Late_Night', fraud.late_night_voids),
+                ('Round_Amounts', fraud.round_voids),
+                ('Voider_Stats', fraud.voider_stats),
+                ('Frequent_Voiders', fraud.frequent_voiders),
+                ('Anomaly_Outlets', fraud.anomaly_outlets),
+                ('Testing', fraud.testing_voids),
+                ('Extreme_Delays', fraud.extreme_delay_voids),
+                ('Void_Bursts', fraud.velocity_voids),
+                ('Collusion_Pairs', fraud.collusion_pairs),
+                ('Shared_Phones', fraud.shared_phones),
+                ('Collusion_Groups', fraud.collusion_groups),
+            ]
+            for sheet_name, frame in sheets:
+                if len(frame) > 0:
+                    frame.to_excel(writer, sheet_name=sheet_name, index=False)
+
+            # Summary sheet
+            summary_df = pd.DataFrame({
+                'Metric': [
+                    'Total Orders Analyzed',
+                    'High-Value Voids',
+                    'Voids Without Reason',
+                    'Late Night Voids',
+                    'Round Amount Voids',
+                    'Testing Category',
+                    'Extreme Delays (>24hr)',
+                    'Void Bursts',
+                    'Frequent Voiders',
+                    'Placed/Voided Staff Pairs',
+                    'Phones Shared by Staff',
+                    'Linked Staff Groups',
+                    'Anomaly Outlets',
+                    'CRITICAL RISK Orders (3+ flags)',
+                    'HIGH RISK Orders (2+ flags)'
+                ],
+                'Count': [
+                    len(parent_df),
+                    len(fraud.high_value_voids),
+                    len(fraud.no_reason_voids),
+                    len(fraud.late_night_voids),
+                    len(fraud.round_voids),
+                    len(fraud.testing_voids),
+                    len(fraud.extreme_delay_voids),
+                    len(fraud.velocity_voids),
+                    len(fraud.frequent_voiders),
+                    len(fraud.collusion_pairs),
+                    len(fraud.shared_phones),
+                    len(fraud.collusion_groups),
+                    len(fraud.anomaly_outlets),
+                    len(fraud.critical_orders),
+                    len(fraud.high_risk_orders)
+                ]
+            })
+            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+    return output_path
+
+
+# ==================== HEADLESS RUN ====================
+def _load_api_key():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+    return os.getenv("API_KEY")
+
+
+def run_pipeline(input_path, stages=STAGES, output_path=None, report_path=None,
+                 report_type="combined", ai_verify_rules=False, client=None, listener=None,
+                 resume=False, previous_path=None, local_model_path=None, rule_precision_path=None,
+                 verify_threshold=VERIFY_THRESHOLD, rule_workers=RULE_WORKERS):
+    """
+    Run the requested stages in order. categorize reads a raw listing; fraud and
+    export reuse its result or, without it, read input_path as categorized output.
+    With resume, categorize picks up an interrupted run from its journal; with
+    previous_path, orders unchanged since that categorized output are reused.
+    The local model (local_model_path, or local_model.joblib next to the input
+    if present) answers confident rule misses before the LLM. Rule precision
+    (rule_precision_path, or rule_precision.json next to the input) feeds the
+    AI verification gate.
+    Returns the FraudResults (None unless fraud ran).
+    """
+    listener = listener or ProgressListener()
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    output_path = output_path or os.path.join(base_dir, "categorized_orders_clean.xlsx")
+    report_path = report_path or os.path.join(base_dir, f"{report_type}_report.xlsx")
+
+    categorized_df = None
+    if "categorize" in stages:
+        if client is None:
+            if not GROQ_AVAILABLE:
+                raise RuntimeError("groq is not installed")
+            api_key = _load_api_key()
+            if not api_key:
+                raise RuntimeError("API_KEY not set. Add API_KEY=your_key to a .env file or set the environment variable.")
+            client = Groq(api_key=api_key, max_retries=SDK_MAX_RETRIES)
+        listener.log(f"Reading {os.path.basename(input_path)}...")
+        df = read_listing(input_path)
+        cache = open_cache(input_path)
+        previous = load_previous(previous_path, listener) if previous_path else None
+        local_model = open_local_model(input_path, local_model_path)
+        if local_model is not None:
+            listener.log(f"Local model loaded ({local_model.trained_on} training orders)")
+        rule_precision = open_rule_precision(input_path, rule_precision_path) if ai_verify_rules else None
+        journal = open_journal(input_path, ai_verify_rules, resume)
+        try:
+            categorized_df = categorize_listing(df, client, ai_verify_rules, cache, listener, journal, previous,
+                                                local_model, rule_precision, verify_threshold, rule_workers)
+        finally:
+            cache.close()
+            journal.close()
+        save_categorized(categorized_df, output_path, listener)
+        journal.remove()
+        listener.progress("categorize", 100)
+        listener.log("Categorization complete!")
+
+    if "fraud" not in stages and "export" not in stages:
+        return None
+
+    if categorized_df is None:
+        listener.log(f"Loading categorized data from {os.path.basename(input_path)}...")
+        categorized_df = read_categorized(input_path)
+    parent_df, order_col, _ = prepare_parent_df(categorized_df)
+
+    fraud = None
+    if "fraud" in stages:
+        fraud = detect_fraud(parent_df, order_col, listener)
+        parent_df = fraud.parent_df
+        listener.log(fraud.summary_text())
+
+    if "export" in stages:
+        export_report(report_path, report_type, parent_df, fraud)
+        listener.progress("export", 100)
+        listener.log(f"Exported to: {report_path}")
+    return fraud
+
+
+def train_model_command(args):
+    """void-analysis train-model: fit, report holdout coverage/accuracy, save."""
+    if not SKLEARN_AVAILABLE:
+        logger.error("Error: scikit-learn is not installed")
+        return 1
+    try:
+        model, report = train_from_files(args.input, args.output, args.threshold)
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(f"Error: {e}")
+        return 1
+    logger.info(f"Trained on {model.trained_on} orders; holdout (20%) by confidence threshold:")
+    for threshold, coverage, accuracy in report:
+        logger.info(f"  >= {threshold:.2f}: {coverage:6.1%} answered locally, {accuracy:6.1%} accurate")
+    logger.info(f"Saved {args.output}")
+    return 0
+
+
+def rule_precision_command(args):
+    """void-analysis rule-precision: measure each keyword pattern against earlier labels."""
+    try:
+        orders = pd.concat([labelled_orders(read_categorized(path)) for path in args.input])
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(f"Error: {e}")
+        return 1
+    precision = RulePrecision.from_history(RULE_ENGINE, orders['AI_Input'], orders['Predicted_Category'])
+    precision.save(args.output)
+    logger.info(f"Measured {len(precision.counts)} patterns on {len(orders)} orders")
+    for category, pattern, hits, value in precision.weakest():
+        logger.info(f"  {value:6.1%}  {hits:6d} hits  {category}: {pattern}")
+    logger.info(f"Saved {args.output}")
+    return 0
+
+
+def profile_rules_command(args):
+    """void-analysis profile-rules: per-pattern cost, hits and shadowed matches as a table."""
+    try:
+        df = read_categorized(args.input)
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(f"Error: {e}")
+        return 1
+    df['Temp_Order_ID'] = df['Order No'].ffill()
+    texts = group_order_text(df, 'Temp_Order_ID')['AI_Input']
+    texts = texts[texts.str.len() > 1]
+    profile = RULE_ENGINE.profile(texts).sort_values("Seconds", ascending=False)
+    if args.output.lower().endswith(".csv"):
+        profile.to_csv(args.output, index=False)
+    else:
+        profile.to_excel(args.output, index=False)
+
+    never = profile[profile['Matches'] == 0]
+    shadowed_only = profile[(profile['Matches'] > 0) & (profile['Wins'] == 0)]
+    logger.info(f"Profiled {len(profile)} patterns on {len(texts)} orders "
+                f"({profile['Seconds'].sum():.2f}s without the prefilter)")
+    logger.info(f"  {len(never)} never matched, {len(shadowed_only)} only matched when shadowed, "
+                f"{(profile['Unique_Wins'] > 0).sum()} decided at least one order alone")
+    logger.info("  Slowest patterns:")
+    for row in profile.head(args.top).itertuples():
+        logger.info(f"    {row.Us_Per_Text:7.2f} us/text  {row.Matches:6d} matches  {row.Category}: {row.Pattern}")
+    logger.info(f"Saved {args.output}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="void-analysis", description="Headless void bills analysis pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run pipeline stages without the GUI")
+    p.add_argument("--input", required=True,
+                   help="raw void listing (categorize) or categorized output (fraud/export only)")
+    p.add_argument("--stages", default=",".join(STAGES),
+                   help="comma-separated subset of: " + ",".join(STAGES))
+    p.add_argument("--output", help="categorized workbook (default: categorized_orders_clean.xlsx next to input)")
+    p.add_argument("--report", choices=REPORT_TYPES, default="combined", help="report type for export")
+    p.add_argument("--report-output", help="report workbook (default: <report>_report.xlsx next to input)")
+    p.add_argument("--ai-verify", action="store_true", help="AI verify rule-based classifications")
+    p.add_argument("--resume", action="store_true",
+                   help="reuse orders already classified by an interrupted run of the same input")
+    p.add_argument("--previous", metavar="CATEGORIZED",
+                   help="earlier categorized output; unchanged orders reuse its results (incremental mode)")
+    p.add_argument("--local-model", metavar="MODEL",
+                   help=f"local classifier artifact (default: {DEFAULT_MODEL_FILE} next to input, if present)")
+    p.add_argument("--rule-precision", metavar="JSON",
+                   help=f"pattern precision for --ai-verify (default: {RULE_PRECISION_FILE} next to input, if present)")
+    p.add_argument("--verify-all", action="store_true",
+                   help="with --ai-verify, verify every rule hit instead of only ambiguous ones")
+    p.add_argument("--rule-workers", type=int, default=RULE_WORKERS,
+                   help="processes for the keyword rule pass (helps on very large listings)")
+    p.add_argument("--log-level", default="INFO")
+
+    p = sub.add_parser("train-model", help="train the local classifier tier on categorized outputs")
+    p.add_argument("--input", nargs="+", required=True, help="categorized workbook(s) or Parquet files")
+    p.add_argument("--output", default=DEFAULT_MODEL_FILE, help=f"model artifact (default: {DEFAULT_MODEL_FILE})")
+    p.add_argument("--threshold", type=float, default=LOCAL_MODEL_THRESHOLD,
+                   help="confidence needed to skip the LLM")
+    p.add_argument("--log-level", default="INFO")
+
+    p = sub.add_parser("rule-precision", help="measure keyword pattern precision on categorized outputs")
+    p.add_argument("--input", nargs="+", required=True, help="categorized workbook(s) or Parquet files")
+    p.add_argument("--output", default=RULE_PRECISION_FILE, help=f"precision file (default: {RULE_PRECISION_FILE})")
+    p.add_argument("--log-level", default="INFO")
+
+    p = sub.add_parser("profile-rules", help="profile keyword patterns: time, matches, shadowed matches")
+    p.add_argument("--input", required=True, help="raw void listing or categorized output")
+    p.add_argument("--output", default="rule_profile.xlsx", help="profile table, .xlsx or .csv")
+    p.add_argument("--top", type=int, default=10, help="slowest patterns to log")
+    p.add_argument("--log-level", default="INFO")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    if args.command == "train-model":
+        return train_model_command(args)
+    if args.command == "rule-precision":
+        return rule_precision_command(args)
+    if args.command == "profile-rules":
+        return profile_rules_command(args)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    try:
+        run_pipeline(args.input, stages, output_path=args.output, report_path=args.report_output,
+                     report_type=args.report, ai_verify_rules=args.ai_verify, resume=args.resume,
+                     previous_path=args.previous, local_model_path=args.local_model,
+                     rule_precision_path=args.rule_precision,
+                     verify_threshold=None if args.verify_all else VERIFY_THRESHOLD,
+                     rule_workers=args.rule_workers)
+    except (ValueError, RuntimeError, FileNotFoundError, ImportError) as e:
+        logger.error(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Void Listing Preprocessing
+Shared text preparation for the categorization scripts: order grouping, new
+bill number extraction over the whole grouped frame, and order fingerprints
+for reusing last month's results on overlapping listings.
+"""
+
+import re
+
+import pandas as pd
+
+from classification_cache import UNCACHEABLE
+
+TEXT_COLUMNS = ['Reason', 'Remark']
+
+# Explicit "new bill" / "new order" mentions, tried in order (first match wins)
+# Matches: NEW BILL NO Y22196, NBN L27169, new bill number M45055, new dkt 18, order no 18
+NEW_BILL_PATTERNS = [
+    re.compile(r'(?:NEW\s*BILL?\s*(?:NO|NUMBER|NOMBER|NUBBER)?[:\s-]*|NBN[:\s-]*|N\.?B\.?N[:\s-]*)([A-Z]{1,2}[\s-]?\d{4,7})'),
+    re.compile(r'(?:NEW\s*(?:ORDER|DOCKET|DKT|DOC|TRANX)\s*(?:NO|NUMBER)?[:\s-]*)([A-Z]{0,2}[\s-]?\d{3,7})'),
+    re.compile(r'(?:ORDER\s*(?:NO|NUMBER)?[:\s-]*)(\d{2,3})(?:\s|$|,)'),
+]
+
+# General bill ID pattern (fallback), e.g. Y22196, HJ0042
+BILL_ID_FALLBACK = re.compile(r'\b([A-Z]{1,2}\d{4,7})\b')
+
+
+def extract_new_bill_id(text):
+    """
+    Extracts new bill numbers from text using multiple regex patterns.
+    Handles formats like: Y22196, P-69112, HJ 0042, L27016, G81216, etc.
+    """
+    if not text or pd.isna(text):
+        return None
+    clean_text = str(text).upper()
+    for pattern in NEW_BILL_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            result = match.group(1).replace(" ", "").replace("-", "")
+            if len(result) >= 2:
+                return result
+    match = BILL_ID_FALLBACK.search(clean_text)
+    if match:
+        return match.group(1)
+    return None
+
+
+def extract_new_bill_ids(texts):
+    """
+    Vectorized extract_new_bill_id over a Series. Repeated remarks are extracted
+    once, and each pattern tier only scans the texts earlier tiers did not
+    resolve, so the first match wins.
+    """
+    result = pd.Series([None] * len(texts), index=texts.index, dtype=object)
+    valid = (texts.notna() & (texts.astype(str) != "")).values
+    codes, uniques = pd.factorize(texts[valid].astype(str).str.upper())
+    if len(uniques) == 0:
+        return result
+
+    extracted = pd.Series([None] * len(uniques), dtype=object)
+    pending = pd.Series(uniques)
+    for pattern in NEW_BILL_PATTERNS:
+        if pending.empty:
+            break
+        found = pending.str.extract(pattern, expand=False)
+        cleaned = found.str.replace(" ", "", regex=False).str.replace("-", "", regex=False)
+        resolved = (cleaned.notna() & (cleaned.str.len() >= 2)).values
+        extracted[pending.index[resolved]] = cleaned[resolved].values
+        pending = pending[~resolved]
+
+    if not pending.empty:
+        found = pending.str.extract(BILL_ID_FALLBACK, expand=False)
+        resolved = found.notna().values
+        extracted[pending.index[resolved]] = found[resolved].values
+
+    result[valid] = extracted.values[codes]
+    return result
+
+
+def group_order_text(df, key='Temp_Order_ID', columns=TEXT_COLUMNS):
+    """
+    Group child rows under their order and join each text column's distinct,
+    non-empty values in first-seen row order. Returns a frame indexed by order
+    (same index as df.groupby(key)) with the text columns plus AI_Input.
+    """
+    keys = df[key]
+    order_index = keys.groupby(keys, sort=True).size().index
+
+    grouped = pd.DataFrame(index=order_index)
+    for col in columns:
+        values = df[col]
+        present = values.notna() & keys.notna()
+        pieces = pd.DataFrame({
+            'key': keys[present].values,
+            'text': values[present].astype(str).str.strip().values,
+        })
+        pieces = pieces[pieces['text'] != ''].drop_duplicates()
+        # Concatenate position by position instead of one ' '.join call per order
+        position = pieces.groupby('key', sort=False).cumcount().values
+        joined = pd.Series('', index=order_index, dtype=object)
+        for level in range(position.max() + 1 if len(position) else 0):
+            part = pieces[position == level].set_index('key')['text']
+            prefix = '' if level == 0 else ' '
+            joined.loc[part.index] = joined.loc[part.index] + prefix + part
+        grouped[col] = joined
+
+    ai_input = grouped[columns[0]]
+    for col in columns[1:]:
+        ai_input = ai_input + " " + grouped[col]
+    grouped['AI_Input'] = ai_input.str.strip()
+    return grouped
+
+
+def _key_text(values):
+    """Strings for fingerprinting; 12345.0 read back from a workbook matches 12345."""
+    text = values.astype(object).where(values.notna(), '').astype(str).str.strip()
+    return text.str.replace(r'\.0$', '', regex=True)
+
+
+def order_fingerprints(df, grouped, key='Temp_Order_ID'):
+    """
+    Hash each order group (Order No + Outlet + Order Date + combined text) so
+    the same void pulled into two overlapping monthly listings gets the same
+    fingerprint. grouped is group_order_text(df, key); returns a uint64 Series
+    on its index.
+    """
+    firsts = df.groupby(key, sort=True)[[c for c in ('Outlet', 'Order Date') if c in df]].first()
+    firsts = firsts.reindex(grouped.index)
+    order = _key_text(pd.Series(grouped.index, index=grouped.index))
+    outlet = _key_text(firsts['Outlet']) if 'Outlet' in firsts else ''
+    if 'Order Date' in firsts:
+        date = pd.to_datetime(firsts['Order Date'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    else:
+        date = ''
+    text = grouped['AI_Input'].str.replace(r'\s+', ' ', regex=True).str.strip().str.lower()
+    combined = order + '\x1f' + outlet + '\x1f' + date + '\x1f' + text
+    return pd.Series(pd.util.hash_pandas_object(combined, index=False).values, index=grouped.index)
+
+
+def previous_results(categorized_df, order_col='Order No'):
+    """
+    Predicted_Category / Extracted_New_Bill of an earlier categorized output,
+    indexed by order fingerprint, for reuse in incremental runs. Orders whose
+    classification failed ("ERROR") are left out so they are retried.
+    """
+    df = categorized_df.copy()
+    df['Temp_Order_ID'] = df[order_col].ffill()
+    grouped = group_order_text(df, 'Temp_Order_ID')
+    parents = df[df[order_col].notna()].drop_duplicates('Temp_Order_ID').set_index('Temp_Order_ID')
+    prior = pd.DataFrame({
+        'Predicted_Category': parents['Predicted_Category'].reindex(grouped.index).values,
+        'Extracted_New_Bill': parents['Extracted_New_Bill'].reindex(grouped.index).values,
+    }, index=order_fingerprints(df, grouped).values)
+    prior = prior[prior['Predicted_Category'].notna() & ~prior['Predicted_Category'].isin(UNCACHEABLE)]
+    return prior[~prior.index.duplicated()]
+
+
+def reuse_previous(df, grouped, prior, key='Temp_Order_ID'):
+    """
+    Match this listing's orders against previous_results by fingerprint.
+    Returns (category_map, bill_number_map) for the orders that can be reused;
+    orders missing from both maps are new or changed.
+    """
+    fingerprints = order_fingerprints(df, grouped, key)
+    matched = fingerprints[fingerprints.isin(prior.index)]
+    reused = prior.loc[matched.values]
+    bills = reused['Extracted_New_Bill'].astype(object).where(reused['Extracted_New_Bill'].notna(), None)
+    return (dict(zip(matched.index, reused['Predicted_Category'])),
+            dict(zip(matched.index, bills)))
@@ -0,0 +1,71 @@
+"""
+Void Velocity Detection
+Rolling void counts and voided value per staff member and per outlet over
+trailing time windows (1 hour, 1 day, 7 days), with a z-score of each
+window count against that staff member's or outlet's own baseline, so a
+burst of voids stands out even when the monthly total looks normal.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Column label suffix -> pandas offset for the trailing window
+DEFAULT_WINDOWS = {"1h": "1h", "1d": "1D", "7d": "7D"}
+DEFAULT_KEYS = {"Voider": "Void By ", "Outlet": "Outlet"}
+DEFAULT_MIN_VOIDS = 5       # Window counts below this are never scored as a burst
+
+
+def rolling_activity(df, key, time_col="Void_Date_Parsed", windows=DEFAULT_WINDOWS):
+    """
+    Voids and voided Amount per key in each trailing window ending at every
+    void, as a frame indexed like df with Voids_<label> and Value_<label>
+    columns (NaN where the key or the time is missing).
+    """
+    out = pd.DataFrame(index=df.index)
+    valid = df[key].notna() & df[time_col].notna()
+    events = df.loc[valid, [key, time_col, "Amount"]].sort_values([key, time_col], kind="stable")
+    events["Void"] = 1.0
+    # sort=False keeps the groups in the order of the sorted events, so the
+    # rolling results line up with events row for row
+    grouped = events.set_index(time_col).groupby(key, sort=False)[["Void", "Amount"]]
+    for label, window in windows.items():
+        sums = grouped.rolling(window).sum()
+        out[f"Voids_{label}"] = pd.Series(sums["Void"].to_numpy(), index=events.index)
+        out[f"Value_{label}"] = pd.Series(sums["Amount"].to_numpy(), index=events.index)
+    return out
+
+
+def velocity_zscores(activity, keys, windows=DEFAULT_WINDOWS, min_voids=DEFAULT_MIN_VOIDS):
+    """
+    Largest z-score over the windows of each void count against the same
+    key's other window counts (its own baseline). Counts below min_voids and
+    keys with no variation score 0.
+    """
+    scores = []
+    for label in windows:
+        counts = activity[f"Voids_{label}"]
+        by_key = counts.groupby(keys)
+        mean, std = by_key.transform("mean"), by_key.transform("std")
+        z = (counts - mean) / std
+        scores.append(z.where((std > 0) & (counts >= min_voids), 0.0).fillna(0.0).to_numpy())
+    if not scores:
+        return pd.Series(0.0, index=activity.index)
+    return pd.Series(np.max(scores, axis=0), index=activity.index)
+
+
+def void_velocity(df, time_col="Void_Date_Parsed", keys=DEFAULT_KEYS, windows=DEFAULT_WINDOWS,
+                  min_voids=DEFAULT_MIN_VOIDS):
+    """
+    Rolling activity for every key column present in df, e.g. Voider_Voids_1h,
+    Outlet_Value_7d, plus <name>_Velocity_Z per key, indexed like df.
+    """
+    parts = []
+    for name, column in keys.items():
+        if column not in df.columns:
+            continue
+        activity = rolling_activity(df, column, time_col, windows)
+        z = velocity_zscores(activity, df[column], windows, min_voids)
+        activity = activity.add_prefix(f"{name}_")
+        activity[f"{name}_Velocity_Z"] = z
+        parts.append(activity)
+    return pd.concat(parts, axis=1) if parts else pd.DataFrame(index=df.index)